@@ -0,0 +1,51 @@
+#--------------------------------
+# Build and query times of the BM25 table retrieval index (utils/Schema_Retrieval.py) on a synthetic
+# Snowflake database:
+#   cd DSR_Lite && python -m benchmarks.schema_retrieval --n_tables 10000 --n_queries 100
+#--------------------------------
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Schema_Catalog import build_tables
+from utils.Schema_Retrieval import build_index
+
+WORDS = ["order", "customer", "session", "event", "product", "invoice", "payment", "region", "store", "user",
+         "visit", "page", "campaign", "device", "country", "revenue", "refund", "stock", "supplier", "ticket"]
+
+
+def synthetic_snow_schema(n_tables, rng):
+    """Snowflake M-Schema of one schema with n_tables tables of 12 columns named after random words."""
+    schema = {"BENCH": {}}
+    for i in range(n_tables):
+        name = "_".join(rng.choice(WORDS, 2)) + f"_T{i}"
+        schema["BENCH"][f"BENCH.{name}"] = [[f"{w}_{j}", "TEXT", f"{w} {rng.choice(WORDS)}", ""]
+                                            for j, w in enumerate(rng.choice(WORDS, 12))]
+    return schema
+
+
+def benchmark_retrieval(n_tables=10000, n_queries=100):
+    """(build seconds, rank seconds per question)."""
+    rng = np.random.default_rng(0)
+    tables = build_tables(synthetic_snow_schema(n_tables, rng), "snow", "BENCH")
+    start = time.perf_counter()
+    index = build_index(tables, "snow", "BENCH")
+    build_time = time.perf_counter() - start
+    questions = [" ".join(rng.choice(WORDS, 6)) for _ in range(n_queries)]
+    start = time.perf_counter()
+    for question in questions:
+        index.rank(question)
+    return build_time, (time.perf_counter() - start) / n_queries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time building and ranking the retrieval index on a synthetic schema.")
+    parser.add_argument("--n_tables", type=int, default=10000)
+    parser.add_argument("--n_queries", type=int, default=100)
+    args = parser.parse_args()
+    build_time, query_time = benchmark_retrieval(args.n_tables, args.n_queries)
+    print(f"{args.n_tables} tables: build {build_time * 1000:.0f} ms, rank {query_time * 1000:.2f} ms per question")
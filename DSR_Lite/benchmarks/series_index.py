@@ -0,0 +1,77 @@
+#--------------------------------
+# Times the linear table_Information / table_list scans that M_Schema and generate_ddl_from_json used to do on
+# every call against SeriesIndex (utils/Schema_Catalog.py), on a synthetic sharded Snowflake schema:
+#   cd DSR_Lite && python -m benchmarks.series_index --n_tables 10000 --series_length 100
+#--------------------------------
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Schema_Catalog import SeriesIndex, clean_table_name
+
+
+def synthetic_snow_schema(n_tables, series_length):
+    """Snowflake M-Schema of n_tables sharded tables, series_length tables per similar_tables series."""
+    schema = {}
+    for schema_name in ("EVENTS", "SESSIONS"):
+        content, information = {}, {}
+        for series in range(n_tables // (2 * series_length)):
+            tables = [f"{schema_name}.SERIES{series}_{20200101 + day}" for day in range(series_length)]
+            content[tables[0]] = [["ID", "NUMBER", "", ""], ["VALUE", "TEXT", "", ""]]
+            information[tables[0]] = {"similar_tables": tables[1:]}
+        content["table_Information"] = information
+        content["table_description_summary"] = {}
+        schema[schema_name] = content
+    return schema
+
+
+def benchmark_series_index(n_tables=10000, series_length=100, n_lookups=200, repeat=3):
+    """Best-of-repeat seconds of each variant, as {name: seconds}."""
+    schema = synthetic_snow_schema(n_tables, series_length)
+    n_series = n_tables // (2 * series_length)
+    lookups = [("EVENTS", f"EVENTS.SERIES{i % n_series}_{20200101 + 1 + (i * 7) % (series_length - 1)}")
+               for i in range(n_lookups)]
+    table_list = [f"BENCH.{table_id}" for _, table_id in lookups]
+
+    def linear_surrogates():
+        for schema_name, table_id in lookups:
+            for surrogate, similar in schema[schema_name]["table_Information"].items():
+                if table_id.lower() in [t.lower() for t in similar["similar_tables"]]:
+                    break
+
+    def linear_matching():
+        cleaned = {clean_table_name(t) for t in table_list}
+        return [(schema_name, table_key) for schema_name, content in schema.items() for table_key, columns in content.items()
+                if isinstance(columns, list) and clean_table_name(f"BENCH.{table_key}") in cleaned]
+
+    def timed(run):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    index = SeriesIndex(schema, "snow", "BENCH")
+    return {
+        "build SeriesIndex": timed(lambda: SeriesIndex(schema, "snow", "BENCH")),
+        f"surrogates, linear scan ({n_lookups} tables)": timed(linear_surrogates),
+        f"surrogates, SeriesIndex ({n_lookups} tables)": timed(
+            lambda: [index.surrogate_of(t.lower(), s.lower()) for s, t in lookups]),
+        "table_list matching, linear scan": timed(linear_matching),
+        "table_list matching, SeriesIndex": timed(lambda: index.tables_matching(table_list)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time SeriesIndex against linear scans on a synthetic schema.")
+    parser.add_argument("--n_tables", type=int, default=10000)
+    parser.add_argument("--series_length", type=int, default=100)
+    parser.add_argument("--n_lookups", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for name, seconds in benchmark_series_index(args.n_tables, args.series_length, args.n_lookups, args.repeat).items():
+        print(f"{name:<45} {seconds * 1000:10.2f} ms")
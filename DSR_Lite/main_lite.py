@@ -54,6 +54,13 @@ def save_or_load_pickle(data=None, filename='data.pkl', mode='save'):
 
 #---- Schema-aware Alignment----
 
+EXPLORATION_CONCURRENCY = 4  # exploration SQLs executed at once, capped per backend by BATCH_CONCURRENCY_LIMITS
+EXPLORATION_TIMEOUT = 600  # seconds, shared by all exploration SQLs of one step
+EXPLORATION_REWRITE_SAMPLING = True  # run ORDER BY RANDOM() LIMIT n samples as cheap backend-specific sampling
+SQL_PREFLIGHT = True  # validate candidate SQL against the M-Schema JSON before sending it to the database
+SQL_AUTOFIX = True  # try rule-based fixes for mechanical dialect errors before asking the LLM to repair
+SCHEMA_PRUNING = True  # over-long M-Schemas are pruned to MAX_MSchema_TOKEN instead of replaced by the DDL
+
 def Fine_grained_Exploration_func(Question_id,Question, schema_json, db_name, base_mess=[], step="Exploration Stage",db_type='sqlite'):
     log_msg(f"\n{'-'*40}【Question_id: {Question_id}】 | 【Start Stage: {step}】{'-'*40}")
 
@@ -91,13 +98,25 @@ def Fine_grained_Exploration_func(Question_id,Question, schema_json, db_name, ba
 
     query_list = []
     sql_list = list(ge_sql.values())
+    # The exploration queries are independent, so they all run up front; repairs below stay sequential
+    batch_results = db_interface_many(db_type=db_type, queries=sql_list, conn_info=db_name,
+                                      max_concurrency=EXPLORATION_CONCURRENCY, timeout=EXPLORATION_TIMEOUT,
+                                      rewrite_sampling=EXPLORATION_REWRITE_SAMPLING, preflight=SQL_PREFLIGHT)
 
     for idx, original_sql in enumerate(sql_list):
         log_msg(f"\n{'='*20} [Executing Original SQL #{idx + 1}] {'='*20}")
         log_msg(f"[【Question_id: {Question_id}】 | Original SQL Statement]:\n{original_sql}\n")
 
         # Execute SQL
-        status, result = db_interface(db_type=db_type, query=original_sql, conn_info=db_name)
+        status, result = batch_results[idx]["status"], batch_results[idx]["result"]
+        log_msg(f"[【Question_id: {Question_id}】 | Execution Time: {batch_results[idx]['time']:.2f} s]")
+
+        if status != 0 and SQL_AUTOFIX:
+            autofix = db_autofix(db_type=db_type, query=original_sql, error_message=result, conn_info=db_name, preflight=SQL_PREFLIGHT)
+            if autofix:
+                status, result, original_sql = autofix
+            else:
+                result += db_identifier_hint(db_type=db_type, query=original_sql, error_message=result, conn_info=db_name)
 
         if status == 0:
             log_msg(f"[【Question_id: {Question_id}】 | SQL Execution Successful]\nResult:\n{result}")
@@ -146,7 +165,13 @@ def Fine_grained_Exploration_func(Question_id,Question, schema_json, db_name, ba
                 continue
 
             # Execute the fixed SQL
-            status, result = db_interface(db_type=db_type, query=fixed_sql, conn_info=db_name)
+            status, result = db_interface(db_type=db_type, query=fixed_sql, conn_info=db_name, preflight=SQL_PREFLIGHT)
+            if status != 0 and SQL_AUTOFIX:
+                autofix = db_autofix(db_type=db_type, query=fixed_sql, error_message=result, conn_info=db_name, preflight=SQL_PREFLIGHT)
+                if autofix:
+                    status, result, fixed_sql = autofix
+                else:
+                    result += db_identifier_hint(db_type=db_type, query=fixed_sql, error_message=result, conn_info=db_name)
 
             if status == 0:
                 log_msg(f"[【Question_id: {Question_id}】 |  Repair Successful] Execution Result:\n{result}")
@@ -252,7 +277,15 @@ def GenerateSQL1(Question_id,Question, schema_json, db_name,Information_Agg, bas
                 # Modified: Use statu["sql"] directly instead of raw_sql
                 flag,current_subsql = SQL_completion(statu["sql"], db_type)
                 log_msg(f"【Question_id: {Question_id}】 |  \n✅ SQL structure is valid, starting SQL execution:\n{current_subsql}")
-                status, result = db_interface(db_type=db_type, query=current_subsql, conn_info=db_name)
+                status, result = db_interface(db_type=db_type, query=current_subsql, conn_info=db_name, preflight=SQL_PREFLIGHT)
+                if status != 0 and SQL_AUTOFIX:
+                    autofix = db_autofix(db_type=db_type, query=current_subsql, error_message=result, conn_info=db_name, preflight=SQL_PREFLIGHT)
+                    if autofix:
+                        status, result, current_subsql = autofix
+                        if flag == 1:
+                            statu["sql"] = current_subsql
+                    else:
+                        result += db_identifier_hint(db_type=db_type, query=current_subsql, error_message=result, conn_info=db_name)
 
                 if status == 0:
                     log_msg(f"[【Question_id: {Question_id}】 |  SQL Execution Successful]\nResult:\n{result}")
@@ -313,7 +346,15 @@ def GenerateSQL1(Question_id,Question, schema_json, db_name,Information_Agg, bas
                                 # Modified: Use fix_statu["sql"] directly
                                 flag,current_subsql = SQL_completion(fix_statu["sql"], db_type)
                                 log_msg(f"[【Question_id: {Question_id}】 |  Attempting to execute repaired SQL]:\n{current_subsql}")
-                                status, result = db_interface(db_type=db_type, query=current_subsql, conn_info=db_name)
+                                status, result = db_interface(db_type=db_type, query=current_subsql, conn_info=db_name, preflight=SQL_PREFLIGHT)
+                                if status != 0 and SQL_AUTOFIX:
+                                    autofix = db_autofix(db_type=db_type, query=current_subsql, error_message=result, conn_info=db_name, preflight=SQL_PREFLIGHT)
+                                    if autofix:
+                                        status, result, current_subsql = autofix
+                                        if flag == 1:
+                                            fix_statu["sql"] = current_subsql
+                                    else:
+                                        result += db_identifier_hint(db_type=db_type, query=current_subsql, error_message=result, conn_info=db_name)
 
                                 if status == 0:
                                     log_msg(f"[【Question_id: {Question_id}】 |  Repaired SQL Execution Successful]\nResult:\n{result}")
@@ -399,7 +440,15 @@ def GenerateSQL2(Question_id,Question, schema_json, db_name,Information_Agg, bas
                 # Modified: Use statu["sql"] directly
                 flag,current_subsql = SQL_completion(statu["sql"], db_type)
                 log_msg(f"【Question_id: {Question_id}】 |  \n✅ SQL structure is valid, starting SQL execution:\n{current_subsql}")
-                status, result = db_interface(db_type=db_type, query=current_subsql, conn_info=db_name)
+                status, result = db_interface(db_type=db_type, query=current_subsql, conn_info=db_name, preflight=SQL_PREFLIGHT)
+                if status != 0 and SQL_AUTOFIX:
+                    autofix = db_autofix(db_type=db_type, query=current_subsql, error_message=result, conn_info=db_name, preflight=SQL_PREFLIGHT)
+                    if autofix:
+                        status, result, current_subsql = autofix
+                        if flag == 1:
+                            statu["sql"] = current_subsql
+                    else:
+                        result += db_identifier_hint(db_type=db_type, query=current_subsql, error_message=result, conn_info=db_name)
 
                 if status == 0:
                     if flag==1:
@@ -455,7 +504,15 @@ def GenerateSQL2(Question_id,Question, schema_json, db_name,Information_Agg, bas
                             if set(fix_statu.keys()) == expected_keys and fix_statu["current_state"].lower() in {"extend", "revise", "rephrase","explore"}:
                                 flag,current_subsql = SQL_completion(fix_statu["sql"], db_type)
                                 log_msg(f"[【Question_id: {Question_id}】 |  Attempting to execute repaired SQL]:\n{current_subsql}")
-                                status, result = db_interface(db_type=db_type, query=current_subsql, conn_info=db_name)
+                                status, result = db_interface(db_type=db_type, query=current_subsql, conn_info=db_name, preflight=SQL_PREFLIGHT)
+                                if status != 0 and SQL_AUTOFIX:
+                                    autofix = db_autofix(db_type=db_type, query=current_subsql, error_message=result, conn_info=db_name, preflight=SQL_PREFLIGHT)
+                                    if autofix:
+                                        status, result, current_subsql = autofix
+                                        if flag == 1:
+                                            fix_statu["sql"] = current_subsql
+                                    else:
+                                        result += db_identifier_hint(db_type=db_type, query=current_subsql, error_message=result, conn_info=db_name)
 
                                 if status == 0:
                                     log_msg(f"[【Question_id: {Question_id}】 |  Repaired SQL Execution Successful]\nResult:\n{result}")
@@ -684,12 +741,16 @@ def process_entry(entry,MAX_MSchema_TOKEN):
             user_input = f"[Question]\n{question}\n"
 
         log_msg("📨 Input constructed, invoking workflow...")
-        ## When the context exceeds a certain limit, use DDL statements directly.
-        # TODO: A hierarchical pruning approach can be adopted to maximize the score: https://github.com/Snowflake-Labs/ReFoRCE/blob/o3/methods/ReFoRCE/reconstruct_data.py
-        if get_token_count(M_Schema(SL=SL, db_id=db_id, db_type=db_type))>MAX_MSchema_TOKEN:
-            schema_json=generate_ddl_from_json(db_id=db_id,table_list=SL,db_type=db_type)
+        ## When the context exceeds a certain limit, prune the M-Schema down to the budget (or use DDL statements directly).
+        m_schema = render_schema(db_id=db_id, SL=SL, db_type=db_type)
+        if m_schema.token_count>MAX_MSchema_TOKEN and SCHEMA_PRUNING:
+            m_schema = render_pruned_schema(db_id=db_id, SL=SL, db_type=db_type, max_tokens=MAX_MSchema_TOKEN, question=question)
+        if m_schema.token_count>MAX_MSchema_TOKEN:
+            # Still over budget (pruning off, or nothing left to drop): fall back to the DDL statements
+            log_msg(f"M-Schema has {m_schema.token_count} tokens (budget {MAX_MSchema_TOKEN}), using DDL instead.")
+            schema_json=render_schema(db_id=db_id, SL=SL, db_type=db_type, kind="ddl").text
         else:
-            schema_json=M_Schema(SL=SL, db_id=db_id, db_type=db_type)
+            schema_json=m_schema.text
         # Execute core logic (SQL inference)
         Pre_SQL, step_counter = workflow(
             Question_id=question_id,
@@ -0,0 +1,92 @@
+#--------------------------------
+# Shared fixtures: small SQLite databases with their *_M-Schema.json written to a temporary DB directory,
+# wired into Schema_Catalog / Database_Interface for the duration of a test.
+#   cd DSR_Lite && python -m pytest -q tests
+#--------------------------------
+import os
+import sys
+import json
+import sqlite3
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import snowflake.connector
+
+import utils.Schema_Catalog as Schema_Catalog
+import utils.Database_Interface as Database_Interface
+from utils.DBsetup.Local_Connector import make_local_snowflake_connect
+
+TOKENIZER_DIR = os.path.join(os.path.dirname(Database_Interface.__file__), "mytoken")
+HAS_TOKENIZER = os.path.exists(os.path.join(TOKENIZER_DIR, "tokenizer.json"))
+
+
+@pytest.fixture(autouse=True)
+def tokenizer_stand_in(monkeypatch):
+    """The DeepSeek tokenizer files are downloaded separately (utils/mytoken/readme.md); count words without them."""
+    if not HAS_TOKENIZER:
+        monkeypatch.setattr(Database_Interface, "truncate_text_by_tokens", lambda text, max_tokens=4096: text)
+        monkeypatch.setattr(Database_Interface, "get_token_count", lambda text: len(str(text).split()))
+    yield
+
+
+def write_sqlite_database(db_dir, db_id, statements):
+    """Create db_dir/db_id/db_id.sqlite from statements and its M-Schema from the resulting tables."""
+    os.makedirs(os.path.join(db_dir, db_id), exist_ok=True)
+    db_path = os.path.join(db_dir, db_id, f"{db_id}.sqlite")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(";\n".join(statements))
+    schema = {}
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"):
+        schema[table] = [[name, "Primary Key" if pk else None, col_type, "", ""] for _, name, col_type, _, _, pk in
+                         conn.execute(f'PRAGMA table_info("{table}")')]
+    conn.commit()
+    conn.close()
+    with open(os.path.join(db_dir, db_id, f"{db_id}_M-Schema.json"), "w", encoding="utf-8") as f:
+        json.dump({db_id: schema, "foreign_keys": {}}, f)
+    return db_path
+
+
+SHOP_STATEMENTS = [
+    "CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, city TEXT)",
+    "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER, amount REAL, start_date TEXT, end_date TEXT)",
+    "CREATE VIEW big_orders AS SELECT id, amount FROM orders WHERE amount > 100",
+    "INSERT INTO customers VALUES (1, 'Ann', 'Paris'), (2, 'Bob', 'Rome'), (3, 'Cid', NULL)",
+    "INSERT INTO orders VALUES (1, 1, 50.5, '2024-01-01', '2024-01-05'), (2, 1, 150.0, '2024-02-01', '2024-02-03'),"
+    " (3, 2, 20.0, '2024-03-01', '2024-03-02')",
+]
+
+
+@pytest.fixture
+def sqlite_dir(tmp_path, monkeypatch):
+    """A DB directory holding the "shop" database, used as sqlite_DB_dir everywhere."""
+    db_dir = str(tmp_path / "sqlite")
+    write_sqlite_database(db_dir, "shop", SHOP_STATEMENTS)
+    monkeypatch.setattr(Schema_Catalog, "sqlite_DB_dir", db_dir)
+    monkeypatch.setattr(Database_Interface, "sqlite_DB_dir", db_dir)
+    Schema_Catalog.schema_catalog.clear()
+    Database_Interface.clear_render_cache()
+    yield db_dir
+    Database_Interface.close_sqlite_pools()
+    Database_Interface.close_sqlite_snapshots()
+    Schema_Catalog.schema_catalog.clear()
+    Database_Interface.clear_render_cache()
+
+
+@pytest.fixture
+def shop_db(sqlite_dir):
+    return os.path.join(sqlite_dir, "shop", "shop.sqlite")
+
+
+LOCAL_SNOWFLAKE_CREDENTIALS = {"user": "u", "password": "p", "account": "local", "role": "r", "warehouse": "w"}
+
+
+@pytest.fixture
+def local_snowflake(shop_db, monkeypatch):
+    """The Snowflake path (session pool, async submit/poll) served by the SQLite stand-in over the shop database."""
+    connect = make_local_snowflake_connect(shop_db)
+    monkeypatch.setattr(Database_Interface, "default_credentials", LOCAL_SNOWFLAKE_CREDENTIALS)
+    Database_Interface.set_snowflake_connector(connect)
+    yield connect
+    Database_Interface.set_snowflake_connector(snowflake.connector.connect)
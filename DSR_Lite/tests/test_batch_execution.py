@@ -0,0 +1,95 @@
+import pytest
+
+import utils.Database_Interface as Database_Interface
+from utils.Database_Interface import db_interface_many
+
+
+@pytest.fixture
+def recorded_batches(monkeypatch):
+    """Replace the warehouse executors with a recorder; every query returns its own text."""
+    calls = []
+
+    def submit_and_poll(db_type, queries, fetch_results, timeout):
+        calls.append((db_type, list(queries), timeout))
+        return [(0, query) for query in queries]
+
+    monkeypatch.setattr(Database_Interface, "_submit_and_poll", submit_and_poll)
+    return calls
+
+
+def test_sqlite_batch_keeps_input_order(shop_db):
+    queries = [f"SELECT {i} AS n" for i in range(6)] + ["SELECT * FROM no_such_table"]
+    results = db_interface_many("sqlite", queries, "shop", max_concurrency=3)
+    assert [r["status"] for r in results] == [0] * 6 + [2]
+    for i in range(6):
+        assert f"{i}" in results[i]["result"]
+    assert "no_such_table" in results[6]["result"]
+
+
+def test_preflight_rejects_before_execution(sqlite_dir):
+    results = db_interface_many("sqlite", ["SELECT id FROM customers", "SELECT nope FROM customers"], "shop",
+                                preflight=True)
+    assert results[0]["status"] == 0
+    assert results[1]["status"] != 0 and "nope" in results[1]["result"]
+
+
+def test_snowflake_batch_is_submitted_together_in_chunks(recorded_batches):
+    queries = [f"SELECT {i}" for i in range(6)]
+    results = db_interface_many("SNOW", queries, "DB", max_concurrency=4)
+    assert [r["result"] for r in results] == queries
+    assert [(db_type, batch) for db_type, batch, _ in recorded_batches] == [("snow", queries[:4]), ("snow", queries[4:])]
+
+
+def test_bigquery_batch_goes_to_the_job_executor(recorded_batches):
+    queries = ["SELECT 1", "SELECT 2"]
+    results = db_interface_many("bigquery", queries, None, max_concurrency=8)
+    assert [r["status"] for r in results] == [0, 0]
+    assert recorded_batches == [("bigquery", queries, recorded_batches[0][2])]
+
+
+def test_async_batch_retries_unknown_failures(monkeypatch):
+    attempts = []
+
+    def submit_and_poll(db_type, queries, fetch_results, timeout):
+        attempts.append(list(queries))
+        if len(attempts) == 1:
+            return [(0, queries[0]), (3, "Timeout: cancelled")]
+        return [(0, query) for query in queries]
+
+    monkeypatch.setattr(Database_Interface, "_submit_and_poll", submit_and_poll)
+    results = db_interface_many("snow", ["SELECT 1", "SELECT 2"], "DB")
+    assert attempts == [["SELECT 1", "SELECT 2"], ["SELECT 2"]]
+    assert [r["status"] for r in results] == [0, 0]
+
+
+def test_async_batch_skips_chunks_past_the_deadline(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(Database_Interface.time, "monotonic", lambda: clock[0])
+
+    def submit_and_poll(db_type, queries, fetch_results, timeout):
+        clock[0] += 10
+        return [(0, query) for query in queries]
+
+    monkeypatch.setattr(Database_Interface, "_submit_and_poll", submit_and_poll)
+    results = db_interface_many("snow", ["SELECT 1", "SELECT 2"], "DB", max_concurrency=1, timeout=5)
+    assert results[0]["status"] == 0
+    assert results[1]["status"] == 3 and results[1]["result"].startswith("Skipped: batch deadline")
+
+
+def test_sampling_rewrite_falls_back_to_original_sql(monkeypatch):
+    def submit_and_poll(db_type, queries, fetch_results, timeout):
+        return [(0, "[]") if "RANDOM" not in query.upper() else (0, "rows") for query in queries]
+
+    monkeypatch.setattr(Database_Interface, "_submit_and_poll", submit_and_poll)
+    sample = "SELECT * FROM t ORDER BY RANDOM() LIMIT 5"
+    results = db_interface_many("snow", [sample], "DB", rewrite_sampling=True)
+    assert results[0] == {"status": 0, "result": "rows", "time": results[0]["time"]}
+
+
+def test_snowflake_batch_runs_on_one_pooled_session(local_snowflake):
+    queries = ["SELECT name FROM customers WHERE id = 1", "SELECT COUNT(*) AS n FROM orders", "SELECT * FROM missing"]
+    results = db_interface_many("snow", queries, "SHOP", max_concurrency=4)
+    assert [r["status"] for r in results] == [0, 0, 1]
+    assert "Ann" in results[0]["result"]
+    assert "3" in results[1]["result"]
+    assert local_snowflake.stats["connects"] == 1
@@ -0,0 +1,190 @@
+import sqlite3
+import itertools
+
+import pyarrow as pa
+import pytest
+
+import utils.Database_Interface as Database_Interface
+from utils.Database_Interface import (execute_bigquery_queries_async, execute_bigquery_query, get_bigquery_client,
+                                      set_bigquery_client_factory)
+
+
+class StubField:
+    def __init__(self, name):
+        self.name = name
+
+
+class StubRows:
+    """RowIterator stand-in that hands out its rows as Arrow record batches of page_size rows."""
+    def __init__(self, columns, rows, page_size):
+        self.schema = [StubField(name) for name in columns]
+        self.total_rows = len(rows)
+        self._columns = columns
+        self._rows = rows
+        self._page_size = page_size or 1000
+        self.pages_read = 0
+
+    def to_arrow_iterable(self):
+        for start in range(0, len(self._rows), self._page_size):
+            self.pages_read += 1
+            page = self._rows[start:start + self._page_size]
+            yield pa.RecordBatch.from_pydict({name: [row[i] for row in page] for i, name in enumerate(self._columns)})
+
+
+class StubJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, client, query, polls_until_done):
+        self.client = client
+        self.query = query
+        self.job_id = f"job_{next(self._ids)}"
+        self.cache_hit = False
+        self.total_bytes_billed = 0
+        self.cancelled = False
+        self._polls_left = polls_until_done
+        self.rows = None
+
+    def done(self):
+        self._polls_left -= 1
+        return self._polls_left < 0
+
+    def result(self, page_size=None):
+        conn = sqlite3.connect(self.client.db_path)
+        try:
+            cursor = conn.execute(self.query)
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            self.rows = StubRows(columns, cursor.fetchall(), page_size)
+            return self.rows
+        except sqlite3.Error as e:
+            raise ValueError(f"400 {e}")
+        finally:
+            conn.close()
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class StubDryRun:
+    def __init__(self, total_bytes_processed):
+        self.total_bytes_processed = total_bytes_processed
+
+
+class StubClient:
+    """BigQuery client stand-in over a SQLite file; dry runs report estimate(query) bytes."""
+    def __init__(self, db_path, estimate=lambda query: 1024, polls_until_done=1):
+        self.db_path = db_path
+        self.estimate = estimate
+        self.polls_until_done = polls_until_done
+        self.dry_runs = []
+        self.jobs = []
+        self.closed = False
+
+    def query(self, query, job_config=None):
+        if job_config is not None and job_config.dry_run:
+            self.dry_runs.append(query)
+            if "missing" in query:
+                raise ValueError("404 Not found: Table missing")
+            return StubDryRun(self.estimate(query))
+        job = StubJob(self, query, self.polls_until_done)
+        self.jobs.append(job)
+        return job
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def stub_bigquery(shop_db, monkeypatch):
+    monkeypatch.setattr(Database_Interface, "BIGQUERY_POLL_INTERVAL", 0.01)
+    created = []
+
+    def factory(credentials_path):
+        client = StubClient(shop_db)
+        created.append(client)
+        return client
+
+    set_bigquery_client_factory(factory)
+    yield created
+    set_bigquery_client_factory(Database_Interface._create_bigquery_client)
+
+
+def test_client_is_built_once_per_credentials_file(stub_bigquery):
+    assert get_bigquery_client("a.json") is get_bigquery_client("a.json")
+    assert get_bigquery_client("b.json") is not get_bigquery_client("a.json")
+    assert len(stub_bigquery) == 2
+    set_bigquery_client_factory(lambda path: StubClient(None))
+    assert all(client.closed for client in stub_bigquery)
+
+
+def test_jobs_are_polled_and_results_returned_in_input_order(stub_bigquery):
+    queries = ["SELECT name FROM customers WHERE id = 2", "SELECT * FROM customers WHERE id = 99",
+               "SELECT amount FROM orders WHERE id = 1"]
+    results = execute_bigquery_queries_async(queries, "creds.json")
+    assert [status for status, _ in results] == [0, 0, 0]
+    assert "Bob" in results[0][1] and results[1][1] == "[]" and "50.5" in results[2][1]
+    client, = stub_bigquery
+    assert len(client.jobs) == 3 and client.dry_runs == queries
+
+
+def test_results_are_read_as_arrow_pages(stub_bigquery, monkeypatch):
+    monkeypatch.setattr(Database_Interface, "FETCH_BATCH_SIZE", 8)
+    query = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100) SELECT i FROM n"
+    status, result = execute_bigquery_query(query, "creds.json")
+    lines = result.splitlines()
+    assert status == 0 and "[100 rows x 1 columns]" in lines
+    assert lines[1].split() == ["0", "1"] and ["99", "100"] in [line.split() for line in lines]
+    job, = stub_bigquery[0].jobs
+    assert job.rows.pages_read == 13
+
+
+def test_failed_and_timed_out_jobs(stub_bigquery):
+    status, result = execute_bigquery_query("SELECT * FROM missing", "creds.json")
+    assert status == 3 and result.startswith("BigQuery programming Error:") and "missing" in result
+    stub_bigquery[0].polls_until_done = 10 ** 6
+    status, result = execute_bigquery_query("SELECT 1", "creds.json", timeout=0.05)
+    assert status == 3 and result.startswith("Execution timed out after 0.05 seconds")
+    assert stub_bigquery[0].jobs[-1].cancelled
+
+
+def test_cost_guard_rejects_queries_over_the_limit(stub_bigquery, monkeypatch):
+    monkeypatch.setattr(Database_Interface, "BIGQUERY_MAX_BYTES_PROCESSED", 1000)
+    client = get_bigquery_client("creds.json")
+    client.estimate = lambda query: 3 * 1024 ** 3
+    status, result = execute_bigquery_query("SELECT name FROM customers", "creds.json")
+    assert status == 1
+    assert result.splitlines()[:3] == ["BigQuery Cost Guard Error: query rejected before execution.",
+                                       "estimated_bytes_processed: 3221225472 (3.00 GB)",
+                                       "limit_bytes: 1000 (1000 B)"]
+    assert client.jobs == []
+
+
+def test_cost_guard_can_sample_instead(stub_bigquery, monkeypatch):
+    monkeypatch.setattr(Database_Interface, "BIGQUERY_MAX_BYTES_PROCESSED", 1000)
+    monkeypatch.setattr(Database_Interface, "BIGQUERY_OVER_LIMIT_ACTION", "sample")
+    client = get_bigquery_client("creds.json")
+    client.estimate = lambda query: 500 if "TABLESAMPLE" in query else 100000
+    job_query, rejected = Database_Interface.apply_bigquery_cost_guard(
+        client, "WITH t AS (SELECT * FROM `p.d.events`) SELECT COUNT(*) FROM t")
+    assert rejected is None
+    assert job_query == "WITH t AS (SELECT * FROM `p.d.events` TABLESAMPLE SYSTEM (1.0 PERCENT)) SELECT COUNT(*) FROM t"
+
+
+def test_cost_guard_keeps_the_original_estimate_when_the_sample_cannot_be_dry_run(stub_bigquery, monkeypatch):
+    monkeypatch.setattr(Database_Interface, "BIGQUERY_MAX_BYTES_PROCESSED", 1000)
+    monkeypatch.setattr(Database_Interface, "BIGQUERY_OVER_LIMIT_ACTION", "sample")
+    client = get_bigquery_client("creds.json")
+
+    def estimate(query):
+        if "TABLESAMPLE" in query:
+            raise ValueError("400 TABLESAMPLE is not supported for views")
+        return 100000
+
+    client.estimate = estimate
+    job_query, (status, message) = Database_Interface.apply_bigquery_cost_guard(client, "SELECT * FROM `p.d.view`")
+    assert job_query is None and status == 1 and "estimated_bytes_processed: 100000" in message
+
+
+def test_cost_guard_can_be_disabled(stub_bigquery, monkeypatch):
+    monkeypatch.setattr(Database_Interface, "BIGQUERY_MAX_BYTES_PROCESSED", None)
+    assert execute_bigquery_query("SELECT 1", "creds.json")[0] == 0
+    assert stub_bigquery[0].dry_runs == []
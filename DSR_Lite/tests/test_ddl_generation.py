@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import sqlite3
+
+import pytest
+
+import utils.Schema_Catalog as Schema_Catalog
+import utils.Database_Interface as Database_Interface
+from utils.Database_Interface import generate_ddl_from_json
+
+SNOW_SCHEMA = {
+    "EVENTS": {
+        "EVENTS.CLICKS_20200101": [["ID", "NUMBER", "", ""], ["AMOUNT", "FLOAT", "", ""]],
+        "EVENTS.USERS": [["ID", "NUMBER", "", ""]],
+        "table_Information": {"EVENTS.CLICKS_20200101": {"similar_tables": ["EVENTS.CLICKS_20200102"]}},
+        "table_description_summary": {"EVENTS.USERS": "One row per user."},
+    },
+}
+
+BIGQUERY_SCHEMA = {
+    "proj": {
+        "ga": {
+            "ga.events_20200101": [["event_name", "STRING", "", ""],
+                                   ["params", "ARRAY<STRUCT<key STRING, value STRUCT<string_value STRING>>>", "", ""]],
+            "ga.users": [["id", "INTEGER", "", ""]],
+            "table_Information": {},
+            "table_description_summary": {},
+        },
+    },
+}
+
+MYSQL_SCHEMA = {
+    "shop": {"Orders": [["id", "Primary Key", "int", "", ""], ["amount", None, "decimal", "", ""]],
+             "customers": [["id", "Primary Key", "int", "", ""]]},
+    "foreign_keys": {},
+}
+
+
+@pytest.fixture
+def schema_dirs(tmp_path, monkeypatch):
+    """Snowflake db SALES, BigQuery task Ga_Task and MySQL db shop, as M-Schema files only."""
+    dirs = {}
+    for db_type, db_id, schema in (("snow", "SALES", SNOW_SCHEMA), ("bigquery", "Ga_Task", BIGQUERY_SCHEMA),
+                                   ("mysql", "shop", MYSQL_SCHEMA)):
+        base_dir = str(tmp_path / db_type)
+        os.makedirs(os.path.join(base_dir, db_id))
+        with open(os.path.join(base_dir, db_id, f"{db_id}_M-Schema.json"), "w", encoding="utf-8") as f:
+            json.dump(schema, f)
+        for module in (Schema_Catalog, Database_Interface):
+            monkeypatch.setattr(module, f"{db_type}_DB_dir", base_dir)
+        dirs[db_type] = base_dir
+    Schema_Catalog.schema_catalog.clear()
+    yield dirs
+    Schema_Catalog.schema_catalog.clear()
+
+
+def test_snowflake_ddl_is_built_once_and_subsets_resolve_through_the_series(schema_dirs, monkeypatch):
+    builds = []
+    snow_ddl_index = Database_Interface._snow_ddl_index
+    monkeypatch.setattr(Database_Interface, "_snow_ddl_index", lambda *args: builds.append(args) or snow_ddl_index(*args))
+    full = generate_ddl_from_json("SALES")
+    assert full.startswith('CREATE TABLE "SALES.EVENTS.CLICKS_20200101" (\n    "ID" INTEGER,\n    "AMOUNT" REAL\n);')
+    assert 'CREATE TABLE "SALES.EVENTS.USERS"' in full and "/*\nOne row per user.\n*/" in full
+    assert generate_ddl_from_json("SALES") is full
+    # A member of a table series gets the DDL of the series' table
+    assert generate_ddl_from_json("SALES", ["SALES.EVENTS.CLICKS_20200102"]) == \
+        'CREATE TABLE "SALES.EVENTS.CLICKS_20200101" (\n    "ID" INTEGER,\n    "AMOUNT" REAL\n);\n'
+    assert generate_ddl_from_json("SALES", ["SALES.EVENTS.USERS", "SALES.EVENTS.MISSING"]).startswith(
+        'CREATE TABLE "SALES.EVENTS.USERS"')
+    assert len(builds) == 1
+    with pytest.raises(FileNotFoundError):
+        generate_ddl_from_json("NOWHERE")
+
+
+def test_ddl_is_rebuilt_when_the_schema_file_changes(schema_dirs):
+    json_path = os.path.join(schema_dirs["snow"], "SALES", "SALES_M-Schema.json")
+    assert '"NAME"' not in generate_ddl_from_json("SALES", ["SALES.EVENTS.USERS"])
+    schema = json.loads(json.dumps(SNOW_SCHEMA))
+    schema["EVENTS"]["EVENTS.USERS"].append(["NAME", "TEXT", "", ""])
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(schema, f)
+    os.utime(json_path, (time.time() + 10, time.time() + 10))
+    assert '"NAME" TEXT' in generate_ddl_from_json("SALES", ["SALES.EVENTS.USERS"])
+
+
+def test_bigquery_ddl(schema_dirs):
+    full = generate_ddl_from_json("ga_task", db_type="bigquery")
+    assert "CREATE TABLE `proj.ga.events_20200101` (\n    `event_name` STRING,\n    `params` COMPLEX_TYPE\n);" in full
+    assert generate_ddl_from_json("ga_task", ["proj.ga.users"], "bigquery") == \
+        "CREATE TABLE `proj.ga.users` (\n    `id` INT64\n);\n"
+
+
+def test_mysql_ddl_matches_table_names_exactly(schema_dirs):
+    assert generate_ddl_from_json("shop", ["Orders"], "mysql") == \
+        "CREATE TABLE `Orders` (\n    `id` INT PRIMARY KEY,\n    `amount` DECIMAL\n);\n;"
+    assert generate_ddl_from_json("shop", ["orders"], "mysql") == ""
+
+
+def test_sqlite_ddl_is_read_once_per_file_version(shop_db):
+    assert generate_ddl_from_json("shop", db_type="sqlite").startswith("CREATE TABLE customers")
+    assert generate_ddl_from_json("shop", ["orders"], "sqlite").startswith("CREATE TABLE orders")
+    assert generate_ddl_from_json("shop", ["Orders"], "sqlite") == ""
+    conn = sqlite3.connect(shop_db)
+    conn.execute("CREATE TABLE refunds (id INTEGER)")
+    conn.commit()
+    conn.close()
+    os.utime(shop_db, (time.time() + 10, time.time() + 10))
+    assert generate_ddl_from_json("shop", ["refunds"], "sqlite").startswith("CREATE TABLE refunds")
+    assert Database_Interface._sqlite_ddl_cache[shop_db][0] == os.path.getmtime(shop_db)
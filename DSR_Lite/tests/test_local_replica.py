@@ -0,0 +1,74 @@
+import os
+
+import duckdb
+import pytest
+
+import utils.Database_Interface as Database_Interface
+from utils.Database_Interface import db_interface, db_interface_many, execute_replica_query, set_local_replica
+
+
+def build_replica(replica_dir, db_id):
+    """A sampled replica: customers only holds Ann, as if Bob and Cid were not sampled."""
+    path = os.path.join(replica_dir, f"{db_id}.duckdb")
+    con = duckdb.connect(path)
+    con.execute('CREATE SCHEMA "PUBLIC"')
+    con.execute('CREATE TABLE "PUBLIC"."ORDERS" ("ID" BIGINT, "AMOUNT" DOUBLE)')
+    con.execute('INSERT INTO "PUBLIC"."ORDERS" VALUES (1, 50.5), (2, 150.0)')
+    con.execute("CREATE TABLE customers (id BIGINT, name VARCHAR)")
+    con.execute("INSERT INTO customers VALUES (1, 'Ann')")
+    con.close()
+    return path
+
+
+@pytest.fixture
+def replica_dir(tmp_path):
+    replica_dir = str(tmp_path / "replicas")
+    os.makedirs(replica_dir)
+    build_replica(replica_dir, "SHOP")
+    yield replica_dir
+    set_local_replica(None)
+
+
+def test_queries_are_transpiled_and_served_from_the_replica(replica_dir):
+    set_local_replica(replica_dir, db_types=("snow", "bigquery"))
+    status, result = db_interface("snow", "SELECT SUM(AMOUNT) AS total FROM SHOP.PUBLIC.ORDERS", "SHOP")
+    assert status == 0 and "200.5" in result
+    status, result = db_interface("bigquery", "SELECT COUNT(*) AS n FROM `proj.PUBLIC.ORDERS`", "SHOP")
+    assert status == 0 and result.splitlines()[1].split()[-1] == "2"
+    assert db_interface("snow", "SELECT * FROM SHOP.PUBLIC.ORDERS WHERE ID = 9", "SHOP") == (0, "[]")
+
+
+def test_replica_errors_use_the_backend_status(replica_dir):
+    set_local_replica(replica_dir)
+    status, result = db_interface("snow", "SELECT * FROM SHOP.PUBLIC.MISSING", "SHOP")
+    assert status == Database_Interface.REPLICA_ERROR_STATUS["snow"]
+    assert result.startswith("Snowflake (local replica) Error:") and "MISSING" in result
+    corrupt = os.path.join(replica_dir, "BROKEN.duckdb")
+    with open(corrupt, "wb") as f:
+        f.write(b"not a duckdb file" * 100)
+    status, result = execute_replica_query("SELECT 1", corrupt, "bigquery")
+    assert status == Database_Interface.REPLICA_ERROR_STATUS["bigquery"]
+    assert result.startswith("BigQuery (local replica) Error: replica could not be opened")
+
+
+def test_databases_without_a_replica_go_to_the_warehouse(replica_dir, local_snowflake):
+    set_local_replica(replica_dir, db_types=("snow",))
+    assert Database_Interface.replica_path("snow", "OTHER") is None
+    assert Database_Interface.replica_path("bigquery", "SHOP") is None
+    status, result = db_interface("snow", "SELECT name FROM customers WHERE id = 2", "OTHER")
+    assert status == 0 and "Bob" in result
+    with pytest.raises(ValueError):
+        set_local_replica(replica_dir, mode="sometimes")
+
+
+def test_exploration_mode_falls_back_to_the_warehouse(replica_dir, local_snowflake):
+    set_local_replica(replica_dir, db_types=("snow",), mode="exploration")
+    # Single queries always go to the warehouse
+    status, result = db_interface("snow", "SELECT name FROM customers WHERE id = 1", "SHOP")
+    assert status == 0 and "Ann" in result and local_snowflake.stats["connects"] == 1
+    # Batches try the replica first; empty results and failures are re-run on the warehouse
+    results = db_interface_many("snow", ["SELECT name FROM customers WHERE id = 1",
+                                         "SELECT name FROM customers WHERE id = 2",
+                                         "SELECT city FROM customers WHERE id = 2"], "SHOP")
+    assert [r["status"] for r in results] == [0, 0, 0]
+    assert "Ann" in results[0]["result"] and "Bob" in results[1]["result"] and "Rome" in results[2]["result"]
@@ -0,0 +1,106 @@
+import sqlite3
+
+import pymysql
+import pytest
+
+from utils.Database_Interface import execute_mysql_query, is_read_only_mysql_query, set_mysql_connector
+from utils.DBsetup.Local_Connector import make_local_mysql_connect
+
+CREDENTIALS = {"host": "local", "port": 3306, "user": "u", "password": "p"}
+
+
+@pytest.fixture
+def mysql_dir(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "shop.sqlite"))
+    conn.executescript("CREATE TABLE orders (id INTEGER PRIMARY KEY, amount REAL);"
+                       "INSERT INTO orders VALUES (1, 10.0), (2, 20.0);")
+    conn.commit()
+    conn.close()
+    yield tmp_path
+    set_mysql_connector(pymysql.connect)
+
+
+def dropping_connect(db_dir, drop_when):
+    """The local stand-in, except that the first statement matching drop_when(query, sent) loses the connection."""
+    connect = make_local_mysql_connect(str(db_dir))
+    dropped = []
+
+    def flaky_connect(**kwargs):
+        conn = connect(**kwargs)
+        make_cursor = conn.cursor
+
+        def cursor(cursor=None):
+            local_cursor = make_cursor()
+            execute = local_cursor.execute
+
+            def execute_or_drop(query, args=None):
+                if not dropped and drop_when(query, False):
+                    dropped.append(query)
+                    raise pymysql.err.OperationalError(2006, "MySQL server has gone away")
+                result = execute(query, args)
+                if not dropped and drop_when(query, True):
+                    dropped.append(query)
+                    conn.commit()  # The server applied the statement; only the reply was lost
+                    raise pymysql.err.OperationalError(2013, "Lost connection to MySQL server during query")
+                return result
+
+            local_cursor.execute = execute_or_drop
+            return local_cursor
+
+        conn.cursor = cursor
+        return conn
+
+    flaky_connect.stats = connect.stats
+    flaky_connect.dropped = dropped
+    return flaky_connect
+
+
+def count_orders(db_dir):
+    conn = sqlite3.connect(str(db_dir / "shop.sqlite"))
+    try:
+        return conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_read_only_statements():
+    for query in ("SELECT 1", "  with t AS (SELECT 1) SELECT * FROM t", "(SELECT 1) UNION (SELECT 2)", "SHOW TABLES",
+                  "DESCRIBE orders", "EXPLAIN SELECT 1", "-- note\nSELECT 1", "/* hint */ SELECT amount FROM orders"):
+        assert is_read_only_mysql_query(query), query
+    for query in ("INSERT INTO orders VALUES (3, 1)", "UPDATE orders SET amount = 0", "DELETE FROM orders",
+                  "WITH t AS (SELECT 1) DELETE FROM orders", "SELECT * INTO OUTFILE '/tmp/x' FROM orders",
+                  "CREATE TABLE t (x INT)", "DROP TABLE orders"):
+        assert not is_read_only_mysql_query(query), query
+
+
+def test_query_runs_on_the_local_stand_in(mysql_dir):
+    set_mysql_connector(make_local_mysql_connect(str(mysql_dir)))
+    status, result = execute_mysql_query("SELECT SUM(amount) AS total FROM orders", CREDENTIALS, "shop")
+    assert status == 0 and "30.0" in result
+    status, result = execute_mysql_query("SELECT nope FROM orders", CREDENTIALS, "shop")
+    assert status == 1 and "nope" in result
+
+
+def test_read_after_lost_connection_is_retried(mysql_dir):
+    connect = dropping_connect(mysql_dir, lambda query, sent: sent and query.startswith("SELECT"))
+    set_mysql_connector(connect)
+    status, result = execute_mysql_query("SELECT COUNT(*) AS n FROM orders", CREDENTIALS, "shop")
+    assert status == 0 and "2" in result
+    assert connect.dropped and connect.stats["connects"] == 2
+
+
+def test_write_after_lost_connection_is_not_retried(mysql_dir):
+    connect = dropping_connect(mysql_dir, lambda query, sent: sent and query.startswith("INSERT"))
+    set_mysql_connector(connect)
+    status, result = execute_mysql_query("INSERT INTO orders (amount) VALUES (30.0)", CREDENTIALS, "shop", fetch_results=False)
+    assert status == 3 and "Lost connection" in result
+    assert count_orders(mysql_dir) == 3  # Applied once, not twice
+
+
+def test_write_that_never_reached_the_server_is_retried(mysql_dir):
+    # The connection is already gone when the session timeout is set, before the INSERT is sent
+    connect = dropping_connect(mysql_dir, lambda query, sent: not sent and query.startswith("SET"))
+    set_mysql_connector(connect)
+    status, result = execute_mysql_query("INSERT INTO orders (amount) VALUES (30.0)", CREDENTIALS, "shop", fetch_results=False)
+    assert status == 0 and result.startswith("Operation successful.")
+    assert count_orders(mysql_dir) == 3
@@ -0,0 +1,72 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+import utils.Database_Interface as Database_Interface
+from utils.Database_Interface import collect_bounded_rows, render_result_table
+
+UTC = datetime.timezone.utc
+
+# Result sets covering the dtype inference and number/date formatting that render_result_table mirrors
+PARITY_CASES = {
+    "ints and floats": [(1, 0.5), (2, 3)],
+    "nullable int": [(1,), (None,)],
+    "nullable text": [("x",), (None,)],
+    "nullable float": [(1.5,), (None,), (float("nan"),)],
+    "all null": [(None,), (None,)],
+    "bool": [(True,), (False,)],
+    "nullable bool": [(True,), (None,)],
+    "large floats": [(1.5e7,), (2.25,)],
+    "huge floats": [(1e20,), (1.0,)],
+    "tiny floats": [(1e-8,), (1.0,)],
+    "inf and large": [(float("inf"),), (1e7,), (1.123456789,)],
+    "big ints": [(10**12,), (-5,)],
+    "datetimes": [(datetime.datetime(2020, 1, 1, 12, 30),), (datetime.datetime(2021, 5, 6),)],
+    "dates only, nullable": [(datetime.datetime(2020, 1, 1),), (None,)],
+    "microseconds": [(datetime.datetime(2020, 1, 1, 0, 0, 0, 5),), (None,)],
+    "tz-aware": [(datetime.datetime(2020, 1, 1, tzinfo=UTC),), (datetime.datetime(2020, 1, 2, 3, tzinfo=UTC),)],
+    "dates": [(datetime.date(2020, 1, 1),), (datetime.date(2021, 5, 6),)],
+    "mixed objects": [("a",), (1.5,), (2,)],
+    "control characters": [("a\tb",), ("x\ny",)],
+    "short values, long header": [("a", 1), ("b", 2)],
+    "elided rows": [(i, i * 0.5, f"s{i}") for i in range(30)],
+    "elided rows with nulls": [(i if i % 3 else None, None if i % 4 == 0 else i * 1.5) for i in range(30)],
+    "null only in elided rows": [(None if i == 15 else i, None if i == 14 else "t") for i in range(30)],
+}
+
+
+@pytest.mark.parametrize("max_rows", [20, 10])
+@pytest.mark.parametrize("name", list(PARITY_CASES))
+def test_matches_dataframe_to_string(name, max_rows):
+    rows = PARITY_CASES[name]
+    columns = [f"col_{i}" for i in range(len(rows[0]))]
+    expected = pd.DataFrame(rows, columns=columns).to_string(index=True, show_dimensions=True, max_rows=max_rows)
+    assert render_result_table(collect_bounded_rows(columns, [rows], max_rows=max_rows)) == expected
+
+
+def test_bounded_fetch_keeps_head_and_tail_only():
+    batches = ([(i,)] for i in range(1000))
+    result = collect_bounded_rows(["n"], batches, max_rows=10)
+    assert result.total_rows == 1000 and result.exact
+    assert [row[0] for row in result.head] == [0, 1, 2, 3, 4]
+    assert [row[0] for row in result.tail] == [995, 996, 997, 998, 999]
+
+
+def test_row_limit_stops_fetching():
+    result = collect_bounded_rows(["n"], ([(i,)] for i in range(1000)), max_rows=10, row_limit=100)
+    assert not result.exact
+    assert render_result_table(result).endswith("[100+ rows x 1 columns]")
+
+
+def test_sqlite_output_has_no_empty_lines(shop_db):
+    status, output = Database_Interface.execute_sqlite_query("SELECT id, amount FROM orders ORDER BY id", shop_db)
+    assert status == 0
+    assert output.splitlines()[:5] == [
+        "   id  amount",
+        "0   1    50.5",
+        "1   2   150.0",
+        "2   3    20.0",
+        "[3 rows x 2 columns]",
+    ]
+    assert output.splitlines()[5].startswith("Query Time: ")
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import utils.Schema_Catalog as Schema_Catalog
+from utils.Schema_Catalog import SchemaCatalog, SeriesIndex, get_tables
+from utils.Schema_Store import load_schema_file
+
+SNOW_SCHEMA = {
+    "EVENTS": {
+        "EVENTS.CLICKS_20200101": [["ID", "NUMBER", "", ""]],
+        "EVENTS.VIEWS_20200101": [["ID", "NUMBER", "", ""]],
+        "EVENTS.USERS": [["ID", "NUMBER", "", ""], ["NAME", "TEXT", "", ""]],
+        "table_Information": {
+            "EVENTS.CLICKS_20200101": {"similar_tables": ["EVENTS.CLICKS_20200102", "EVENTS.CLICKS_20200103"]},
+            "EVENTS.VIEWS_20200101": {"similar_tables": ["EVENTS.VIEWS_20200102"]},
+        },
+        "table_description_summary": {},
+    },
+}
+
+
+def test_series_index_finds_the_surrogate_of_a_similar_table():
+    index = SeriesIndex(SNOW_SCHEMA, "snow", "DB")
+    assert index.surrogate_of("events.clicks_20200103", "events") == "EVENTS.CLICKS_20200101"
+    assert index.surrogate_of("events.views_20200102", "events") == "EVENTS.VIEWS_20200101"
+    assert index.surrogate_of("events.users", "events") is None
+    assert index.surrogate_of("events.clicks_20200103", "other") is None
+    assert index.table_map["events.users"] == "EVENTS.USERS"
+
+
+def test_series_index_matches_table_lists_ignoring_digits_in_file_order():
+    index = SeriesIndex(SNOW_SCHEMA, "snow", "DB")
+    assert index.tables_matching(["DB.EVENTS.VIEWS_20991231", 'DB."EVENTS".CLICKS_1']) == [
+        (None, "EVENTS", "EVENTS.CLICKS_20200101"), (None, "EVENTS", "EVENTS.VIEWS_20200101")]
+    assert index.tables_matching(["OTHER.EVENTS.USERS"]) == []
+
+
+def test_series_index_keeps_bigquery_projects_apart():
+    schema = {
+        "proj-a": {"sales": {"sales.orders": [["id", "INT64", "", ""]],
+                             "table_Information": {"sales.orders": {"similar_tables": ["sales.orders_2021"]}}}},
+        "proj-b": {"sales": {"sales.orders": [["id", "INT64", "", ""]]}},
+    }
+    index = SeriesIndex(schema, "bigquery", "task")
+    assert index.surrogate_of("sales.orders_2021", "sales", "proj-a") == "sales.orders"
+    assert index.surrogate_of("sales.orders_2021", "sales", "proj-b") is None
+    assert index.tables_matching(["proj-b.sales.orders"]) == [("proj-b", "sales", "sales.orders")]
+
+
+def write_schema(path, tables, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"shop": {name: [[column, 0, "TEXT", "", ""] for column in columns]
+                            for name, columns in tables.items()}, "foreign_keys": {}}, f)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_entries_are_reused_until_the_file_changes(tmp_path):
+    catalog = SchemaCatalog()
+    path = write_schema(str(tmp_path / "shop_M-Schema.json"), {"customers": ["id"]}, 1000)
+    entry = catalog.get(path)
+    tables = entry.tables("sqlite", "shop")
+    assert catalog.get(path) is entry and entry.tables("sqlite", "shop") is tables
+    write_schema(path, {"customers": ["id", "name"]}, 2000)
+    reloaded = catalog.get(path)
+    assert reloaded is not entry
+    assert [column.name for column in reloaded.tables("sqlite", "shop")["customers"].columns] == ["id", "name"]
+
+
+def test_least_recently_used_entries_are_dropped(tmp_path):
+    catalog = SchemaCatalog(max_databases=2)
+    paths = [write_schema(str(tmp_path / f"db{i}_M-Schema.json"), {"t": ["a"]}, 1000) for i in range(3)]
+    first = catalog.get(paths[0])
+    catalog.get(paths[1])
+    catalog.get(paths[0])
+    catalog.get(paths[2])
+    assert list(catalog._entries) == [paths[0], paths[2]]
+    assert catalog.get(paths[0]) is first
+
+
+def test_concurrent_callers_share_one_parse(tmp_path, monkeypatch):
+    path = write_schema(str(tmp_path / "shop_M-Schema.json"), {"customers": ["id"]}, 1000)
+    parses = []
+
+    def slow_load(json_path):
+        parses.append(json_path)
+        time.sleep(0.1)
+        return load_schema_file(json_path)
+
+    monkeypatch.setattr(Schema_Catalog, "load_schema_file", slow_load)
+    catalog = SchemaCatalog()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        entries = list(executor.map(lambda _: catalog.get(path), range(8)))
+    assert len(parses) == 1 and all(entry is entries[0] for entry in entries)
+    assert catalog._loading == {}
+
+
+def test_a_failed_parse_is_retried_on_the_next_call(tmp_path):
+    catalog = SchemaCatalog()
+    path = str(tmp_path / "shop_M-Schema.json")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    with pytest.raises(json.JSONDecodeError):
+        catalog.get(path)
+    assert catalog._loading == {} and catalog._entries == {}
+    write_schema(path, {"customers": ["id"]}, 1000)
+    assert "customers" in catalog.get(path).tables("sqlite", "shop")
+    with pytest.raises(FileNotFoundError):
+        catalog.get(str(tmp_path / "missing_M-Schema.json"))
+
+
+def test_get_tables_reads_the_database_directory(sqlite_dir):
+    tables = get_tables("shop", "sqlite")
+    assert list(tables) == ["customers", "orders"]
+    assert get_tables("shop", "sqlite") is tables
+    assert get_tables("nowhere", "sqlite") == {}
@@ -0,0 +1,151 @@
+import re
+import time
+import threading
+
+import pytest
+
+import utils.SL.Get_SL as Get_SL
+from utils.SL.SL_Cache import SLCache, cache_key, schema_fingerprint
+from utils.app_logs.logger_config import log_context
+
+
+class StubLogger:
+    def log(self, **kwargs):
+        pass
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    """LLM_output stand-in: replies with the draft SQL that reply(prompt) returns, after delay(prompt) seconds."""
+    stub = {"reply": lambda prompt: "SELECT 1", "delay": lambda prompt: 0.0, "threads": []}
+
+    def llm_output(messages, model, temperature):
+        prompt = messages[0]["content"]
+        stub["threads"].append(threading.current_thread())
+        time.sleep(stub["delay"](prompt))
+        return 10, 10, "", f"```sql\n{stub['reply'](prompt)}\n```"
+
+    monkeypatch.setattr(Get_SL, "LLM_output", llm_output)
+    monkeypatch.setattr(Get_SL, "log_llm_io", lambda **kwargs: None)
+    monkeypatch.setattr(Get_SL, "logger_status", StubLogger(), raising=False)
+    return stub
+
+
+def test_concurrent_results_keep_the_input_order_and_log_context():
+    log_context.question_id = "q7"
+
+    def work(i):
+        time.sleep(0.05 * (4 - i))  # later items finish first
+        return i, getattr(log_context, "question_id", None), threading.current_thread()
+
+    results = Get_SL._run_concurrently(work, range(5), max_workers=5)
+    assert [i for i, _, _ in results] == [0, 1, 2, 3, 4]
+    assert {question_id for _, question_id, _ in results} == {"q7"}
+    assert threading.current_thread() not in {thread for _, _, thread in results}
+    # One worker runs the calls in order on the calling thread
+    assert {thread for _, _, thread in Get_SL._run_concurrently(work, range(3), max_workers=1)} == {threading.current_thread()}
+
+
+def test_sampling_rounds_run_at_once_and_failed_rounds_are_skipped(stub_llm):
+    stub_llm["delay"] = lambda prompt: 0.3
+    replies = iter(["SELECT a FROM t", "not a query", "SELECT b FROM t"])
+    lock = threading.Lock()
+
+    def reply(prompt):
+        with lock:
+            return next(replies)
+
+    stub_llm["reply"] = reply
+
+    def extract(sql):
+        if not sql.startswith("SELECT"):
+            raise ValueError("no tables")
+        return {"t": re.findall(r"SELECT (\w+)", sql)}
+
+    start = time.monotonic()
+    samples, history = Get_SL._sampling_rounds("q1", "prompt", "model", 1, 1, extract)
+    assert time.monotonic() - start < 0.85  # 0.9 s one after the other
+    assert sorted(samples, key=str) == [{"t": ["a"]}, {"t": ["b"]}]
+    assert len(history) == 2 and list(history.values()) == samples and list(history) == sorted(history)
+
+
+def test_old_workflow_links_the_tables_concurrently(sqlite_dir, stub_llm):
+    stub_llm["delay"] = lambda prompt: 0.3
+    stub_llm["reply"] = lambda prompt: ("SELECT name FROM customers" if "# Table: customers" in prompt
+                                        else "SELECT amount, customer_id FROM orders")
+    start = time.monotonic()
+    tables, schema, history = Get_SL.SL_workflow_old("q1", "Who spent most?", "shop", Tool_model="tool",
+                                                     db_type="sqlite", table_list=["customers", "orders"])
+    assert time.monotonic() - start < 0.6  # 0.6 s one after the other
+    assert (tables, schema, history) == (["customers", "orders"],
+                                         {"customers": ["name"], "orders": ["amount", "customer_id"]}, {})
+    assert len(set(stub_llm["threads"])) == 2
+
+
+def test_concurrency_of_one_restores_sequential_calls(sqlite_dir, stub_llm, monkeypatch):
+    monkeypatch.setattr(Get_SL, "SL_SAMPLING_CONCURRENCY", 1)
+    stub_llm["reply"] = lambda prompt: "SELECT city FROM customers"
+    tables, schema, history = Get_SL.SL_workflow_min("q1", "Where do they live?", "shop", ["customers", "orders"],
+                                                     Tool_model="tool", db_type="sqlite")
+    assert (tables, schema) == (["customers"], {"customers": ["city"]})
+    assert history == {i: {"customers": ["city"]} for i in range(Get_SL.SL_SAMPLING_ROUNDS)}
+    assert set(stub_llm["threads"]) == {threading.current_thread()}
+
+
+def test_cache_round_trip_and_least_recently_used_eviction(tmp_path):
+    cache = SLCache(str(tmp_path / "cache" / "SL_cache.sqlite"), max_entries=2)
+    cache.put("a", "shop", ["customers"], {"customers": ["name"]}, {0: {"customers": ["name"]}})
+    assert cache.get("a") == (["customers"], {"customers": ["name"]}, {0: {"customers": ["name"]}})
+    time.sleep(0.01)
+    cache.put("b", "shop", ["orders"], {}, {})
+    time.sleep(0.01)
+    assert cache.get("a") is not None  # a is now the most recently used
+    time.sleep(0.01)
+    cache.put("c", "shop", ["orders"], {}, {})
+    assert cache.get("b") is None and cache.get("a") is not None and cache.get("c") is not None
+    cache.clear()
+    assert cache.get("a") is None
+
+
+def test_old_entries_are_dropped(tmp_path):
+    cache = SLCache(str(tmp_path / "SL_cache.sqlite"), max_age_days=0.1 / 86400)
+    cache.put("a", "shop", ["customers"], {}, {})
+    time.sleep(0.2)
+    assert cache.get("a") is None
+
+
+def test_cache_keys(sqlite_dir):
+    fingerprint = schema_fingerprint("shop", "sqlite")
+    assert fingerprint is not None and schema_fingerprint("nowhere", "sqlite") is None
+    key = cache_key("Who lives in  Paris?\n", "shop", "sqlite", fingerprint, {"model": "m"})
+    assert cache_key("Who lives in Paris?", "shop", "sqlite", fingerprint, {"model": "m"}) == key
+    # Case is kept: literals are case-sensitive
+    assert cache_key("Who lives in paris?", "shop", "sqlite", fingerprint, {"model": "m"}) != key
+    assert cache_key("Who lives in Paris?", "shop", "sqlite", "other", {"model": "m"}) != key
+    assert cache_key("Who lives in Paris?", "shop", "sqlite", fingerprint, {"model": "n"}) != key
+
+
+def test_linking_results_are_reused_for_the_same_question(sqlite_dir, tmp_path, monkeypatch):
+    cache = SLCache(str(tmp_path / "SL_cache.sqlite"))
+    monkeypatch.setattr(Get_SL, "get_sl_cache", lambda: cache)
+    calls = []
+
+    def sl_workflow(Question_id, Question, db_id, Tool_model, model="deepseek-chat", db_type="snow"):
+        calls.append((Question, model))
+        if "nothing" in Question:
+            return [], {}, {}
+        return ["customers"], {"customers": ["city"]}, {0: {"customers": ["city"]}}
+
+    monkeypatch.setattr(Get_SL, "SL_workflow", sl_workflow)
+    expected = (["customers"], {"customers": ["city"]}, {0: {"customers": ["city"]}})
+    assert Get_SL.cached_SL_workflow("q1", "Who lives in Paris?", "shop", "tool", db_type="sqlite") == expected
+    assert Get_SL.cached_SL_workflow("q2", "Who lives in  Paris?", "shop", "tool", db_type="sqlite") == expected
+    assert len(calls) == 1
+    Get_SL.cached_SL_workflow("q3", "Who lives in paris?", "shop", "tool", db_type="sqlite")
+    Get_SL.cached_SL_workflow("q4", "Who lives in Paris?", "shop", "tool", db_type="sqlite", model="other")
+    Get_SL.cached_SL_workflow("q5", "Who lives in Paris?", "shop", "tool", db_type="sqlite", use_cache=False)
+    assert len(calls) == 4
+    # Empty results are not stored
+    Get_SL.cached_SL_workflow("q6", "Link nothing", "shop", "tool", db_type="sqlite")
+    Get_SL.cached_SL_workflow("q7", "Link nothing", "shop", "tool", db_type="sqlite")
+    assert len(calls) == 6
@@ -0,0 +1,79 @@
+import os
+import json
+
+import pytest
+
+import utils.Database_Interface as Database_Interface
+from utils.Database_Interface import M_Schema, render_pruned_schema
+from utils.Schema_Catalog import get_tables
+from utils.Schema_Pruning import prune_schema
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def column(name, col_type, description="", examples="", primary_key=False):
+    return [name, "Primary Key" if primary_key else None, col_type, description, examples]
+
+
+@pytest.fixture
+def wide_db(sqlite_dir):
+    """A table of described, exemplified metric columns and a two-table series; only the M-Schema is needed."""
+    readings = [column("id", "INTEGER", "row id", "1, 2", primary_key=True)] + [
+        column(f"metric_{i}", "REAL", f"measurement number {i}", f"{i}.5, {i}.25") for i in range(8)]
+    sensors = [column("id", "INTEGER", primary_key=True), column("value", "REAL", examples="1.0")]
+    schema = {"wide": {"readings": readings, "sensor_2020": sensors, "sensor_2021": sensors}, "foreign_keys": {}}
+    os.makedirs(os.path.join(sqlite_dir, "wide"))
+    with open(os.path.join(sqlite_dir, "wide", "wide_M-Schema.json"), "w", encoding="utf-8") as f:
+        json.dump(schema, f)
+    return M_Schema(db_id="wide", db_type="sqlite")
+
+
+def prune(text, max_tokens, question="how large is metric 3"):
+    return prune_schema(text, get_tables("wide", "sqlite"), "sqlite", max_tokens, question=question,
+                        count_tokens=count_words)
+
+
+def test_schemas_within_the_budget_are_unchanged(wide_db):
+    assert prune(wide_db, 1000) == (wide_db, count_words(wide_db))
+
+
+def test_examples_go_before_descriptions(wide_db):
+    text, tokens = prune(wide_db, count_words(wide_db) - 20)
+    assert tokens == count_words(text) <= count_words(wide_db) - 20
+    assert text.count("measurement number") == 8
+    # The least relevant columns lose their examples first
+    assert "(metric_7: REAL, measurement number 7)" in text and "(id: INTEGER, Primary Key, row id)," in text
+    assert "(metric_3: REAL, measurement number 3, Examples: [3.5, 3.25])," in text
+
+
+def test_low_relevance_columns_go_before_the_question_columns_and_keys(wide_db):
+    text, tokens = prune(wide_db, 80)
+    assert tokens <= 80 and "measurement number" not in text
+    assert "(id: INTEGER, Primary Key)," in text and "(metric_3: REAL)" in text
+    # Among equally relevant columns the later ones are dropped first
+    assert "metric_7" not in text and "metric_0" in text
+
+
+def test_table_series_are_collapsed_last(wide_db):
+    text, tokens = prune(wide_db, 65)
+    assert tokens <= 65
+    assert "# Table: sensor_2021" not in text
+    assert "# Similar tables (same columns as sensor_2020): sensor_2021" in text
+    assert [line for line in text.splitlines() if line.startswith("(")] == [
+        "(id: INTEGER, Primary Key),", "(metric_3: REAL)", "(id: INTEGER, Primary Key)"]
+
+
+def test_unreachable_budgets_return_the_smallest_schema(wide_db, capsys):
+    smallest, _ = prune(wide_db, 65)
+    assert prune(wide_db, 10) == (smallest, count_words(smallest))
+    assert "still above the budget of 10" in capsys.readouterr().out
+
+
+def test_pruned_renders_are_cached(wide_db, monkeypatch):
+    monkeypatch.setattr(Database_Interface, "get_token_count", count_words)
+    pruned = render_pruned_schema("wide", db_type="sqlite", max_tokens=80, question="metric 3")
+    assert pruned.token_count <= 80 and "(metric_3: REAL)" in pruned.text
+    assert render_pruned_schema("wide", db_type="sqlite", max_tokens=80, question="metric 3") is pruned
+    assert render_pruned_schema("wide", db_type="sqlite", max_tokens=1000).text == wide_db
@@ -0,0 +1,66 @@
+import os
+import time
+
+import pytest
+
+import utils.Database_Interface as Database_Interface
+from utils.Database_Interface import clear_render_cache, render_schema
+from conftest import SHOP_STATEMENTS, write_sqlite_database
+
+
+@pytest.fixture
+def counted_renders(sqlite_dir, monkeypatch):
+    calls = []
+    m_schema = Database_Interface.M_Schema
+
+    def counting_m_schema(**kwargs):
+        calls.append(kwargs["SL"])
+        return m_schema(**kwargs)
+
+    monkeypatch.setattr(Database_Interface, "M_Schema", counting_m_schema)
+    return calls
+
+
+def test_renders_are_built_and_counted_once(counted_renders, monkeypatch):
+    counts = []
+    monkeypatch.setattr(Database_Interface, "get_token_count", lambda text: counts.append(text) or len(text.split()))
+    rendered = render_schema("shop", ["customers"], "sqlite")
+    assert "# Table: customers" in rendered.text and "# Table: orders" not in rendered.text
+    assert rendered.token_count == rendered.token_count == len(rendered.text.split())
+    # Surrounding whitespace in the selection does not change the render
+    assert render_schema("shop", [" customers "], "sqlite") is rendered
+    assert counted_renders == [["customers"]] and len(counts) == 1
+    assert render_schema("shop", None, "sqlite") is not rendered
+    assert render_schema("shop", ["customers"], "sqlite", level="column") is not rendered
+    assert len(counted_renders) == 3
+
+
+def test_ddl_renders_are_cached_separately(counted_renders):
+    ddl = render_schema("shop", ["orders"], "sqlite", kind="ddl")
+    assert ddl.text.startswith("CREATE TABLE orders") and counted_renders == []
+    assert render_schema("shop", ["orders"], "sqlite", kind="ddl") is ddl
+    with pytest.raises(ValueError):
+        render_schema("shop", ["orders"], "sqlite", kind="html")
+
+
+def test_renders_are_dropped_when_the_schema_file_changes(sqlite_dir, counted_renders):
+    rendered = render_schema("shop", ["customers"], "sqlite")
+    os.remove(os.path.join(sqlite_dir, "shop", "shop.sqlite"))
+    write_sqlite_database(sqlite_dir, "shop", SHOP_STATEMENTS + ["ALTER TABLE customers ADD COLUMN country TEXT"])
+    json_path = os.path.join(sqlite_dir, "shop", "shop_M-Schema.json")
+    os.utime(json_path, (time.time() + 10, time.time() + 10))
+    updated = render_schema("shop", ["customers"], "sqlite")
+    assert updated is not rendered and "country" in updated.text and "country" not in rendered.text
+
+
+def test_least_recently_used_renders_are_evicted(counted_renders, monkeypatch):
+    monkeypatch.setattr(Database_Interface, "SCHEMA_RENDER_CACHE_SIZE", 2)
+    first = render_schema("shop", ["customers"], "sqlite")
+    render_schema("shop", ["orders"], "sqlite")
+    assert render_schema("shop", ["customers"], "sqlite") is first
+    render_schema("shop", None, "sqlite")
+    assert render_schema("shop", ["customers"], "sqlite") is first
+    render_schema("shop", ["orders"], "sqlite")
+    assert len(counted_renders) == 4
+    clear_render_cache()
+    assert render_schema("shop", ["customers"], "sqlite") is not first
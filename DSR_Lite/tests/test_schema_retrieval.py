@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+
+from utils.Schema_Catalog import build_tables, schema_catalog
+from utils.Schema_Retrieval import RetrievalIndex, build_index, index_path, rank_tables, tokenize
+
+
+def test_tokenize_splits_names_and_drops_stopwords():
+    assert tokenize("Show the customerName of ORDER_LINES") == ["customer", "name", "order", "lines"]
+    assert tokenize(None) == []
+
+
+def test_bm25_ranks_the_matching_table_first():
+    index = RetrievalIndex.build(["customers", "orders", "stores"],
+                                 ["customers name city", "orders amount customer date", "stores city region"])
+    assert index.rank("order amount per day") == ["orders", "customers", "stores"]
+    assert index.rank("city of each region")[0] == "stores"
+    # Unknown words score nothing; ties keep schema order
+    assert index.rank("zebra") == ["customers", "orders", "stores"]
+    assert index.rank("city", top_k=1) == ["customers"]
+
+
+def test_bm25_matches_the_reference_formula():
+    documents = ["e b b", "b c", "c c c d"]
+    index = RetrievalIndex.build(["x", "y", "z"], documents)
+    docs = [d.split() for d in documents]
+    average = sum(len(d) for d in docs) / len(docs)
+    expected = []
+    for doc in docs:
+        score = 0.0
+        for term in ("b", "c"):
+            df = sum(term in d for d in docs)
+            idf = np.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            tf = doc.count(term)
+            score += idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * len(doc) / average))
+        expected.append(score)
+    assert np.allclose(index.bm25("b c"), expected)
+
+
+def test_saved_index_loads_with_the_same_ranking(tmp_path):
+    schema = {"DB": {"DB.SALES": [["AMOUNT", "NUMBER", "sale amount", ""]],
+                     "DB.STAFF": [["NAME", "TEXT", "employee name", ""]]}}
+    index = build_index(build_tables(schema, "snow", "DB"), "snow", "DB")
+    assert index.tables == ["DB.DB.SALES", "DB.DB.STAFF"]
+    path = str(tmp_path / "db.retrieval.npz")
+    index.save(path)
+    loaded = RetrievalIndex.load(path)
+    for question in ("total sale amount", "employee names"):
+        assert loaded.rank(question) == index.rank(question)
+
+
+def test_rank_tables_ignores_an_index_older_than_its_schema(sqlite_dir):
+    json_path = os.path.join(sqlite_dir, "shop", "shop_M-Schema.json")
+    assert rank_tables("shop", "sqlite", "which city does each customer live in")[0] == "customers"
+    # An index that is older than the JSON is not trusted
+    RetrievalIndex.build(["orders"], ["customer city"]).save(index_path(json_path))
+    os.utime(index_path(json_path), (0, 0))
+    schema_catalog.clear()
+    assert rank_tables("shop", "sqlite", "customer city", top_k=5) == ["customers", "orders"]
+    assert rank_tables("nope", "sqlite", "customer city") == []
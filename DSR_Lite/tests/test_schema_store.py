@@ -0,0 +1,97 @@
+import os
+import json
+
+import pytest
+
+import utils.Schema_Catalog as Schema_Catalog
+import utils.Database_Interface as Database_Interface
+from utils.Schema_Store import SchemaStore, load_schema_file, store_path, write_schema_store
+
+pytest.importorskip("msgpack")
+
+SNOW_SCHEMA = {
+    "SALES": {
+        "SALES.ORDERS": [["ID", "NUMBER", "order id", ""], ["AMOUNT", "FLOAT", "", "examples: [1.5, 2]"]],
+        "SALES.EVENTS_2020": [["EVENT", "TEXT", "", ""]],
+        "SALES.EVENTS_2021": [["EVENT", "TEXT", "", ""]],
+        "table_Information": {"SALES.EVENTS_2020": {"similar_tables": ["SALES.EVENTS_2021"]}},
+        "table_description_summary": {"SALES.ORDERS": "One row per order."},
+    },
+    "HR": {"HR.PEOPLE": [["NAME", "TEXT", "", ""]]},
+}
+BIGQUERY_SCHEMA = {"bigquery-public-data": {"news": {
+    "news.articles": [["id", "INT64", "", ""], ["title", "STRING", "", ""]],
+    "news.authors": [["name", "STRING", "", ""]],
+}}}
+
+
+def _write(base_dir, db_id, schema, pack):
+    os.makedirs(os.path.join(base_dir, db_id))
+    json_path = os.path.join(base_dir, db_id, f"{db_id}_M-Schema.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(schema, f)
+    if pack:
+        write_schema_store(schema, json_path)
+    return json_path
+
+
+@pytest.fixture
+def warehouse_dirs(tmp_path, monkeypatch):
+    dirs = {}
+    for db_type, attr in (("snow", "snow_DB_dir"), ("bigquery", "bigquery_DB_dir")):
+        dirs[db_type] = str(tmp_path / db_type)
+        os.makedirs(dirs[db_type])
+        monkeypatch.setattr(Schema_Catalog, attr, dirs[db_type])
+        monkeypatch.setattr(Database_Interface, attr, dirs[db_type])
+    Schema_Catalog.schema_catalog.clear()
+    Database_Interface.clear_render_cache()
+    yield dirs
+    Schema_Catalog.schema_catalog.clear()
+    Database_Interface.clear_render_cache()
+
+
+def test_pack_round_trip(tmp_path):
+    json_path = _write(str(tmp_path), "SHOP", SNOW_SCHEMA, pack=True)
+    assert load_schema_file(json_path) == SNOW_SCHEMA
+    with SchemaStore(store_path(json_path)) as store:
+        assert store.table(("SALES", "SALES.ORDERS")) == SNOW_SCHEMA["SALES"]["SALES.ORDERS"]
+        assert store.table(("SALES", "SALES.MISSING")) is None
+        assert store.skeleton()["SALES"]["SALES.ORDERS"] is None
+        assert store.skeleton()["SALES"]["table_Information"] == SNOW_SCHEMA["SALES"]["table_Information"]
+
+
+def test_stale_pack_is_ignored(tmp_path):
+    json_path = _write(str(tmp_path), "SHOP", SNOW_SCHEMA, pack=True)
+    changed = {"SALES": {"SALES.ORDERS": [["ID", "NUMBER", "", ""]]}}
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(changed, f)
+    os.utime(store_path(json_path), (0, 0))
+    assert load_schema_file(json_path) == changed
+
+
+@pytest.mark.parametrize("db_type, db_id, schema, SL", [
+    ("snow", "SHOP", SNOW_SCHEMA, ["SHOP.SALES.ORDERS", "SHOP.SALES.EVENTS_2021", "SHOP.HR.PEOPLE"]),
+    ("bigquery", "task1", BIGQUERY_SCHEMA, ["bigquery-public-data.news.authors"]),
+])
+def test_small_selection_reads_single_tables(warehouse_dirs, db_type, db_id, schema, SL):
+    _write(warehouse_dirs[db_type], db_id, schema, pack=False)
+    from_json = Database_Interface.M_Schema(db_id, SL=list(SL), db_type=db_type)
+    Schema_Catalog.schema_catalog.clear()
+
+    json_path = Schema_Catalog.schema_json_path(db_id, db_type)
+    write_schema_store(schema, json_path)
+    from_pack = Database_Interface.M_Schema(db_id, SL=list(SL), db_type=db_type)
+    assert from_pack == from_json
+    assert "(Detailed column information not found" not in from_pack
+    # Only the skeleton and the selected tables were decoded; the whole schema was never loaded
+    assert json_path not in Schema_Catalog.schema_catalog._entries
+    assert json_path in Schema_Catalog.schema_catalog._outlines
+
+
+def test_full_renders_and_loaded_files_use_the_catalog_entry(warehouse_dirs):
+    json_path = _write(warehouse_dirs["snow"], "SHOP", SNOW_SCHEMA, pack=True)
+    Database_Interface.M_Schema("SHOP", SL=None, db_type="snow")
+    assert json_path in Schema_Catalog.schema_catalog._entries
+    entry, columns_of = Schema_Catalog.schema_catalog.table_reader(json_path, 1)
+    assert entry is Schema_Catalog.schema_catalog._entries[json_path]
+    assert columns_of("HR", "HR.PEOPLE") == SNOW_SCHEMA["HR"]["HR.PEOPLE"]
@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from snowflake.connector.constants import QueryStatus
+
+import utils.Database_Interface as Database_Interface
+from utils.Database_Interface import execute_snowflake_queries_async, execute_snowflake_query, get_snowflake_pool
+from conftest import LOCAL_SNOWFLAKE_CREDENTIALS as CREDENTIALS
+
+SLOW_QUERY = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) "
+              "SELECT SUM(i) FROM n")
+
+
+def test_sessions_are_opened_once_and_reused(local_snowflake):
+    for _ in range(5):
+        status, result = execute_snowflake_query("SELECT name FROM customers WHERE id = 1", CREDENTIALS, "SHOP")
+        assert status == 0 and "Ann" in result
+    assert local_snowflake.stats["connects"] == 1
+
+
+def test_concurrent_queries_share_the_pool(local_snowflake):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda i: execute_snowflake_query(f"SELECT {i} AS n", CREDENTIALS, "SHOP"), range(16)))
+    assert all(status == 0 for status, _ in results)
+    assert local_snowflake.stats["connects"] <= Database_Interface.SNOWFLAKE_POOL_SIZE
+
+
+def test_programming_errors_are_not_retried_and_keep_the_session(local_snowflake):
+    status, result = execute_snowflake_query("SELECT * FROM missing", CREDENTIALS, "SHOP")
+    assert status == 1 and result.startswith("Snowflake Programming Error:") and "missing" in result
+    assert execute_snowflake_query("SELECT 1", CREDENTIALS, "SHOP")[0] == 0
+    assert local_snowflake.stats["connects"] == 1
+
+
+def test_a_closed_session_is_replaced(local_snowflake):
+    pool = get_snowflake_pool(CREDENTIALS)
+    conn = pool.acquire()
+    conn.close()  # e.g. the session expired while idle
+    pool.release(conn)
+    # The failed attempt drops the session and the retry runs on a new one
+    assert execute_snowflake_query("SELECT 1", CREDENTIALS, "SHOP")[0] == 0
+    assert execute_snowflake_query("SELECT 1", CREDENTIALS, "SHOP")[0] == 0
+    assert local_snowflake.stats["connects"] == 2
+
+
+def test_timeouts_are_retried_up_to_the_limit_and_the_deadline(local_snowflake):
+    assert execute_snowflake_query(SLOW_QUERY, CREDENTIALS, "SHOP", timeout=0.1, max_retries=2) == \
+        (3, "Execution timed out after 2 attempts.")
+    status, result = execute_snowflake_query(SLOW_QUERY, CREDENTIALS, "SHOP", timeout=0.1, max_retries=10,
+                                             deadline=time.monotonic() + 0.25)
+    assert status == 3 and result.startswith("Execution timed out: deadline reached")
+    # A timed-out statement does not break its session
+    assert local_snowflake.stats["connects"] == 1
+
+
+def test_async_batch_runs_on_one_session_in_input_order(local_snowflake, monkeypatch):
+    monkeypatch.setattr(Database_Interface, "SNOWFLAKE_POLL_INTERVAL", 0.01)
+    queries = ["SELECT name FROM customers WHERE id = 3", "SELECT * FROM missing", "SELECT COUNT(*) AS n FROM orders"]
+    results = execute_snowflake_queries_async(queries, CREDENTIALS)
+    assert [status for status, _ in results] == [0, 1, 0]
+    assert "Cid" in results[0][1] and "missing" in results[1][1] and results[2][1].splitlines()[1].split()[-1] == "3"
+    assert local_snowflake.stats["connects"] == 1
+
+
+def test_async_timeout_cancels_the_statement(local_snowflake, monkeypatch):
+    monkeypatch.setattr(Database_Interface, "SNOWFLAKE_POLL_INTERVAL", 0.01)
+    start = time.monotonic()
+    (status, result), = execute_snowflake_queries_async([SLOW_QUERY], CREDENTIALS, timeout=0.2)
+    assert status == 3 and result.startswith("Timeout: query ") and result.endswith("was cancelled.")
+    assert time.monotonic() - start < 5
+    conn = get_snowflake_pool(CREDENTIALS).acquire()
+    query, = conn._async_queries.values()
+    query._thread.join(5)
+    assert query.status == QueryStatus.ABORTED
+
+
+def test_async_mode_routes_single_queries_through_query_ids(local_snowflake, monkeypatch):
+    monkeypatch.setattr(Database_Interface, "SNOWFLAKE_EXECUTION_MODE", "async")
+    monkeypatch.setattr(Database_Interface, "SNOWFLAKE_POLL_INTERVAL", 0.01)
+    status, result = execute_snowflake_query("SELECT city FROM customers WHERE id = 2", CREDENTIALS, "SHOP")
+    assert status == 0 and "Rome" in result
+    conn = get_snowflake_pool(CREDENTIALS).acquire()
+    assert len(conn._async_queries) == 1
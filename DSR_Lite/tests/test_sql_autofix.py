@@ -0,0 +1,100 @@
+from utils.SQL_AutoFix import auto_fix_sql, identifier_hint
+from utils.SQL_Preflight import SchemaLookup
+
+
+def shop_lookup(db_type="sqlite"):
+    lookup = SchemaLookup(db_type, "shop")
+    lookup.add_table("customers", ["id", "name", "city", "customers_id"])
+    lookup.add_table("orders", ["id", "customer_id", "amount", "start_date", "end_date"])
+    return lookup
+
+
+def test_punctuation_and_case_variants_are_rewritten():
+    lookup = shop_lookup()
+    assert auto_fix_sql("SELECT startdate FROM orders", "no such column: startdate", "sqlite", lookup) == \
+        ("SELECT start_date FROM orders", "fuzzy_identifier")
+    assert auto_fix_sql("SELECT Start_Date FROM orders", "no such column: Start_Date", "sqlite", lookup) == \
+        ("SELECT start_date FROM orders", "fuzzy_identifier")
+    assert auto_fix_sql("SELECT amount FROM Order_s", "no such table: Order_s", "sqlite", lookup) == \
+        ("SELECT amount FROM orders", "fuzzy_identifier")
+
+
+def test_near_synonyms_are_not_rewritten():
+    lookup = shop_lookup()
+    # One edit away from another real column, but a different meaning
+    assert auto_fix_sql("SELECT star_date FROM orders", "no such column: star_date", "sqlite", lookup) == (None, None)
+    assert auto_fix_sql("SELECT begin_date FROM orders", "no such column: begin_date", "sqlite", lookup) == (None, None)
+    assert auto_fix_sql("SELECT customer_ids FROM customers JOIN orders ON 1 = 1",
+                        "no such column: customer_ids", "sqlite", lookup) == (None, None)
+
+
+def test_ambiguous_spelling_variants_are_not_rewritten():
+    lookup = shop_lookup()
+    lookup.add_table("events", ["startdate", "start_date"])
+    assert auto_fix_sql("SELECT StartDate FROM events", "no such column: StartDate", "sqlite", lookup) == (None, None)
+
+
+def test_rejected_candidates_are_offered_as_a_hint():
+    lookup = shop_lookup()
+    sql = "SELECT customer_id FROM customers"
+    assert auto_fix_sql(sql, "no such column: customer_id", "sqlite", lookup) == (None, None)
+    assert identifier_hint(sql, "no such column: customer_id", "sqlite", lookup) == \
+        "\nClosest columns in the schema to 'customer_id': customers_id"
+
+
+def test_snowflake_rewrite_is_quoted():
+    lookup = SchemaLookup("snow", "DB")
+    lookup.add_table("PUBLIC.ORDERS", ["ORDER_ID", "amount"])
+    fixed, rule = auto_fix_sql('SELECT orderid FROM PUBLIC.ORDERS', "invalid identifier 'ORDERID'", "snow", lookup)
+    assert (fixed, rule) == ('SELECT "ORDER_ID" FROM PUBLIC.ORDERS', "fuzzy_identifier")
+
+
+def snow_lookup():
+    lookup = SchemaLookup("snow", "DB")
+    lookup.add_table("PUBLIC.orders", ["order_id", "Amount"])
+    lookup.add_table("PUBLIC.CUSTOMERS", ["ID"])
+    return lookup
+
+
+def test_snowflake_backticks_become_double_quotes_outside_comments():
+    sql = 'SELECT `order_id` FROM DB.PUBLIC."orders" -- keep `this`'
+    error = "SQL compilation error: syntax error line 1 at position 7 unexpected '`'."
+    assert auto_fix_sql(sql, error, "snow", snow_lookup()) == \
+        ('SELECT "order_id" FROM DB.PUBLIC."orders" -- keep `this`', "snow_backticks")
+
+
+def test_snowflake_identifiers_get_their_exact_case_quoted():
+    error = "SQL compilation error: error line 1 at position 7 invalid identifier 'ORDER_ID'"
+    assert auto_fix_sql('SELECT order_id FROM DB.PUBLIC."orders"', error, "snow", snow_lookup()) == \
+        ('SELECT "order_id" FROM DB.PUBLIC."orders"', "snow_identifier_case")
+    error = "Object 'DB.PUBLIC.ORDERS' does not exist or not authorized."
+    assert auto_fix_sql("SELECT * FROM DB.PUBLIC.orders", error, "snow", snow_lookup()) == \
+        ('SELECT * FROM "DB"."PUBLIC"."orders"', "snow_object_case")
+    # Without the schema there is no exact spelling to use
+    assert auto_fix_sql('SELECT order_id FROM DB.PUBLIC."orders"', "invalid identifier 'ORDER_ID'", "snow") == (None, None)
+
+
+def test_bigquery_hyphenated_and_string_table_paths_are_backticked():
+    error = "Syntax error: Table name contains '-' character. It needs to be quoted"
+    assert auto_fix_sql("SELECT * FROM bigquery-public-data.samples.shakespeare WHERE word = 'a-b'", error, "bigquery") == \
+        ("SELECT * FROM `bigquery-public-data.samples.shakespeare` WHERE word = 'a-b'", "bigquery_table_paths")
+    assert auto_fix_sql("SELECT * FROM `my-proj.ds.t` JOIN other-proj.ds.u ON 1=1", error, "bigquery") == \
+        ("SELECT * FROM `my-proj.ds.t` JOIN `other-proj.ds.u` ON 1=1", "bigquery_table_paths")
+    assert auto_fix_sql("SELECT * FROM 'proj.ds.t'", "Syntax error: Unexpected string literal", "bigquery") == \
+        ("SELECT * FROM `proj.ds.t`", "bigquery_table_paths")
+
+
+def test_mysql_names_get_their_exact_case():
+    lookup = SchemaLookup("mysql", "shop")
+    lookup.add_table("Orders", ["OrderID", "amount"])
+    assert auto_fix_sql("SELECT orderid FROM Orders", "(1054, \"Unknown column 'orderid' in 'field list'\")",
+                        "mysql", lookup) == ("SELECT `OrderID` FROM Orders", "mysql_column_case")
+    assert auto_fix_sql("SELECT amount FROM orders", "(1146, \"Table 'shop.orders' doesn't exist\")",
+                        "doris", lookup) == ("SELECT amount FROM `Orders`", "mysql_table_case")
+
+
+def test_rules_only_apply_to_their_backend_and_error():
+    assert auto_fix_sql("SELECT `a` FROM t", "unexpected '`'", "sqlite") == (None, None)
+    assert auto_fix_sql("SELECT * FROM a-b.c.d", "some other error", "bigquery") == (None, None)
+    assert auto_fix_sql("SELECT 1", "", "snow") == (None, None)
+    assert auto_fix_sql("SELECT 1", "unexpected '`'", "oracle") == (None, None)
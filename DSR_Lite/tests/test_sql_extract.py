@@ -0,0 +1,67 @@
+from utils.SQL_Extract import extract_tables_columns
+from utils.SQL_Preflight import SchemaLookup
+from utils.SL.Extract_tables_col import parse_SL
+
+
+def shop_lookup():
+    lookup = SchemaLookup("sqlite", "shop")
+    lookup.add_table("customers", ["id", "name", "city"])
+    lookup.add_table("Orders", ["id", "customer_id", "amount"])
+    return lookup
+
+
+def test_aliases_and_ctes_resolve_to_base_tables():
+    sql = ("WITH totals AS (SELECT o.customer_id, SUM(o.amount) AS total FROM orders o GROUP BY o.customer_id) "
+           "SELECT c.name, t.total FROM customers AS c JOIN totals t ON t.customer_id = c.id")
+    assert extract_tables_columns(sql, "sqlite", shop_lookup()) == {
+        "Orders": ["customer_id", "amount"], "customers": ["name", "id"]}
+
+
+def test_unqualified_columns_go_to_the_tables_that_have_them():
+    sql = "SELECT name, amount FROM customers JOIN orders ON orders.customer_id = customers.id"
+    result = extract_tables_columns(sql, "sqlite", shop_lookup())
+    assert sorted(result["customers"]) == ["id", "name"]
+    assert sorted(result["Orders"]) == ["amount", "customer_id"]
+
+
+def test_correlated_subquery_columns_belong_to_the_outer_table():
+    sql = "SELECT name FROM customers c WHERE EXISTS (SELECT 1 FROM orders WHERE customer_id = c.id AND city = 'Rome')"
+    result = extract_tables_columns(sql, "sqlite", shop_lookup())
+    assert sorted(result["customers"]) == ["city", "id", "name"]
+    assert result["Orders"] == ["customer_id"]
+
+
+def test_unknown_table_or_unparsable_sql_falls_back():
+    assert extract_tables_columns("SELECT * FROM missing", "sqlite", shop_lookup()) is None
+    assert extract_tables_columns("SELECT FROM WHERE (", "sqlite", shop_lookup()) is None
+    assert extract_tables_columns("SELECT 1", "sqlite", shop_lookup()) is None
+    assert extract_tables_columns("SELECT id FROM customers", "sqlite", None) is None
+
+
+def test_snowflake_names_are_qualified_with_the_database():
+    lookup = SchemaLookup("snow", "SALES_DB")
+    lookup.add_table("PUBLIC.ORDERS", ["ORDER_ID", "PAYLOAD"])
+    sql = ('SELECT o."ORDER_ID", f.value:sku::string FROM SALES_DB.PUBLIC.ORDERS o, '
+           'LATERAL FLATTEN(input => o."PAYLOAD") f')
+    result = extract_tables_columns(sql, "snow", lookup)
+    assert list(result) == ["SALES_DB.PUBLIC.ORDERS"]
+    assert sorted(result["SALES_DB.PUBLIC.ORDERS"]) == ["ORDER_ID", "PAYLOAD"]
+    assert extract_tables_columns("SELECT * FROM OTHER_DB.PUBLIC.ORDERS", "snow", lookup) is None
+
+
+def test_bigquery_wildcard_tables_expand_to_the_series():
+    lookup = SchemaLookup("bigquery", "task")
+    for day in ("20200101", "20200102"):
+        lookup.add_table(f"ga.events_{day}", ["event_name"])
+        lookup.table_projects[f"ga.events_{day}"] = "proj"
+    lookup.projects.add("proj")
+    assert extract_tables_columns("SELECT event_name FROM `proj.ga.events_*`", "bigquery", lookup) == {
+        "proj.ga.events_20200101": ["event_name"], "proj.ga.events_20200102": ["event_name"]}
+
+
+def test_parse_sl_validates_against_the_database_schema(sqlite_dir):
+    sql = "SELECT c.name, SUM(o.amount) FROM customers c JOIN orders o ON o.customer_id = c.id GROUP BY c.name"
+    assert parse_SL(sql, "shop", "sqlite") == {"customers": ["name", "id"], "orders": ["amount", "customer_id"]}
+    assert parse_SL(sql, "shop", "sqlite", check_columns=False) == {"customers": [], "orders": []}
+    # A table the schema does not know is left to the LLM
+    assert parse_SL("SELECT * FROM invoices", "shop", "sqlite") is None
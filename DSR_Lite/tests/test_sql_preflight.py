@@ -0,0 +1,57 @@
+import utils.Database_Interface as Database_Interface
+from utils.SQL_Preflight import build_schema_lookup, validate_sql
+
+
+def test_unknown_table_and_column_are_rejected(sqlite_dir):
+    assert Database_Interface.preflight_sql("sqlite", "SELECT * FROM nope", "shop") == \
+        (2, "[Preflight] SQLite Database Error: no such table: nope")
+    assert Database_Interface.preflight_sql("sqlite", "SELECT bogus FROM orders", "shop") == \
+        (2, "[Preflight] SQLite Database Error: no such column: bogus")
+
+
+def test_valid_sql_passes(sqlite_dir):
+    assert Database_Interface.preflight_sql(
+        "sqlite", "SELECT c.name, SUM(o.amount) AS total FROM customers c JOIN orders o ON o.customer_id = c.id "
+                  "GROUP BY c.name ORDER BY total", "shop") == (0, None)
+
+
+def test_sqlite_system_tables_are_not_rejected(sqlite_dir):
+    for sql in ("SELECT name FROM sqlite_master", "SELECT sql FROM sqlite_schema WHERE type = 'table'",
+                "SELECT * FROM main.sqlite_master"):
+        assert Database_Interface.preflight_sql("sqlite", sql, "shop") == (0, None)
+
+
+def test_sqlite_views_are_resolved_from_the_database(sqlite_dir):
+    # The M-Schema only lists tables; the view's columns come from the file itself
+    assert Database_Interface.preflight_sql("sqlite", "SELECT id, amount FROM big_orders", "shop") == (0, None)
+    assert Database_Interface.preflight_sql("sqlite", "SELECT bogus FROM big_orders", "shop") == \
+        (2, "[Preflight] SQLite Database Error: no such column: bogus")
+
+
+def test_correlated_subquery_with_unqualified_outer_column(sqlite_dir):
+    sql = "SELECT name FROM customers WHERE EXISTS (SELECT 1 FROM orders WHERE orders.customer_id = city)"
+    assert Database_Interface.preflight_sql("sqlite", sql, "shop") == (0, None)
+    sql = "SELECT name FROM customers WHERE EXISTS (SELECT 1 FROM orders WHERE orders.customer_id = nope)"
+    assert Database_Interface.preflight_sql("sqlite", sql, "shop")[0] == 2
+
+
+def test_derived_tables_do_not_see_the_outer_query(sqlite_dir):
+    assert Database_Interface.preflight_sql("sqlite", "SELECT x FROM (SELECT amount AS x FROM orders)", "shop") == (0, None)
+    assert Database_Interface.preflight_sql(
+        "sqlite", "SELECT x FROM (SELECT amount AS x FROM orders WHERE bogus = 1)", "shop")[0] == 2
+
+
+def test_unterminated_string_is_a_syntax_error(sqlite_dir):
+    assert Database_Interface.preflight_sql("sqlite", "SELECT 'abc FROM orders", "shop")[0] == 2
+
+
+def test_snowflake_identifier_case():
+    schema = {"DB": {"PUBLIC.USERS": [["ID", "NUMBER", "", ""], ["name", "TEXT", "", ""]]}}
+    lookup = build_schema_lookup(schema, "snow", "DB")
+    assert validate_sql('SELECT id, "name" FROM DB.PUBLIC.USERS', "snow", lookup) == (0, None)
+    status, message = validate_sql("SELECT name FROM DB.PUBLIC.USERS", "snow", lookup)
+    assert status == 1 and "invalid identifier 'NAME'" in message
+
+
+def test_without_lookup_everything_passes():
+    assert validate_sql("SELECT bogus FROM nope", "sqlite", None) == (0, None)
@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+from utils.Database_Interface import db_interface
+from utils.SQL_Rewrite import rewrite_random_sampling
+
+
+@pytest.mark.parametrize("db_type, sql, expected", [
+    ("snow", "SELECT * FROM DB.S.T ORDER BY RANDOM() LIMIT 5",
+     "SELECT * FROM DB.S.T TABLESAMPLE BERNOULLI (5 ROWS) LIMIT 5"),
+    ("snow", "SELECT * FROM DB.S.T WHERE x > 1 ORDER BY RANDOM() LIMIT 5",
+     "SELECT * FROM DB.S.T TABLESAMPLE SYSTEM (1) WHERE x > 1 ORDER BY RANDOM() LIMIT 5"),
+    ("bigquery", "SELECT a FROM `p.d.t` ORDER BY RAND() LIMIT 3",
+     "SELECT a FROM `p.d.t` TABLESAMPLE SYSTEM (1 PERCENT) ORDER BY RAND() LIMIT 3"),
+    ("mysql", "SELECT * FROM t ORDER BY RAND() LIMIT 5",
+     "SELECT * FROM t WHERE RAND() < (SELECT LEAST(1.0, 100 / GREATEST(COUNT(*), 1)) FROM t) ORDER BY RAND() LIMIT 5"),
+])
+def test_warehouse_rewrites(db_type, sql, expected):
+    assert rewrite_random_sampling(sql, db_type) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM t ORDER BY id LIMIT 5",
+    "SELECT * FROM t ORDER BY RANDOM()",
+    "SELECT COUNT(*) FROM t ORDER BY RANDOM() LIMIT 5",
+    "SELECT * FROM t JOIN u ON t.id = u.id ORDER BY RANDOM() LIMIT 5",
+    "SELECT * FROM t ORDER BY RANDOM() LIMIT 5 OFFSET 2",
+    "SELECT * FROM (SELECT * FROM t) ORDER BY RANDOM() LIMIT 5",
+    "WITH c AS (SELECT 1) SELECT * FROM c ORDER BY RANDOM() LIMIT 5",
+    "SELECT * FROM t ORDER BY RANDOM(), id LIMIT 5",
+    "not sql at all (",
+])
+def test_other_queries_are_left_alone(sql):
+    assert rewrite_random_sampling(sql, "sqlite") is None
+
+
+def test_sqlite_rowid_probes_return_rows_of_the_table(shop_db):
+    sql = rewrite_random_sampling("SELECT id, name FROM customers WHERE city IS NOT NULL ORDER BY RANDOM() LIMIT 2",
+                                  "sqlite")
+    assert "ORDER BY" not in sql and "rowid IN" in sql
+    conn = sqlite3.connect(shop_db)
+    try:
+        for _ in range(20):
+            rows = conn.execute(sql).fetchall()
+            assert len(rows) <= 2 and set(rows) <= {(1, "Ann"), (2, "Bob")}
+    finally:
+        conn.close()
+
+
+def test_empty_sample_falls_back_to_the_original_query(sqlite_dir, shop_db):
+    # Every rowid probe misses when the rowids are sparse, so the rewrite returns no rows
+    conn = sqlite3.connect(shop_db)
+    conn.execute("UPDATE orders SET id = id * 1000000000")
+    conn.commit()
+    conn.close()
+    sql = "SELECT amount FROM orders WHERE id < 2000000000 ORDER BY RANDOM() LIMIT 1"
+    status, result = db_interface("sqlite", sql, "shop", rewrite_sampling=True)
+    assert status == 0 and "50.5" in result
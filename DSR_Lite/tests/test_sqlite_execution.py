@@ -0,0 +1,117 @@
+import os
+import time
+import sqlite3
+
+import pytest
+
+import utils.Database_Interface as Database_Interface
+from utils.Database_Interface import SQLiteConnectionPool, execute_sqlite_query, get_sqlite_pool
+
+
+def test_query_results_and_errors(shop_db):
+    status, result = execute_sqlite_query("SELECT name FROM customers ORDER BY id", shop_db)
+    assert status == 0
+    lines = result.splitlines()
+    assert lines[0].split() == ["name"] and [line.split()[-1] for line in lines[1:4]] == ["Ann", "Bob", "Cid"]
+    assert execute_sqlite_query("SELECT * FROM customers WHERE id = 99", shop_db)[1].startswith("[]")
+    assert execute_sqlite_query("SELECT nope FROM customers", shop_db) == (2, "SQLite Database Error: no such column: nope")
+
+
+def test_pool_is_shared_per_file_and_reuses_connections(shop_db):
+    pool = get_sqlite_pool(shop_db)
+    assert get_sqlite_pool(os.path.relpath(shop_db)) is pool
+    for _ in range(5):
+        assert execute_sqlite_query("SELECT COUNT(*) FROM orders", shop_db)[0] == 0
+    assert pool._created == 1
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second and pool._created == 2
+    pool.release(second)
+    pool.release(first)
+    assert pool.acquire() is first  # Most recently released first
+
+
+def test_pooled_connections_are_read_only(shop_db):
+    pool = SQLiteConnectionPool(shop_db)
+    with pool.connection() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM orders")
+        assert conn.execute("PRAGMA mmap_size").fetchone()[0] == Database_Interface.SQLITE_MMAP_SIZE
+    pool.close_all()
+    # Statements that do not fetch results get their own read-write connection
+    status, result = execute_sqlite_query("DELETE FROM orders WHERE id = 3", shop_db, fetch_results=False)
+    assert status == 0 and result.startswith("Operation successful.")
+    assert execute_sqlite_query("SELECT COUNT(*) AS n FROM orders", shop_db)[1].splitlines()[1].split()[-1] == "2"
+
+
+def test_missing_file_is_reported_and_not_pooled(sqlite_dir):
+    path = os.path.join(sqlite_dir, "missing.sqlite")
+    status, result = execute_sqlite_query("SELECT 1", path)
+    assert status == 2 and "unable to open database file" in result
+    assert get_sqlite_pool(path)._created == 0
+    assert not os.path.exists(path)
+
+
+SLOW_QUERY = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) "
+              "SELECT SUM(i) FROM n")
+
+
+def test_timed_out_query_is_interrupted_and_its_connection_reused(shop_db):
+    start = time.monotonic()
+    assert execute_sqlite_query(SLOW_QUERY, shop_db, timeout=0.2) == \
+        (2, "SQLite Database Error: execution exceeded 0.2 seconds.")
+    assert time.monotonic() - start < 5
+    pool = get_sqlite_pool(shop_db)
+    assert pool._created == 1 and pool._idle.qsize() == 1
+    # The same connection answers the next query, without the old statement's progress handler
+    assert execute_sqlite_query("SELECT COUNT(*) FROM customers", shop_db, timeout=0.2)[0] == 0
+    assert pool._created == 1
+
+
+def test_timed_out_write_is_rolled_back(shop_db):
+    query = ("INSERT INTO customers (name) WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n "
+             "WHERE i < 100000000) SELECT 'x' || i FROM n")
+    assert execute_sqlite_query(query, shop_db, fetch_results=False, timeout=0.2) == \
+        (2, "SQLite Database Error: execution exceeded 0.2 seconds.")
+    assert execute_sqlite_query("SELECT COUNT(*) AS n FROM customers", shop_db)[1].splitlines()[1].split()[-1] == "3"
+
+
+@pytest.fixture
+def snapshots(monkeypatch):
+    monkeypatch.setattr(Database_Interface, "SQLITE_SNAPSHOT_ENABLED", True)
+    yield
+    Database_Interface.close_sqlite_snapshots()
+
+
+def test_small_databases_are_served_from_a_snapshot(shop_db, snapshots):
+    pool = get_sqlite_pool(shop_db)
+    assert isinstance(pool, Database_Interface.SQLiteSnapshotPool)
+    assert get_sqlite_pool(shop_db) is pool
+    assert execute_sqlite_query("SELECT name FROM customers WHERE id = 2", shop_db)[1].splitlines()[1].split()[-1] == "Bob"
+    with pool.connection() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM orders")
+
+
+def test_snapshot_is_reloaded_when_the_file_changes(shop_db, snapshots):
+    pool = get_sqlite_pool(shop_db)
+    assert execute_sqlite_query("UPDATE customers SET name = 'Bea' WHERE id = 2", shop_db, fetch_results=False)[0] == 0
+    os.utime(shop_db, (time.time() + 10, time.time() + 10))
+    assert get_sqlite_pool(shop_db) is not pool and pool.closed
+    assert execute_sqlite_query("SELECT name FROM customers WHERE id = 2", shop_db)[1].splitlines()[1].split()[-1] == "Bea"
+
+
+def test_snapshot_limits(sqlite_dir, shop_db, snapshots, monkeypatch):
+    other_db = os.path.join(sqlite_dir, "other.sqlite")
+    conn = sqlite3.connect(other_db)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.close()
+    first = get_sqlite_pool(shop_db)
+    # The memory limit keeps only the most recently used snapshots
+    monkeypatch.setattr(Database_Interface, "SQLITE_SNAPSHOT_MEMORY_LIMIT", first.size)
+    second = get_sqlite_pool(other_db)
+    assert isinstance(second, Database_Interface.SQLiteSnapshotPool)
+    assert first.closed and list(Database_Interface._sqlite_snapshots) == [second.db_path]
+    # Files over the size limit keep the file-backed pool
+    monkeypatch.setattr(Database_Interface, "SQLITE_SNAPSHOT_MAX_DB_SIZE", 1)
+    assert type(get_sqlite_pool(shop_db)) is SQLiteConnectionPool
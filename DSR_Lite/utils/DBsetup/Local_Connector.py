@@ -0,0 +1,372 @@
+#--------------------------------
+# Offline stand-in for snowflake.connector, backed by a local SQLite file.
+# It implements the small part of the connector API that Database_Interface uses, so the Snowflake
+# execution path (session pool, timeouts, error mapping) can be exercised without warehouse credentials:
+#   from utils.Database_Interface import set_snowflake_connector
+#   from utils.DBsetup.Local_Connector import make_local_snowflake_connect
+#   set_snowflake_connector(make_local_snowflake_connect("local_copy.sqlite"))
+# The asynchronous API (execute_async, get_query_status, get_results_from_sfqid, SYSTEM$CANCEL_QUERY)
+# is mimicked by running each submitted statement on its own SQLite connection in a background thread.
+#--------------------------------
+import os
+import re
+import time
+import sqlite3
+import threading
+import itertools
+
+import pymysql
+from snowflake.connector.constants import QueryStatus
+from snowflake.connector.connection import SnowflakeConnection
+from snowflake.connector.errors import ProgrammingError, OperationalError
+
+_CANCEL_PATTERN = re.compile(r"SYSTEM\$CANCEL_QUERY\(\s*'([^']+)'\s*\)", re.IGNORECASE)
+
+
+class _AsyncQuery:
+    def __init__(self, sfqid, command, db_path, statement_timeout):
+        self.sfqid = sfqid
+        self.status = QueryStatus.RUNNING
+        self.description = None
+        self.rows = []
+        self.error = None
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._cancelled = False
+        self._deadline = time.monotonic() + statement_timeout if statement_timeout else None
+        self._thread = threading.Thread(target=self._run, args=(command,), daemon=True)
+        self._thread.start()
+
+    def _check(self):
+        if self._cancelled:
+            return 1
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            self.error = ProgrammingError(
+                msg="Statement reached its statement or warehouse timeout and was canceled.",
+                errno=630, sqlstate="57014", sfqid=self.sfqid)
+            return 1
+        return 0
+
+    def _run(self, command):
+        self._conn.set_progress_handler(self._check, 10000)
+        try:
+            cursor = self._conn.execute(command)
+            self.description = cursor.description
+            self.rows = cursor.fetchall()
+            self.status = QueryStatus.SUCCESS
+        except sqlite3.Error as e:
+            if self._cancelled:
+                self.error = ProgrammingError(msg="SQL execution canceled", errno=604, sqlstate="57014", sfqid=self.sfqid)
+                self.status = QueryStatus.ABORTED
+            else:
+                if self.error is None:
+                    self.error = ProgrammingError(msg=f"SQL compilation error:\n{e}", errno=2003, sqlstate="42S02", sfqid=self.sfqid)
+                self.status = QueryStatus.FAILED_WITH_ERROR
+        finally:
+            self._conn.close()
+
+    def cancel(self):
+        self._cancelled = True
+        try:
+            self._conn.interrupt()
+        except sqlite3.ProgrammingError:
+            pass  # Already finished and closed
+
+
+class LocalSnowflakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._conn.cursor()
+        self._async_rows = None
+        self.description = None
+        self.rowcount = -1
+        self.sfqid = None
+
+    def execute(self, command, params=None, timeout=None, **kwargs):
+        if self.connection.is_closed():
+            raise OperationalError(msg="Connection is closed", errno=250002)
+        self._async_rows = None
+        self.sfqid = self.connection._next_query_id()
+        cancel = _CANCEL_PATTERN.search(command)
+        if cancel:
+            self.connection._cancel(cancel.group(1))
+            command = "SELECT 'query cancelled'"
+        if timeout is None:
+            timeout = self.connection.statement_timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        timed_out = []
+
+        def _check():
+            if deadline is not None and time.monotonic() > deadline:
+                timed_out.append(True)
+                return 1
+            return 0
+
+        self.connection._conn.set_progress_handler(_check, 10000)
+        try:
+            self._cursor.execute(command, params or ())
+        except sqlite3.Error as e:
+            if timed_out:
+                raise ProgrammingError(
+                    msg=f"Statement reached its statement or warehouse timeout of {timeout} second(s) and was canceled.",
+                    errno=630, sqlstate="57014", sfqid=self.sfqid)
+            raise ProgrammingError(msg=f"SQL compilation error:\n{e}", errno=2003, sqlstate="42S02", sfqid=self.sfqid)
+        finally:
+            self.connection._conn.set_progress_handler(None, 0)
+
+        self.description = self._cursor.description
+        self.rowcount = self._cursor.rowcount
+        return self
+
+    def execute_async(self, command, params=None, **kwargs):
+        if self.connection.is_closed():
+            raise OperationalError(msg="Connection is closed", errno=250002)
+        self.sfqid = self.connection._submit(command)
+        return {"queryId": self.sfqid}
+
+    def get_results_from_sfqid(self, sfqid):
+        query = self.connection._async_queries[sfqid]
+        query._thread.join()
+        if query.error is not None:
+            raise query.error
+        self.sfqid = sfqid
+        self.description = query.description
+        self.rowcount = len(query.rows)
+        self._async_rows = iter(query.rows)
+
+    def fetchmany(self, size=None):
+        if self._async_rows is not None:
+            return list(itertools.islice(self._async_rows, size or 1))
+        return self._cursor.fetchmany(size or 1)
+
+    def fetchall(self):
+        if self._async_rows is not None:
+            return list(self._async_rows)
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class LocalSnowflakeConnection:
+    # Status helpers are pure functions of QueryStatus, so the real connector's versions are reused
+    is_still_running = staticmethod(SnowflakeConnection.is_still_running)
+    is_an_error = staticmethod(SnowflakeConnection.is_an_error)
+
+    def __init__(self, db_path, statement_timeout=0):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._closed = False
+        self._query_ids = itertools.count(1)
+        self._async_queries = {}
+        self.statement_timeout = statement_timeout
+
+    def _next_query_id(self):
+        return f"local-{id(self):x}-{next(self._query_ids)}"
+
+    def _submit(self, command):
+        sfqid = self._next_query_id()
+        self._async_queries[sfqid] = _AsyncQuery(sfqid, command, self.db_path, self.statement_timeout)
+        return sfqid
+
+    def _cancel(self, sfqid):
+        query = self._async_queries.get(sfqid)
+        if query is not None:
+            query.cancel()
+
+    def get_query_status(self, sfqid):
+        return self._async_queries[sfqid].status
+
+    def get_query_status_throw_if_error(self, sfqid):
+        query = self._async_queries[sfqid]
+        if self.is_an_error(query.status) and query.error is not None:
+            raise query.error
+        return query.status
+
+    def cursor(self):
+        return LocalSnowflakeCursor(self)
+
+    def commit(self):
+        self._conn.commit()
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            for query in self._async_queries.values():
+                if self.is_still_running(query.status):
+                    query.cancel()
+            self._conn.close()
+
+
+def make_local_snowflake_connect(db_path, login_latency=0.0):
+    """
+    Returns a connect(**kwargs) function with the same keyword interface as snowflake.connector.connect.
+    login_latency simulates the authentication round trip; connect.stats["connects"] counts sessions opened.
+    """
+    stats = {"connects": 0}
+    lock = threading.Lock()
+
+    def connect(**kwargs):
+        if login_latency:
+            time.sleep(login_latency)
+        with lock:
+            stats["connects"] += 1
+        session_parameters = kwargs.get("session_parameters") or {}
+        return LocalSnowflakeConnection(db_path, int(session_parameters.get("STATEMENT_TIMEOUT_IN_SECONDS", 0)))
+
+    connect.stats = stats
+    return connect
+
+
+#--------------------------------
+# Offline stand-in for pymysql, backed by local SQLite files (one per database name).
+# It understands the session statements Database_Interface sends (SET SESSION MAX_EXECUTION_TIME,
+# SET query_timeout, KILL QUERY <id>) and raises pymysql errors with the server's error codes:
+#   from utils.Database_Interface import set_mysql_connector
+#   from utils.DBsetup.Local_Connector import make_local_mysql_connect
+#   set_mysql_connector(make_local_mysql_connect("local_mysql_dir"))
+#--------------------------------
+_MYSQL_TIMEOUT_PATTERN = re.compile(r"SET\s+(?:SESSION\s+)?(MAX_EXECUTION_TIME|query_timeout)\s*=\s*(\d+)", re.IGNORECASE)
+_MYSQL_KILL_PATTERN = re.compile(r"KILL\s+QUERY\s+(\d+)", re.IGNORECASE)
+
+
+class LocalMySQLCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._conn.cursor()
+        self.description = None
+        self.rowcount = -1
+
+    def execute(self, query, args=None):
+        if self.connection._closed:
+            raise pymysql.err.InterfaceError(0, "")
+        setting = _MYSQL_TIMEOUT_PATTERN.match(query.strip())
+        if setting:
+            value = int(setting.group(2))
+            self.connection.max_execution_time = value / 1000 if setting.group(1).upper() == "MAX_EXECUTION_TIME" else value
+            self.description = None
+            return 0
+        kill = _MYSQL_KILL_PATTERN.match(query.strip())
+        if kill:
+            self.connection._registry.kill(int(kill.group(1)))
+            self.description = None
+            return 0
+
+        conn = self.connection
+        deadline = time.monotonic() + conn.max_execution_time if conn.max_execution_time else None
+        conn._killed = False
+        timed_out = []
+
+        def _check():
+            if conn._killed:
+                return 1
+            if deadline is not None and time.monotonic() > deadline:
+                timed_out.append(True)
+                return 1
+            return 0
+
+        conn._conn.set_progress_handler(_check, 10000)
+        try:
+            self._cursor.execute(query, args or ())
+        except sqlite3.Error as e:
+            if timed_out:
+                raise pymysql.err.OperationalError(3024, "Query execution was interrupted, maximum statement execution time exceeded")
+            if conn._killed:
+                raise pymysql.err.OperationalError(1317, "Query execution was interrupted")
+            raise pymysql.err.ProgrammingError(1064, f"{e}")
+        finally:
+            conn._conn.set_progress_handler(None, 0)
+        self.description = self._cursor.description
+        self.rowcount = self._cursor.rowcount
+        return self.rowcount
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or 1)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalMySQLConnection:
+    def __init__(self, db_path, registry):
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._registry = registry
+        self._closed = False
+        self._killed = False
+        self._thread_id = registry.register(self)
+        self.max_execution_time = 0
+
+    def thread_id(self):
+        return self._thread_id
+
+    def cursor(self, cursor=None):
+        return LocalMySQLCursor(self)
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._registry.unregister(self._thread_id)
+            self._conn.close()
+
+
+class _LocalMySQLRegistry:
+    """Process list of open stand-in connections, so KILL QUERY can reach another connection."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._connections = {}
+
+    def register(self, conn):
+        with self._lock:
+            thread_id = next(self._ids)
+            self._connections[thread_id] = conn
+            return thread_id
+
+    def unregister(self, thread_id):
+        with self._lock:
+            self._connections.pop(thread_id, None)
+
+    def kill(self, thread_id):
+        with self._lock:
+            conn = self._connections.get(thread_id)
+        if conn is None:
+            raise pymysql.err.InternalError(1094, f"Unknown thread id: {thread_id}")
+        conn._killed = True
+        conn._conn.interrupt()
+
+
+def make_local_mysql_connect(db_dir, login_latency=0.0):
+    """
+    Returns a connect(**kwargs) function with the same keyword interface as pymysql.connect.
+    database=<name> opens <db_dir>/<name>.sqlite; connect.stats["connects"] counts connections opened.
+    """
+    stats = {"connects": 0}
+    lock = threading.Lock()
+    registry = _LocalMySQLRegistry()
+
+    def connect(**kwargs):
+        if login_latency:
+            time.sleep(login_latency)
+        db_path = os.path.join(db_dir, f"{kwargs.get('database') or 'default'}.sqlite")
+        if not os.path.exists(db_path):
+            raise pymysql.err.OperationalError(1049, f"Unknown database '{kwargs.get('database')}'")
+        with lock:
+            stats["connects"] += 1
+        return LocalMySQLConnection(db_path, registry)
+
+    connect.stats = stats
+    return connect
@@ -0,0 +1,151 @@
+#--------------------------------
+# Builds local DuckDB replicas of Snowflake / BigQuery databases for offline runs.
+# Every table listed in the database's *_M-Schema.json (including the tables of a similar_tables series) is
+# copied as a row sample into <replica_dir>/<db_id>.duckdb, one DuckDB schema per Snowflake schema / BigQuery
+# dataset. Database_Interface then runs queries against the replica after transpiling them to DuckDB:
+#   from utils.Database_Interface import set_local_replica
+#   set_local_replica("replicas/", db_types=("snow", "bigquery"))
+# Results come from samples, so they are good for benchmarking and regression-testing the pipeline and for
+# cheap exploration, not for final answers.
+#--------------------------------
+import os
+import sys
+import argparse
+
+import duckdb
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+sys.path.append(project_root)
+
+from utils.Schema_Catalog import schema_catalog
+
+REPLICA_SAMPLE_ROWS = 10000  # rows sampled per table
+BIGQUERY_REPLICA_SAMPLE_PERCENT = 1  # TABLESAMPLE SYSTEM block sampling before the row limit
+
+# M-Schema type -> DuckDB type, used only for tables whose sample is empty (otherwise the sampled data decides)
+DUCKDB_TYPES = {
+    "INT": "BIGINT", "INT64": "BIGINT", "INTEGER": "BIGINT", "NUMBER": "DOUBLE", "FLOAT": "DOUBLE",
+    "FLOAT64": "DOUBLE", "NUMERIC": "DOUBLE", "BIGNUMERIC": "DOUBLE", "BOOLEAN": "BOOLEAN", "BOOL": "BOOLEAN",
+    "DATE": "DATE", "TIMESTAMP": "TIMESTAMP", "TIMESTAMP_NTZ": "TIMESTAMP", "TIMESTAMP_LTZ": "TIMESTAMPTZ",
+    "TIMESTAMP_TZ": "TIMESTAMPTZ", "DATETIME": "TIMESTAMP", "TIME": "TIME",
+}
+
+
+def replica_file(replica_dir, db_id):
+    return os.path.join(replica_dir, f"{db_id}.duckdb")
+
+
+def replica_tables(schema_json_path, db_type, db_id):
+    """(table, table id) for every table of the M-Schema, including the members of each similar_tables series."""
+    tables = schema_catalog.get(schema_json_path).tables(db_type, db_id)
+    seen = set()
+    for table in tables.values():
+        for table_id in [table.id] + table.similar_tables:
+            if table_id.lower() not in seen and (table_id == table.id or table_id.lower() not in tables):
+                seen.add(table_id.lower())
+                yield table, table_id
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _create_empty_table(con, schema_name, table_name, table):
+    columns = ", ".join(
+        f"{_quote(column.name)} {DUCKDB_TYPES.get(str(column.type).split('(')[0].upper(), 'VARCHAR')}"
+        for column in table.columns
+    )
+    con.execute(f"CREATE OR REPLACE TABLE {_quote(schema_name)}.{_quote(table_name)} ({columns})")
+
+
+def _store_sample(con, schema_name, table_name, sample, table):
+    con.execute(f"CREATE SCHEMA IF NOT EXISTS {_quote(schema_name)}")
+    if sample is None or len(sample) == 0:
+        _create_empty_table(con, schema_name, table_name, table)
+        return 0
+    con.register("replica_sample", sample)
+    try:
+        con.execute(f"CREATE OR REPLACE TABLE {_quote(schema_name)}.{_quote(table_name)} AS SELECT * FROM replica_sample")
+    finally:
+        con.unregister("replica_sample")
+    return len(sample)
+
+
+def build_snowflake_replica(db_id, schema_json_path, replica_dir, credentials, sample_rows=REPLICA_SAMPLE_ROWS):
+    """Sample every table of a Snowflake database into <replica_dir>/<db_id>.duckdb."""
+    import snowflake.connector
+    from utils.preprocessor.Get_table_mes_snow import sample_table_rows
+
+    os.makedirs(replica_dir, exist_ok=True)
+    con = duckdb.connect(replica_file(replica_dir, db_id))
+    sf_conn = snowflake.connector.connect(
+        user=credentials["user"],
+        password=credentials["password"],
+        account=credentials["account"],
+        role=credentials["role"],
+        warehouse=credentials["warehouse"],
+    )
+    cursor = sf_conn.cursor()
+    try:
+        for table, table_id in replica_tables(schema_json_path, "snow", db_id):
+            schema_name, table_name = table_id.split(".", 1)
+            col_names = [column.name for column in table.columns]
+            try:
+                sample = sample_table_rows(cursor, f'"{db_id}"."{schema_name}"."{table_name}"', col_names, sample_rows)
+            except Exception as e:
+                print(f"  WARNING: Sampling '{table_id}' failed, creating it empty. Error: {e}")
+                sample = None
+            rows = _store_sample(con, schema_name, table_name, sample, table)
+            print(f"  {table_id}: {rows} rows")
+    finally:
+        cursor.close()
+        sf_conn.close()
+        con.close()
+
+
+def build_bigquery_replica(db_id, schema_json_path, replica_dir, credentials_path, sample_rows=REPLICA_SAMPLE_ROWS):
+    """Sample every table of a BigQuery task database into <replica_dir>/<db_id>.duckdb."""
+    from google.cloud import bigquery
+    from google.oauth2 import service_account
+
+    os.makedirs(replica_dir, exist_ok=True)
+    client = bigquery.Client(credentials=service_account.Credentials.from_service_account_file(credentials_path))
+    con = duckdb.connect(replica_file(replica_dir, db_id))
+    try:
+        for table, table_id in replica_tables(schema_json_path, "bigquery", db_id):
+            dataset_name, table_name = table_id.split(".", 1)
+            query = (f"SELECT * FROM `{table.project}.{dataset_name}.{table_name}` "
+                     f"TABLESAMPLE SYSTEM ({BIGQUERY_REPLICA_SAMPLE_PERCENT} PERCENT) LIMIT {sample_rows}")
+            try:
+                sample = client.query(query).result().to_arrow()
+            except Exception as e:
+                print(f"  WARNING: Sampling '{table_id}' failed, creating it empty. Error: {e}")
+                sample = None
+            rows = _store_sample(con, dataset_name, table_name, sample, table)
+            print(f"  {table_id}: {rows} rows")
+    finally:
+        con.close()
+        client.close()
+
+
+if __name__ == "__main__":
+    from utils.Schema_Catalog import schema_json_path
+    from utils.Database_Interface import default_credentials, Credentials_Path
+
+    parser = argparse.ArgumentParser(description="Build local DuckDB replicas of Snowflake/BigQuery databases.")
+    parser.add_argument("--db_type", choices=["snow", "bigquery"], required=True)
+    parser.add_argument("--db_ids", nargs="+", required=True)
+    parser.add_argument("--replica_dir", default=os.path.join(project_root, "replicas"))
+    parser.add_argument("--sample_rows", type=int, default=REPLICA_SAMPLE_ROWS)
+    args = parser.parse_args()
+
+    for db_id in args.db_ids:
+        json_path = schema_json_path(db_id, args.db_type)
+        if json_path is None:
+            print(f"WARNING: No M-Schema JSON found for '{db_id}'. Skipping.")
+            continue
+        print(f"\nBuilding replica for '{db_id}'")
+        if args.db_type == "snow":
+            build_snowflake_replica(db_id, json_path, args.replica_dir, default_credentials, args.sample_rows)
+        else:
+            build_bigquery_replica(db_id, json_path, args.replica_dir, Credentials_Path, args.sample_rows)
@@ -1,14 +1,26 @@
 import os
 import re
 import sys
+import abc
 import time
 import json
 import sqlite3
+import queue
+import threading
+import itertools
+import urllib.parse
+from collections import OrderedDict
+from contextlib import contextmanager
 from typing import List, Optional
-import multiprocessing
 from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import datetime
+import numpy as np
 import pandas as pd
-from func_timeout import func_timeout, FunctionTimedOut
+try:
+    import sqlglot
+    from sqlglot import exp
+except ImportError:  # SQL rewriting features are skipped without sqlglot
+    sqlglot = None
 
 # Snowflake
 import snowflake.connector
@@ -22,12 +34,20 @@ from google.cloud import bigquery
 import pymysql
 from pymysql import Error as PyMySQLError
 
+# Local DuckDB replicas of Snowflake / BigQuery
+import duckdb
+
 # Local imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.mytoken.deepseek_tokenizer import *
 from LLM.LLM_OUT import LLM_output
 from utils.Prompt import TOOL_LLM
 from utils.DBsetup.Get_DB import read_db_config
+from utils.SQL_Rewrite import rewrite_random_sampling
+from utils.SQL_Preflight import lookup_from_tables, add_sqlite_objects, validate_sql
+from utils.Schema_Catalog import schema_catalog, schema_json_path, get_schema, get_tables, load_schema_json, clean_table_name
+from utils.SQL_AutoFix import auto_fix_sql, identifier_hint
+from utils.Schema_Pruning import prune_schema
 
 # Import database information
 sqlite_DB_dir, snow_DB_dir, bigquery_DB_dir, mysql_DB_dir, doris_DB_dir, snow_auth, Credentials_Path, mysql_auth, doris_auth = read_db_config()
@@ -84,368 +104,1517 @@ def extract_sql_block(text):
         return match.group(1).strip()
     return None
 
-def clean_table_name(table_name):
-    table_name = str(table_name)
-    table_name = table_name.replace('"', '')
-    table_name = re.sub(r'\d+', '', table_name)
-    table_name = table_name.lower()
-    return table_name
+# --- Bounded result fetching and rendering ---
+# Exploration queries can return millions of rows while the LLM only ever sees the first/last few,
+# so results are pulled in batches, only the displayed rows are kept, and the table is rendered
+# directly in the same layout as DataFrame.to_string(index=True, show_dimensions=True, max_rows=N).
+FETCH_BATCH_SIZE = 1000
+FETCH_ROW_LIMIT = 100000  # Stop pulling rows after this many; the row count is then reported as an estimate
+
+class BoundedResult:
+    """
+    The rows needed for display plus the (exact or estimated) total row count of a result set.
+    column_types holds, per column, the Python types seen in every fetched row (not only the displayed ones),
+    so column dtypes are inferred the way pandas infers them from the whole result.
+    """
+    def __init__(self, columns, head, tail, total_rows, exact=True, column_types=None):
+        self.columns = columns
+        self.head = head
+        self.tail = tail
+        self.total_rows = total_rows
+        self.exact = exact
+        self.column_types = column_types
+
+    def __bool__(self):
+        return self.total_rows > 0
+
+def iter_cursor_batches(cursor, batch_size=FETCH_BATCH_SIZE):
+    """Yield lists of rows from a DB-API cursor using fetchmany until it is exhausted."""
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        yield batch
+
+def collect_bounded_rows(columns, batches, max_rows=20, row_limit=FETCH_ROW_LIMIT, reported_total=None):
+    """
+    Consume row batches, keeping only the first and last max_rows // 2 rows.
+    Fetching stops once row_limit rows have been seen; the total is then taken from reported_total
+    (e.g. a driver-side row count) when available, otherwise it is marked as an estimate.
+    """
+    half = max(max_rows // 2, 1)
+    head = []
+    tail = []
+    seen = 0
+    truncated = False
+    column_types = [set() for _ in columns]
+    for batch in batches:
+        for types, values in zip(column_types, zip(*batch)):
+            types.update(map(type, values))
+        for row in batch:
+            if seen < max_rows:
+                head.append(tuple(row))
+            else:
+                tail.append(tuple(row))
+                if len(tail) > half:
+                    del tail[0]
+            seen += 1
+        if row_limit and seen >= row_limit:
+            truncated = True
+            break
+
+    if seen <= max_rows:
+        return BoundedResult(columns, head, [], seen, column_types=column_types)
+
+    # The first max_rows rows were kept so small results render in full; trim to the displayed head now
+    overflow = head[half:]
+    head = head[:half]
+    if not truncated:
+        tail = (overflow + tail)[-half:]
+        return BoundedResult(columns, head, tail, seen, column_types=column_types)
+    # The real tail was never fetched, so only the head is shown
+    if reported_total is not None and reported_total >= seen:
+        return BoundedResult(columns, head, [], reported_total, column_types=column_types)
+    return BoundedResult(columns, head, [], seen, exact=False, column_types=column_types)
+
+# Rendering follows pandas' DataFrame.to_string: a column's dtype is inferred from its values, numeric and
+# object cells carry a leading space, floats share one fixed-point (or scientific) format per column,
+# and columns are joined with a single space.
+DISPLAY_PRECISION = 6  # pandas' display.precision
+_FLOAT_WITH_DECIMAL = re.compile(r"^\s*[\+-]?[0-9]+\.[0-9]*$")
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+def _type_category(value_type):
+    if value_type is type(None):
+        return "null"
+    if issubclass(value_type, (bool, np.bool_)):
+        return "bool"
+    if issubclass(value_type, (int, np.integer)):
+        return "int"
+    if issubclass(value_type, (float, np.floating)):
+        return "float"
+    if issubclass(value_type, str):
+        return "str"
+    if issubclass(value_type, datetime.datetime):
+        return "datetime"
+    return "other"
+
+def _column_kind(types, values):
+    """pandas dtype family of a column: int, float, bool, string, datetime, datetimetz or object."""
+    categories = {_type_category(t) for t in types} if types is not None \
+        else {_type_category(type(v)) for v in values}
+    has_null = "null" in categories
+    categories.discard("null")
+    if not categories:
+        # All None stays object; None mixed with NaN becomes a float column
+        return "float" if any(isinstance(v, float) for v in values) else "object"
+    if categories <= {"int", "float"}:
+        if categories == {"int"} and not has_null:
+            return "int" if all(-2**63 <= v < 2**63 for v in values) else "object"
+        return "float"
+    if categories == {"bool"}:
+        return "object" if has_null else "bool"
+    if categories == {"str"}:
+        return "string"
+    if categories == {"datetime"}:
+        offsets = {v.utcoffset() for v in values if v is not None}
+        if offsets == {None}:
+            return "datetime"
+        return "datetimetz" if len(offsets) == 1 else "object"
+    return "object"
+
+def _escape(text):
+    return text.replace("\t", "\\t").replace("\r", "\\r").replace("\n", "\\n")
+
+def _trim_float_zeros(cells):
+    """Trim trailing zeros equally from all fixed-point cells, keeping at least one decimal."""
+    while True:
+        numbers = [c for c in cells if _FLOAT_WITH_DECIMAL.match(c)]
+        if not numbers or not all(c.endswith("0") for c in numbers):
+            break
+        cells = [c[:-1] if _FLOAT_WITH_DECIMAL.match(c) else c for c in cells]
+    return [c + "0" if _FLOAT_WITH_DECIMAL.match(c) and c.endswith(".") else c for c in cells]
+
+def _format_float_column(values):
+    def formatted(spec):
+        return _trim_float_zeros(["NaN" if _is_missing(v) else format(float(v), spec) for v in values])
+
+    cells = formatted(f" .{DISPLAY_PRECISION}f")
+    magnitudes = [abs(float(v)) for v in values if not _is_missing(v)]
+    too_long = max((len(c) for c in cells), default=0) > DISPLAY_PRECISION + 6
+    has_large = any(m > 1e6 for m in magnitudes)
+    has_small = any(0 < m < 10 ** -DISPLAY_PRECISION for m in magnitudes)
+    if has_small or (too_long and has_large):
+        cells = formatted(f" .{DISPLAY_PRECISION}e")
+    return cells
+
+def _format_datetime_column(values):
+    present = [v for v in values if v is not None]
+    if all(v.hour == v.minute == v.second == v.microsecond == 0 for v in present):
+        return ["NaT" if v is None else v.strftime("%Y-%m-%d") for v in values]
+    if any(v.microsecond % 1000 for v in present):
+        fraction = lambda v: f".{v.microsecond:06d}"
+    elif any(v.microsecond for v in present):
+        fraction = lambda v: f".{v.microsecond // 1000:03d}"
+    else:
+        fraction = lambda v: ""
+    return ["NaT" if v is None else v.strftime("%Y-%m-%d %H:%M:%S") + fraction(v) for v in values]
+
+def _format_object_cell(value):
+    if value is None:
+        return " None"
+    if isinstance(value, (float, np.floating)):
+        if value != value:
+            return " NaN"
+        text = f"{value: .{DISPLAY_PRECISION}f}".rstrip("0")
+        return text + "0" if text.endswith(".") else text
+    return " " + _escape(str(value))
+
+def _format_column(kind, values):
+    if kind == "float":
+        return _format_float_column(values)
+    if kind == "int":
+        return [f"{int(v): d}" for v in values]
+    if kind == "bool":
+        return [f" {bool(v)}" for v in values]
+    if kind == "string":
+        return [" NaN" if v is None else " " + _escape(v) for v in values]
+    if kind == "datetime":
+        return _format_datetime_column(values)
+    if kind == "datetimetz":
+        return ["NaT" if v is None else str(v) for v in values]
+    return [_format_object_cell(v) for v in values]
+
+def render_result_table(result):
+    """Render a BoundedResult like DataFrame.to_string(index=True, show_dimensions=True) (index column, '...' row, dimensions)."""
+    rows = result.head + result.tail
+    elided = result.total_rows > len(rows)
+    labels = [str(i) for i in range(len(result.head))]
+    if result.tail:
+        labels += [str(result.total_rows - len(result.tail) + i) for i in range(len(result.tail))]
+    index_width = max([len(label) for label in labels] + [0])
+    strcols = [[""] + [label.ljust(index_width) for label in labels]]
+
+    for col_idx, name in enumerate(result.columns):
+        values = [row[col_idx] if col_idx < len(row) else None for row in rows]
+        types = result.column_types[col_idx] if result.column_types and col_idx < len(result.column_types) else None
+        kind = _column_kind(types, values)
+        header = (" " if kind in ("int", "float", "bool") else "") + str(name)
+        cells = _format_column(kind, values)
+        width = max([len(header)] + [len(cell) for cell in cells])
+        strcols.append([header.rjust(width)] + [cell.rjust(width) for cell in cells])
+
+    if elided:
+        # Same separator row as pandas: '...' in columns wider than 3, '..' otherwise
+        split = len(result.head)
+        for col_idx, col in enumerate(strcols):
+            width = len(col[split])
+            dots = "..." if width > 3 else ".."
+            col.insert(split + 1, dots.ljust(width) if col_idx == 0 else dots.rjust(width))
+
+    # Join like pandas' adjoin(1, ...): every column but the last is padded to its widest cell plus one space
+    widths = [max(len(cell) for cell in col) + 1 for col in strcols[:-1]] + [max(len(cell) for cell in strcols[-1])]
+    lines = ["".join(col[line].ljust(width) for col, width in zip(strcols, widths)) for line in range(len(strcols[0]))]
+
+    row_count = f"{result.total_rows}" if result.exact else f"{result.total_rows}+"
+    lines.append(f"\n[{row_count} rows x {len(result.columns)} columns]")
+    return "\n".join(lines)
+
+# --- Connection pooling ---
+class ConnectionPool(abc.ABC):
+    """
+    Thread-safe pool of reusable database connections, created lazily up to max_size.
+    Idle connections are handed out last-in-first-out so the most recently used (warmest) one is reused first.
+    Subclasses implement _connect().
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.closed = False
+
+    @abc.abstractmethod
+    def _connect(self):
+        """A new connection for the pool."""
+
+    def acquire(self, timeout=None):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        # Pool exhausted: wait for another thread to give a connection back
+        return self._idle.get(timeout=timeout)
+
+    def release(self, conn, discard=False):
+        if conn is None:
+            return
+        if discard or self.closed:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    def close_all(self):
+        # Connections still checked out are closed when they are released
+        self.closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.release(conn, discard=True)
+
+# --- Snowflake session pool ---
+# Logging in to Snowflake takes seconds, so authenticated sessions are kept open and reused.
+# Query timeouts are enforced server-side (STATEMENT_TIMEOUT_IN_SECONDS plus the connector's cancel-on-timeout),
+# and a session is only replaced when it actually fails.
+SNOWFLAKE_POOL_SIZE = 4
+SNOWFLAKE_LOGIN_TIMEOUT = 60  # seconds
+SNOWFLAKE_STATEMENT_TIMEOUT = 200  # seconds, server-side backstop for every statement in a session
+
+_snowflake_connect = snowflake.connector.connect
+
+class SnowflakeSessionPool(ConnectionPool):
+    """Pool of authenticated Snowflake sessions for one set of credentials."""
+    def __init__(self, credentials, max_size=SNOWFLAKE_POOL_SIZE):
+        super().__init__(max_size)
+        self.credentials = credentials
+
+    def _connect(self):
+        return _snowflake_connect(
+            user=self.credentials["user"],
+            password=self.credentials["password"],
+            account=self.credentials["account"],
+            role=self.credentials["role"],
+            warehouse=self.credentials["warehouse"],
+            login_timeout=SNOWFLAKE_LOGIN_TIMEOUT,
+            client_session_keep_alive=True,
+            session_parameters={"STATEMENT_TIMEOUT_IN_SECONDS": SNOWFLAKE_STATEMENT_TIMEOUT},
+        )
+
+_snowflake_pools = {}
+_snowflake_pools_lock = threading.Lock()
+
+def get_snowflake_pool(credentials):
+    """Return the process-wide session pool for these credentials, creating it on first use."""
+    key = tuple(credentials.get(k) for k in ("account", "user", "role", "warehouse"))
+    with _snowflake_pools_lock:
+        pool = _snowflake_pools.get(key)
+        if pool is None:
+            pool = SnowflakeSessionPool(credentials)
+            _snowflake_pools[key] = pool
+        return pool
+
+def close_snowflake_pools():
+    with _snowflake_pools_lock:
+        pools = list(_snowflake_pools.values())
+        _snowflake_pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+def set_snowflake_connector(connect_fn):
+    """
+    Replace the function used to open Snowflake sessions, e.g. with the offline stand-in from
+    utils/DBsetup/Local_Connector.py. Existing pooled sessions are closed.
+    """
+    global _snowflake_connect
+    _snowflake_connect = connect_fn
+    close_snowflake_pools()
+
+def _is_snowflake_timeout(error_str):
+    return "000630" in error_str or "timed out" in error_str.lower()
+
+def _snowflake_error_result(e):
+    """Map an exception to (status_code, message, session_is_broken)."""
+    error_str = str(e)
+    if isinstance(e, snowflake.connector.errors.ProgrammingError):
+        if _is_snowflake_timeout(error_str):
+            return 3, f"Timeout: {error_str}", False
+        return 1, f"Snowflake Programming Error: {e}", False
+    if isinstance(e, snowflake.connector.errors.DatabaseError):
+        # Operational errors (lost connection, expired session) mean the session itself is unusable
+        broken = isinstance(e, snowflake.connector.errors.OperationalError)
+        if _is_snowflake_timeout(error_str):
+            return 3, f"Timeout: {error_str}", broken
+        return 2, f"Snowflake Database Error: {e}", broken
+    return 3, f"Unknown Error: {e}", True
+
+def _format_snowflake_results(cursor, start_time):
+    columns = [desc[0] for desc in cursor.description]
+    reported_total = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+    results = collect_bounded_rows(columns, iter_cursor_batches(cursor), max_rows=20, reported_total=reported_total)
+    if results:
+        execution_time = time.time() - start_time
+        return 0, truncate_text_by_tokens(render_result_table(results)) + f"\nQuery Time: {execution_time:.2f} s"
+    else:
+        return 0, '[]'
 
 def _execute_snowflake_query_inner(query, credentials, fetch_results=True, timeout=200):
     """
-    Internal execution function: runs in a separate process.
+    Internal execution function: runs the query on a pooled Snowflake session.
     """
+    pool = get_snowflake_pool(credentials)
     conn = None
     cursor = None
+    discard = False
     try:
-        # Establish an independent connection within the child process
-        conn = snowflake.connector.connect(
-            user=credentials["user"],
-            password=credentials["password"],
-            account=credentials["account"],
-            role=credentials["role"],
-            warehouse=credentials["warehouse"],
-        )
+        conn = pool.acquire()
         cursor = conn.cursor()
         
         start_time = time.time()
-        cursor.execute(query)
+        # The connector cancels the statement server-side once `timeout` seconds have passed
+        cursor.execute(query, timeout=timeout)
 
         if fetch_results:
-            results = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            if results:
-                df = pd.DataFrame(results, columns=columns)
-                # Simple formatting for DataFrame display
-                df_str = df.to_string(index=True, show_dimensions=True, max_rows=20)
-                execution_time = time.time() - start_time
-                df_str_no_empty_lines = re.sub(r'\n\s*\n', '\n', df_str)
-                
-                return 0, truncate_text_by_tokens(df_str_no_empty_lines) + f"\nQuery Time: {execution_time:.2f} s"
-            else:
-                return 0, '[]'
+            return _format_snowflake_results(cursor, start_time)
         else:
             conn.commit()
             return 0, None
 
-    except snowflake.connector.errors.ProgrammingError as pe:
-        error_str = str(pe)
-        if "000630" in error_str or "timed out" in error_str.lower():
-            return 3, f"Timeout: {error_str}"
-        return 1, f"Snowflake Programming Error: {pe}"
-        
-    except snowflake.connector.errors.DatabaseError as de:
-        error_str = str(de)
-        if "000630" in error_str or "timed out" in error_str.lower():
-            return 3, f"Timeout: {error_str}"
-        return 2, f"Snowflake Database Error: {de}"
-        
     except Exception as e:
-        return 3, f"Unknown Error: {e}"
+        code, msg, discard = _snowflake_error_result(e)
+        return code, msg
     finally:
         try:
             if cursor: cursor.close()
-            if conn: conn.close()
         except:
-            pass
+            discard = True
+        if conn is not None:
+            try:
+                if conn.is_closed():
+                    discard = True
+            except Exception:
+                discard = True
+            pool.release(conn, discard=discard)
+
+# --- Snowflake asynchronous execution ---
+# In "async" mode statements are submitted with execute_async and tracked by query ID, so one session can
+# drive many in-flight statements, and a timeout is a server-side SYSTEM$CANCEL_QUERY instead of a killed worker.
+SNOWFLAKE_EXECUTION_MODE = "session"  # "session": blocking execute on a pooled session | "async": execute_async + polling
+SNOWFLAKE_POLL_INTERVAL = 0.2  # seconds, first polling delay
+SNOWFLAKE_MAX_POLL_INTERVAL = 2.0  # seconds, polling backs off up to this delay
+
+def submit_snowflake_query(conn, query):
+    """Submit a statement without waiting for it and return its Snowflake query ID."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute_async(query)
+        return cursor.sfqid
+    finally:
+        cursor.close()
 
-def _execute_sqlite_query_inner(query, db_path, fetch_results=True):
-    
-    conn = None
-    cursor = None
+def cancel_snowflake_query(conn, sfqid):
     try:
-        conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
-        start_time = time.perf_counter()
+        try:
+            cursor.execute(f"SELECT SYSTEM$CANCEL_QUERY('{sfqid}')")
+        finally:
+            cursor.close()
+    except Exception as e:
+        print(f"Failed to cancel Snowflake query {sfqid}: {e}")
 
-        cursor.execute(query)
+def _collect_snowflake_async_result(conn, sfqid, fetch_results, start_time):
+    conn.get_query_status_throw_if_error(sfqid)
+    if not fetch_results:
+        return 0, None
+    cursor = conn.cursor()
+    try:
+        cursor.get_results_from_sfqid(sfqid)
+        return _format_snowflake_results(cursor, start_time)
+    finally:
+        cursor.close()
 
-        if fetch_results:
-            results = cursor.fetchall()
-            end_time = time.perf_counter()
-            execution_time = end_time - start_time
+def execute_snowflake_queries_async(queries, credentials, fetch_results=True, timeout=200):
+    """
+    Submit all queries on a single pooled session, then poll them by query ID until each one finishes,
+    fails or exceeds `timeout` seconds (in which case it is cancelled server-side).
+    Returns a list of (status_code, message) tuples in input order.
+    """
+    pool = get_snowflake_pool(credentials)
+    results = [None] * len(queries)
+    pending = {}
+    conn = None
+    discard = False
+    try:
+        conn = pool.acquire()
+        for idx, query in enumerate(queries):
+            try:
+                pending[idx] = (submit_snowflake_query(conn, query), time.time())
+            except Exception as e:
+                code, msg, broken = _snowflake_error_result(e)
+                results[idx] = (code, msg)
+                discard = discard or broken
 
-            if results:
-                columns = [desc[0] for desc in cursor.description]
-                results_pd = pd.DataFrame(results, columns=columns)
-                df_str = results_pd.to_string(index=True, show_dimensions=True, max_rows=10)
+        interval = SNOWFLAKE_POLL_INTERVAL
+        while pending:
+            for idx, (sfqid, start_time) in list(pending.items()):
+                try:
+                    status = conn.get_query_status(sfqid)
+                    if conn.is_still_running(status):
+                        if time.time() - start_time > timeout:
+                            cancel_snowflake_query(conn, sfqid)
+                            results[idx] = (3, f"Timeout: query {sfqid} exceeded {timeout} seconds and was cancelled.")
+                            del pending[idx]
+                        continue
+                    del pending[idx]
+                    results[idx] = _collect_snowflake_async_result(conn, sfqid, fetch_results, start_time)
+                except Exception as e:
+                    pending.pop(idx, None)
+                    code, msg, broken = _snowflake_error_result(e)
+                    results[idx] = (code, msg)
+                    discard = discard or broken
+            if pending:
+                time.sleep(interval)
+                interval = min(interval * 1.5, SNOWFLAKE_MAX_POLL_INTERVAL)
+
+    except Exception as e:
+        code, msg, discard = _snowflake_error_result(e)
+        for idx, (sfqid, _) in pending.items():
+            if conn is not None:
+                cancel_snowflake_query(conn, sfqid)
+        results = [r if r is not None else (code, msg) for r in results]
+    finally:
+        if conn is not None:
+            try:
+                if conn.is_closed():
+                    discard = True
+            except Exception:
+                discard = True
+            pool.release(conn, discard=discard)
+    return results
+
+def execute_snowflake_query_async(query, credentials, fetch_results=True, timeout=200):
+    return execute_snowflake_queries_async([query], credentials, fetch_results, timeout)[0]
+
+# --- SQLite connection pool ---
+# Exploration, repair and generation steps hit the same local database many times per question,
+# so read-only connections are kept open per database file and reused (warm page cache, no re-open).
+SQLITE_POOL_SIZE = 4
+SQLITE_IMMUTABLE = False  # Set to True only if the .sqlite files are never modified while the pipeline runs
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # bytes
+SQLITE_CACHE_SIZE = -64000  # negative value = size in KiB (about 64 MB per connection)
+
+class SQLiteConnectionPool(ConnectionPool):
+    """Pool of read-only connections to a single SQLite database file."""
+    def __init__(self, db_path, max_size=SQLITE_POOL_SIZE, immutable=SQLITE_IMMUTABLE):
+        super().__init__(max_size)
+        self.db_path = os.path.abspath(db_path)
+        self.immutable = immutable
+
+    def _connect(self):
+        if not os.path.exists(self.db_path):
+            # mode=ro would fail anyway; raise the same error type the old sqlite3.connect path surfaced
+            raise sqlite3.OperationalError(f"unable to open database file: {self.db_path}")
+        uri = f"file:{urllib.parse.quote(self.db_path)}?mode=ro"
+        if self.immutable:
+            uri += "&immutable=1"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size = {int(SQLITE_MMAP_SIZE)}")
+        conn.execute(f"PRAGMA cache_size = {int(SQLITE_CACHE_SIZE)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except (sqlite3.InterfaceError, sqlite3.DatabaseError) as e:
+            # Keep the connection unless it can no longer be trusted (OperationalError is a DatabaseError;
+            # a corrupt file raises a plain DatabaseError)
+            message = str(e)
+            broken = any(marker in message for marker in ("unable to open", "disk I/O", "malformed", "not a database"))
+            raise
+        finally:
+            self.release(conn, discard=broken)
 
-                # Remove empty lines
-                lines = df_str.splitlines()
-                non_empty_lines = [line for line in lines if line.strip()]
-                cleaned_df_str = '\n'.join(non_empty_lines)
+_sqlite_pools = {}
+_sqlite_pools_lock = threading.Lock()
 
-                return 0, cleaned_df_str + f"\nQuery Time: {execution_time:.4f} s"
-            else:
-                return 0, f"[]\n\nQuery Time: {execution_time:.4f} s"
-        else:
+def get_sqlite_pool(db_path):
+    """
+    Return the process-wide connection pool for db_path, creating it on first use.
+    With SQLITE_SNAPSHOT_ENABLED, small databases are served from an in-memory snapshot instead.
+    """
+    key = os.path.abspath(db_path)
+    if SQLITE_SNAPSHOT_ENABLED:
+        pool = get_sqlite_snapshot_pool(key)
+        if pool is not None:
+            return pool
+    with _sqlite_pools_lock:
+        pool = _sqlite_pools.get(key)
+        if pool is None:
+            pool = SQLiteConnectionPool(key)
+            _sqlite_pools[key] = pool
+        return pool
+
+def close_sqlite_pools():
+    with _sqlite_pools_lock:
+        pools = list(_sqlite_pools.values())
+        _sqlite_pools.clear()
+    for pool in pools:
+        pool.close_all()
+    close_sqlite_snapshots()
+
+# --- In-memory SQLite snapshots ---
+# Small databases are copied into process memory once (backup API into a shared "memdb" database) and every
+# pooled connection reads that copy, so repeated queries never touch the file. Total snapshot memory is
+# bounded by an LRU across databases; a snapshot is reloaded when its file's mtime changes.
+SQLITE_SNAPSHOT_ENABLED = False
+SQLITE_SNAPSHOT_MAX_DB_SIZE = 64 * 1024 * 1024  # bytes; larger files keep using the file-backed pool
+SQLITE_SNAPSHOT_MEMORY_LIMIT = 1024 * 1024 * 1024  # bytes across all snapshots
+
+class SQLiteSnapshotPool(SQLiteConnectionPool):
+    """Pool of read-only connections to an in-memory copy of a SQLite database file."""
+    _names = itertools.count(1)
+
+    def __init__(self, db_path, max_size=SQLITE_POOL_SIZE):
+        super().__init__(db_path, max_size)
+        self.mtime = os.path.getmtime(self.db_path)
+        self.uri = f"file:/dsr_snapshot_{next(self._names)}?vfs=memdb"
+        # The holder connection keeps the shared in-memory database alive for the lifetime of the snapshot
+        self._holder = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        source = sqlite3.connect(f"file:{urllib.parse.quote(self.db_path)}?mode=ro", uri=True)
+        try:
+            source.backup(self._holder)
+        finally:
+            source.close()
+        page_count = self._holder.execute("PRAGMA page_count").fetchone()[0]
+        page_size = self._holder.execute("PRAGMA page_size").fetchone()[0]
+        self.size = page_count * page_size
+
+    def _connect(self):
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def close_all(self):
+        super().close_all()
+        self._holder.close()
+
+_sqlite_snapshots = OrderedDict()  # db_path -> SQLiteSnapshotPool, least recently used first
+_sqlite_snapshot_bytes = 0
+_sqlite_snapshots_lock = threading.Lock()
+
+def get_sqlite_snapshot_pool(db_path):
+    """Return the snapshot pool for db_path, loading it if needed; None if the file is too large or missing."""
+    global _sqlite_snapshot_bytes
+    try:
+        file_size = os.path.getsize(db_path)
+        mtime = os.path.getmtime(db_path)
+    except OSError:
+        return None
+    if file_size > SQLITE_SNAPSHOT_MAX_DB_SIZE or file_size > SQLITE_SNAPSHOT_MEMORY_LIMIT:
+        return None
+    with _sqlite_snapshots_lock:
+        pool = _sqlite_snapshots.get(db_path)
+        if pool is not None and pool.mtime == mtime:
+            _sqlite_snapshots.move_to_end(db_path)
+            return pool
+        evicted = []
+        if pool is not None:
+            evicted.append(_sqlite_snapshots.pop(db_path))
+            _sqlite_snapshot_bytes -= pool.size
+        pool = SQLiteSnapshotPool(db_path)
+        _sqlite_snapshots[db_path] = pool
+        _sqlite_snapshot_bytes += pool.size
+        while _sqlite_snapshot_bytes > SQLITE_SNAPSHOT_MEMORY_LIMIT and len(_sqlite_snapshots) > 1:
+            _, old = _sqlite_snapshots.popitem(last=False)
+            _sqlite_snapshot_bytes -= old.size
+            evicted.append(old)
+    for old in evicted:
+        old.close_all()
+    return pool
+
+def close_sqlite_snapshots():
+    global _sqlite_snapshot_bytes
+    with _sqlite_snapshots_lock:
+        pools = list(_sqlite_snapshots.values())
+        _sqlite_snapshots.clear()
+        _sqlite_snapshot_bytes = 0
+    for pool in pools:
+        pool.close_all()
+
+def _format_sqlite_results(results, execution_time):
+    if results:
+        # The SQLite output has always been printed without empty lines
+        table = "\n".join(line for line in render_result_table(results).splitlines() if line.strip())
+        return 0, table + f"\nQuery Time: {execution_time:.4f} s"
+    else:
+        return 0, f"[]\n\nQuery Time: {execution_time:.4f} s"
+
+# --- SQLite query cancellation ---
+# A deadline is enforced from inside SQLite through the progress handler, so a timed-out statement is
+# aborted by the engine itself (no orphaned thread) and its connection can go straight back to the pool.
+SQLITE_QUERY_TIMEOUT = 30  # seconds
+SQLITE_PROGRESS_STEPS = 10000  # VM instructions between deadline checks
+
+class _SQLiteDeadline:
+    def __init__(self, conn, timeout):
+        self.conn = conn
+        self.deadline = time.monotonic() + timeout
+        self.timed_out = False
+
+    def _check(self):
+        if time.monotonic() > self.deadline:
+            self.timed_out = True
+            return 1  # Non-zero aborts the running statement with "interrupted"
+        return 0
+
+    def __enter__(self):
+        self.conn.set_progress_handler(self._check, SQLITE_PROGRESS_STEPS)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.set_progress_handler(None, 0)
+        return False
+
+def _sqlite_timeout_message(timeout):
+    return f"SQLite Database Error: execution exceeded {timeout} seconds."
+
+def _execute_sqlite_write_inner(query, db_path, timeout=SQLITE_QUERY_TIMEOUT):
+    # Pooled connections are read-only, so statements that do not fetch results use a one-off read-write connection.
+    conn = None
+    deadline = None
+    try:
+        conn = sqlite3.connect(db_path)
+        start_time = time.perf_counter()
+        with _SQLiteDeadline(conn, timeout) as deadline:
+            conn.execute(query)
             conn.commit()
-            end_time = time.perf_counter()
-            execution_time = end_time - start_time
-            return 0, f"Operation successful.\nExecution Time: {execution_time:.4f} s"
-
+        execution_time = time.perf_counter() - start_time
+        return 0, f"Operation successful.\nExecution Time: {execution_time:.4f} s"
     except sqlite3.ProgrammingError as pe:
         return 1, f"SQLite Programming Error: {pe}"
     except sqlite3.DatabaseError as de:
+        if deadline is not None and deadline.timed_out:
+            return 2, _sqlite_timeout_message(timeout)
         return 2, f"SQLite Database Error: {de}"
     except Exception as e:
         return 3, f"Unknown Error: {e}"
     finally:
-        if cursor:
-            cursor.close()
         if conn:
             conn.close()
 
-def execute_sqlite_query(query, db_path, fetch_results=True):
+def _execute_sqlite_query_inner(query, db_path, fetch_results=True, timeout=SQLITE_QUERY_TIMEOUT):
+    if not fetch_results:
+        return _execute_sqlite_write_inner(query, db_path, timeout)
+
+    cursor = None
+    deadline = None
     try:
-        return func_timeout(30, _execute_sqlite_query_inner, args=(query, db_path, fetch_results))
-    except FunctionTimedOut:
-        # If the first 30 seconds are exceeded, try again with another 30-second grace period.
-        try:
-            return func_timeout(30, _execute_sqlite_query_inner, args=(query, db_path, fetch_results))
-        except FunctionTimedOut:
-            return 2, "SQLite Database Error: execution exceeded 30 seconds."
+        with get_sqlite_pool(db_path).connection() as conn:
+            try:
+                cursor = conn.cursor()
+                start_time = time.perf_counter()
+                with _SQLiteDeadline(conn, timeout) as deadline:
+                    cursor.execute(query)
+                    columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                    results = collect_bounded_rows(columns, iter_cursor_batches(cursor), max_rows=10)
+                execution_time = time.perf_counter() - start_time
+                return _format_sqlite_results(results, execution_time)
+            finally:
+                if cursor:
+                    cursor.close()
+
+    except sqlite3.ProgrammingError as pe:
+        return 1, f"SQLite Programming Error: {pe}"
+    except sqlite3.DatabaseError as de:
+        if deadline is not None and deadline.timed_out:
+            return 2, _sqlite_timeout_message(timeout)
+        return 2, f"SQLite Database Error: {de}"
+    except Exception as e:
+        return 3, f"Unknown Error: {e}"
 
-def execute_snowflake_query(query, credentials, db_id, fetch_results=True, timeout=200):
+def execute_sqlite_query(query, db_path, fetch_results=True, timeout=SQLITE_QUERY_TIMEOUT):
+    # A timeout is deterministic for the same query and database, so it is reported once instead of retried.
+    return _execute_sqlite_query_inner(query, db_path, fetch_results, timeout)
+
+def execute_snowflake_query(query, credentials, db_id, fetch_results=True, timeout=200, max_retries=10, deadline=None):
     """
     ⚠️⚠️⚠️ WARNING/警告 ⚠️⚠️⚠️
     !!!Using this function in real-world scenarios is a rather expensive and risky endeavor; this paper is constrained by the latency of the shared database and is solely aimed at maximizing the score.!!!
     !!!在真实场景中使用此函数是个相当昂贵并且冒险的行为，本文受限于共享数据库的延迟并且仅为了分数最大化!!!
     
-    Aggressive concurrent query execution:
-    1. Run 5 threads in parallel; use the result from the first to finish.
-    2. Return immediately upon receiving a valid result, without waiting for other threads (using shutdown(wait=False)).
-    3. Cost-agnostic mode: background threads are allowed to run to completion or terminate on their own.
+    Executes the query on a pooled, already-authenticated session (blocking, or via query ID when
+    SNOWFLAKE_EXECUTION_MODE == "async"):
+    1. Any result that is not a timeout/unknown failure (code 3) is returned immediately.
+    2. On code 3 the query is retried; a session that failed is replaced by the pool, a healthy one is reused.
+    3. If a deadline (time.monotonic() value) is given, no attempt runs past it.
     """
-    max_retries = 10
-    concurrency = 1
-    
+    execute = execute_snowflake_query_async if SNOWFLAKE_EXECUTION_MODE == "async" else _execute_snowflake_query_inner
     for attempt in range(max_retries):
-        pool = None
-        try:
-            # Start multiprocessing pool
-            pool = multiprocessing.Pool(processes=concurrency)
-            async_results = []
-            
-            # Submit tasks
-            for _ in range(concurrency):
-                # Note: apply_async is non-blocking
-                res = pool.apply_async(
-                    _execute_snowflake_query_inner, 
-                    args=(query, credentials, fetch_results, timeout)
-                )
-                async_results.append(res)
-            
-            # Polling for results
-            # We need to get the first result and kill the pool, so we can't use simple pool.map
-            loop_start = time.time()
-            finished_count = 0
-            
-            while True:
-                any_success = False
-                
-                # Check status of all tasks
-                for i, res in enumerate(async_results):
-                    if res.ready():
-                        try:
-                            # The timeout here is for getting results, not query timeout
-                            code, msg = res.get(timeout=0.1)
-                            
-                            # Judgment logic:
-                            # code != 3 (not timeout) -> considered a valid result (whether success 0 or error 1,2), adopt it directly
-                            if code != 3:
-                                # 【Core Nuke】Found valid result, immediately terminate process pool
-                                pool.terminate() 
-                                pool.join() # Wait for OS to clean up zombie processes
-                                return code, msg
-                            
-                            # If timeout (3), mark this task as abandoned, continue waiting for others
-                            # To avoid duplicate checks, can remove it from list, or simply count
-                            # Simple handling here: if result is 3, do nothing, wait for loop to end to judge if all failed
-                            
-                        except Exception as e:
-                            # Process communication exception, ignore, check next one
-                            pass
-                
-                # Count how many tasks have completed (even if failed/timed out)
-                finished_count = sum(1 for res in async_results if res.ready())
-                
-                # If all concurrent tasks have finished, and code reaches here, it means none had code != 3
-                # Then this batch all timed out/failed
-                if finished_count == concurrency:
-                    print(f"Batch {attempt + 1} all timed out or failed. Retrying...")
-                    pool.terminate()
-                    pool.join()
-                    break # Break out of while, enter outer for for next retry
-                
-                # Avoid CPU busy-waiting
-                time.sleep(0.1)
-                
-                # Additional total timeout protection (prevent processes from hanging)
-                if time.time() - loop_start > timeout + 10:
-                    print(f"Batch {attempt + 1} hard timeout limit reached.")
-                    pool.terminate()
-                    pool.join()
-                    break
-
-        except Exception as e:
-            print(f"Critical error in batch execution: {e}")
-            if pool:
-                pool.terminate()
-                pool.join()
-        finally:
-            # Fallback: ensure pool is definitely closed
-            if pool:
-                # close() waits for tasks to complete, terminate() kills immediately. Here use terminate to ensure no residue
-                try:
-                    pool.terminate() 
-                    pool.join()
-                except:
-                    pass
+        attempt_timeout = timeout
+        if deadline is not None:
+            attempt_timeout = min(timeout, deadline - time.monotonic())
+            if attempt_timeout <= 0:
+                return 3, f"Execution timed out: deadline reached after {attempt} attempts."
+        code, msg = execute(query, credentials, fetch_results, attempt_timeout)
+        if code != 3:
+            return code, msg
+        print(f"Attempt {attempt + 1} timed out or failed: {msg}. Retrying...")
 
     return 3, f"Execution timed out after {max_retries} attempts."
 
-def _execute_bigquery_query_inner(query, credentials_path, fetch_results=True):
+# --- BigQuery client cache and job polling ---
+# Building a client reloads the service-account file and opens a new HTTP session, so one client is kept
+# per credentials path. Jobs are submitted without blocking and polled, which lets many exploration queries
+# run in flight from one thread; a job that exceeds its timeout is cancelled through the job API.
+BIGQUERY_POLL_INTERVAL = 0.2  # seconds, first polling delay
+BIGQUERY_MAX_POLL_INTERVAL = 2.0  # seconds, polling backs off up to this delay
+
+def _create_bigquery_client(credentials_path):
+    credentials = service_account.Credentials.from_service_account_file(credentials_path)
+    return bigquery.Client(credentials=credentials)
+
+_bigquery_client_factory = _create_bigquery_client
+_bigquery_clients = {}
+_bigquery_clients_lock = threading.Lock()
+
+def get_bigquery_client(credentials_path):
+    """Return the process-wide client for this credentials file, creating it on first use."""
+    with _bigquery_clients_lock:
+        client = _bigquery_clients.get(credentials_path)
+        if client is None:
+            t0 = time.time()
+            client = _bigquery_client_factory(credentials_path)
+            print(f"Connection time: {time.time() - t0:.2f} S")
+            _bigquery_clients[credentials_path] = client
+        return client
+
+def close_bigquery_clients():
+    with _bigquery_clients_lock:
+        clients = list(_bigquery_clients.values())
+        _bigquery_clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
 
-    try:
-        t0 = time.time()
-        credentials = service_account.Credentials.from_service_account_file(credentials_path)
-        client = bigquery.Client(credentials=credentials)
-        t1 = time.time()
-        print(f"Connection time: {t1 - t0:.2f} S")
+def set_bigquery_client_factory(factory):
+    """
+    Replace the function used to build BigQuery clients from a credentials path, e.g. with a stub client
+    for offline testing. Cached clients are closed.
+    """
+    global _bigquery_client_factory
+    _bigquery_client_factory = factory
+    close_bigquery_clients()
+
+def iter_arrow_batches(rows):
+    """Yield lists of row tuples from a RowIterator, one Arrow record batch at a time."""
+    for record_batch in rows.to_arrow_iterable():
+        yield list(zip(*(column.to_pylist() for column in record_batch.columns)))
+
+def _collect_bigquery_result(query_job, fetch_results, start_time):
+    if not fetch_results:
+        query_job.result()
+        return 0, None
+    rows = query_job.result(page_size=FETCH_BATCH_SIZE)
+    columns = [field.name for field in rows.schema]
+    # collect_bounded_rows stops pulling batches at FETCH_ROW_LIMIT, so later pages are never downloaded
+    results = collect_bounded_rows(columns, iter_arrow_batches(rows), max_rows=20, reported_total=rows.total_rows)
+    execution_time = time.time() - start_time
+    print(f"BigQuery job complete. Cache hit: {query_job.cache_hit}. Data billed: {(query_job.total_bytes_billed or 0) / 1024 / 1024:.2f} MB")
+    if results:
+        return 0, truncate_text_by_tokens(render_result_table(results)) + f"\nQuery Time: {execution_time:.2f} s"
+    else:
+        return 0, '[]'
 
-        start_time = time.time()
-        query_job = client.query(query)
+def cancel_bigquery_job(query_job):
+    try:
+        query_job.cancel()
+    except Exception as e:
+        print(f"Failed to cancel BigQuery job {query_job.job_id}: {e}")
+
+# --- BigQuery dry-run cost guard ---
+# Every query is dry-run first (free, no data read) to learn total_bytes_processed. A query above the byte
+# limit is either rejected with a structured error for the repair loop, or rewritten with TABLESAMPLE.
+BIGQUERY_MAX_BYTES_PROCESSED = 50 * 1024 ** 3  # bytes; None disables the guard
+BIGQUERY_OVER_LIMIT_ACTION = "reject"  # "reject": return an error | "sample": add TABLESAMPLE to base tables, then re-check
+BIGQUERY_MIN_SAMPLE_PERCENT = 0.01
+
+def estimate_bigquery_bytes(client, query):
+    """Dry-run the query and return the number of bytes it would process. Invalid SQL raises here."""
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+    return client.query(query, job_config=job_config).total_bytes_processed or 0
+
+def _format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:.2f} {unit}" if unit != "B" else f"{n} B"
+        n /= 1024
+
+def bigquery_cost_error(query, estimated_bytes, limit_bytes):
+    """Structured over-limit error; fields are one per line so the repair prompt can quote them."""
+    return 1, (
+        "BigQuery Cost Guard Error: query rejected before execution.\n"
+        f"estimated_bytes_processed: {estimated_bytes} ({_format_bytes(estimated_bytes)})\n"
+        f"limit_bytes: {limit_bytes} ({_format_bytes(limit_bytes)})\n"
+        "suggestion: select fewer columns, filter on partition/cluster columns, or sample with TABLESAMPLE SYSTEM (n PERCENT)."
+    )
+
+def add_bigquery_tablesample(query, percent):
+    """Add TABLESAMPLE SYSTEM (percent) to every base table in the query. Returns None if it cannot be rewritten."""
+    if sqlglot is None:
+        return None
+    try:
+        tree = sqlglot.parse_one(query, read="bigquery")
+    except Exception:
+        return None
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    sampled = False
+    for table in tree.find_all(exp.Table):
+        if table.name.lower() in cte_names or "information_schema" in table.sql("bigquery").lower():
+            continue
+        table.set("sample", exp.TableSample(method=exp.var("SYSTEM"), percent=exp.Literal.number(percent)))
+        sampled = True
+    return tree.sql("bigquery") if sampled else None
 
-        if fetch_results:
-            results = query_job.result()
-            df = pd.DataFrame([dict(row.items()) for row in results])
-            end_time = time.time()
-            execution_time = end_time - start_time
-            print(f"BigQuery job complete. Cache hit: {query_job.cache_hit}. Data billed: {(query_job.total_bytes_billed or 0) / 1024 / 1024:.2f} MB")
-            if not df.empty:
-                df_str = df.to_string(index=True, show_dimensions=True, max_rows=20)
-                df_str_no_empty_lines = re.sub(r'\n\s*\n', '\n', df_str)
-                return 0, truncate_text_by_tokens(df_str_no_empty_lines) + f"\nQuery Time: {execution_time:.2f} s"
-            else:
-                return 0, '[]'
-        else:
-            query_job.result()
-            return 0, None
+def apply_bigquery_cost_guard(client, query):
+    """
+    Returns (query_to_run, None) when the query is within the byte limit (possibly rewritten with a sample),
+    or (None, (status_code, message)) when it is rejected. Dry-run failures of the original query propagate to the
+    caller; a sampled rewrite that fails its dry run is dropped and the original's estimate decides.
+    """
+    if BIGQUERY_MAX_BYTES_PROCESSED is None:
+        return query, None
+    estimated = estimate_bigquery_bytes(client, query)
+    if estimated <= BIGQUERY_MAX_BYTES_PROCESSED:
+        return query, None
+    if BIGQUERY_OVER_LIMIT_ACTION == "sample":
+        percent = max(round(100 * BIGQUERY_MAX_BYTES_PROCESSED / estimated, 2), BIGQUERY_MIN_SAMPLE_PERCENT)
+        sampled_query = add_bigquery_tablesample(query, percent)
+        sampled_estimate = None
+        if sampled_query is not None:
+            try:
+                sampled_estimate = estimate_bigquery_bytes(client, sampled_query)
+            except Exception as e:
+                # TABLESAMPLE is not allowed everywhere (views, external tables...): keep the original's dry run
+                print(f"BigQuery cost guard: sampled rewrite failed its dry run, using the original estimate. Error: {e}")
+            if sampled_estimate is not None and sampled_estimate <= BIGQUERY_MAX_BYTES_PROCESSED:
+                print(f"BigQuery cost guard: {_format_bytes(estimated)} over limit, running with TABLESAMPLE {percent}% "
+                      f"({_format_bytes(sampled_estimate)}):\n{sampled_query}")
+                return sampled_query, None
+    return None, bigquery_cost_error(query, estimated, BIGQUERY_MAX_BYTES_PROCESSED)
+
+def execute_bigquery_queries_async(queries, credentials_path, fetch_results=True, timeout=200):
+    """
+    Submit all queries as BigQuery jobs, then poll them until each one finishes, fails or exceeds
+    `timeout` seconds (in which case the job is cancelled).
+    Returns a list of (status_code, message) tuples in input order.
+    """
+    results = [None] * len(queries)
+    try:
+        client = get_bigquery_client(credentials_path)
     except Exception as e:
-        return 3, f"BigQuery programming Error: {e}"
+        return [(3, f"BigQuery programming Error: {e}")] * len(queries)
+
+    pending = {}
+    for idx, query in enumerate(queries):
+        try:
+            query, rejected = apply_bigquery_cost_guard(client, query)
+            if rejected:
+                results[idx] = rejected
+                continue
+            # client.query only inserts the job; it does not wait for the job to finish
+            pending[idx] = (client.query(query), time.time())
+        except Exception as e:
+            results[idx] = (3, f"BigQuery programming Error: {e}")
+
+    interval = BIGQUERY_POLL_INTERVAL
+    while pending:
+        for idx, (query_job, start_time) in list(pending.items()):
+            try:
+                if not query_job.done():
+                    if time.time() - start_time > timeout:
+                        cancel_bigquery_job(query_job)
+                        results[idx] = (3, f"Execution timed out after {timeout} seconds; job {query_job.job_id} was cancelled.")
+                        del pending[idx]
+                    continue
+                del pending[idx]
+                results[idx] = _collect_bigquery_result(query_job, fetch_results, start_time)
+            except Exception as e:
+                pending.pop(idx, None)
+                results[idx] = (3, f"BigQuery programming Error: {e}")
+        if pending:
+            time.sleep(interval)
+            interval = min(interval * 2, BIGQUERY_MAX_POLL_INTERVAL)
+    return results
 
 def execute_bigquery_query(query, credentials_path, fetch_results=True, timeout=200):
+    return execute_bigquery_queries_async([query], credentials_path, fetch_results, timeout)[0]
+
+# --- MySQL/Doris connection pool and streaming execution ---
+# Connections are pooled per (server, user, database). Results are streamed with an unbuffered SSCursor,
+# so only the displayed rows are kept in memory. Timeouts are enforced by the server (MAX_EXECUTION_TIME
+# on MySQL, query_timeout on Doris), with a KILL QUERY watchdog as a backstop for statements those do not cover.
+MYSQL_POOL_SIZE = 4
+MYSQL_CONNECT_TIMEOUT = 10  # seconds
+MYSQL_KILL_GRACE = 5  # seconds past the timeout before the watchdog issues KILL QUERY
+MYSQL_TIMEOUT_ERRORS = (3024, 1317, 1028)  # max execution time exceeded, query interrupted, Doris query timeout
+MYSQL_CONNECTION_ERRORS = (2003, 2006, 2013, 2055, 0)  # can't connect, server gone away, lost connection
+# A statement that was sent before the connection dropped is only retried if it cannot have changed anything
+MYSQL_READ_ONLY_PATTERN = re.compile(r"^(?:\s|--[^\n]*(?:\n|$)|#[^\n]*(?:\n|$)|/\*.*?\*/|\()*(SELECT|WITH|SHOW|DESC|DESCRIBE|EXPLAIN)\b",
+                                     re.IGNORECASE | re.DOTALL)
+MYSQL_WRITE_PATTERN = re.compile(r"\b(INSERT|UPDATE|DELETE|REPLACE|MERGE|CREATE|DROP|ALTER|TRUNCATE|RENAME|GRANT|REVOKE|"
+                                 r"SET|LOCK|CALL|LOAD|HANDLER|INTO)\b", re.IGNORECASE)
+
+_mysql_connect = pymysql.connect
+
+def _mysql_connect_args(credentials, db_name):
+    return dict(
+        host=credentials.get("host", "localhost"),
+        port=credentials.get("port", 3306),
+        user=credentials.get("user"),
+        password=credentials.get("password"),
+        database=db_name if db_name else credentials.get("database", ""),
+        charset='utf8mb4',
+        connect_timeout=MYSQL_CONNECT_TIMEOUT,
+    )
+
+class MySQLConnectionPool(ConnectionPool):
+    """Pool of connections to one MySQL/Doris database."""
+    def __init__(self, credentials, db_name, max_size=MYSQL_POOL_SIZE):
+        super().__init__(max_size)
+        self.credentials = credentials
+        self.db_name = db_name
+
+    def _connect(self):
+        return _mysql_connect(cursorclass=pymysql.cursors.SSCursor, **_mysql_connect_args(self.credentials, self.db_name))
+
+_mysql_pools = {}
+_mysql_pools_lock = threading.Lock()
+
+def get_mysql_pool(credentials, db_name=None):
+    """Return the process-wide connection pool for these credentials and database, creating it on first use."""
+    key = (credentials.get("host", "localhost"), credentials.get("port", 3306), credentials.get("user"),
+           db_name if db_name else credentials.get("database", ""))
+    with _mysql_pools_lock:
+        pool = _mysql_pools.get(key)
+        if pool is None:
+            pool = MySQLConnectionPool(credentials, db_name)
+            _mysql_pools[key] = pool
+        return pool
+
+def close_mysql_pools():
+    with _mysql_pools_lock:
+        pools = list(_mysql_pools.values())
+        _mysql_pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+def set_mysql_connector(connect_fn):
+    """
+    Replace the function used to open MySQL/Doris connections, e.g. with the offline stand-in from
+    utils/DBsetup/Local_Connector.py. Existing pooled connections are closed.
+    """
+    global _mysql_connect
+    _mysql_connect = connect_fn
+    close_mysql_pools()
+
+def kill_mysql_query(credentials, db_name, thread_id):
+    """Cancel the statement running on connection `thread_id` from a separate, short-lived connection."""
     try:
-        return func_timeout(timeout, _execute_bigquery_query_inner,
-                            args=(query, credentials_path, fetch_results))
-    except FunctionTimedOut:
-        return 3, f"Execution timed out after {timeout} seconds."
+        conn = _mysql_connect(**_mysql_connect_args(credentials, db_name))
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"KILL QUERY {int(thread_id)}")
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Failed to kill MySQL/Doris query on connection {thread_id}: {e}")
+
+def _set_mysql_statement_timeout(conn, timeout, db_type):
+    with conn.cursor() as cursor:
+        if db_type == "doris":
+            cursor.execute(f"SET query_timeout = {max(int(timeout), 1)}")
+        else:
+            cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {int(timeout * 1000)}")
+
+def _mysql_error_code(e):
+    return e.args[0] if e.args and isinstance(e.args[0], int) else None
+
+def is_read_only_mysql_query(query):
+    """True for SELECT / WITH / SHOW / DESCRIBE / EXPLAIN statements that name no writing keyword."""
+    return bool(MYSQL_READ_ONLY_PATTERN.match(query)) and not MYSQL_WRITE_PATTERN.search(query)
 
-def _execute_mysql_query_inner(query, credentials, db_name=None, fetch_results=True):
+def _execute_mysql_query_inner(query, credentials, db_name=None, fetch_results=True, timeout=200, db_type="mysql"):
     """
-    Internal execution function for MySQL/Doris: runs in a separate process.
+    Internal execution function for MySQL/Doris: runs the query on a pooled connection.
+    Returns (status_code, message, connection_lost, sent); sent is False if the connection failed before the
+    statement itself was sent to the server.
     """
+    pool = get_mysql_pool(credentials, db_name)
     conn = None
     cursor = None
+    watchdog = None
+    discard = False
+    sent = False
     try:
-        conn = pymysql.connect(
-            host=credentials.get("host", "localhost"),
-            port=credentials.get("port", 3306),
-            user=credentials.get("user"),
-            password=credentials.get("password"),
-            database=db_name if db_name else credentials.get("database", ""),
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
+        conn = pool.acquire()
+        _set_mysql_statement_timeout(conn, timeout, db_type)
+        watchdog = threading.Timer(timeout + MYSQL_KILL_GRACE, kill_mysql_query,
+                                   args=(credentials, db_name, conn.thread_id()))
+        watchdog.daemon = True
+        watchdog.start()
+
         cursor = conn.cursor()
         start_time = time.time()
         
+        sent = True
         cursor.execute(query)
         
         if fetch_results:
-            results = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            results = collect_bounded_rows(columns, iter_cursor_batches(cursor), max_rows=20)
+            if not results.exact:
+                # Unread rows are still streaming in; closing the cursor would drain them, so drop the connection
+                cursor = None
+                discard = True
             end_time = time.time()
             execution_time = end_time - start_time
             
             if results:
-                # Convert dict cursor results to DataFrame
-                df = pd.DataFrame(results)
-                df_str = df.to_string(index=True, show_dimensions=True, max_rows=20)
-                df_str_no_empty_lines = re.sub(r'\n\s*\n', '\n', df_str)
-                return 0, truncate_text_by_tokens(df_str_no_empty_lines) + f"\nQuery Time: {execution_time:.2f} s"
+                return 0, truncate_text_by_tokens(render_result_table(results)) + f"\nQuery Time: {execution_time:.2f} s", False, sent
             else:
-                return 0, '[]'
+                return 0, '[]', False, sent
         else:
             conn.commit()
             end_time = time.time()
             execution_time = end_time - start_time
-            return 0, f"Operation successful.\nExecution Time: {execution_time:.2f} s"
+            return 0, f"Operation successful.\nExecution Time: {execution_time:.2f} s", False, sent
     
     except PyMySQLError as pe:
-        return 1, f"MySQL/Doris Programming Error: {pe}"
+        code = _mysql_error_code(pe)
+        if code in MYSQL_TIMEOUT_ERRORS:
+            return 3, f"Execution timed out after {timeout} seconds.", False, sent
+        if isinstance(pe, (pymysql.err.InterfaceError, pymysql.err.OperationalError)) and code in MYSQL_CONNECTION_ERRORS:
+            discard = True
+            return 3, f"MySQL/Doris Connection Error: {pe}", True, sent
+        return 1, f"MySQL/Doris Programming Error: {pe}", False, sent
     except Exception as e:
-        return 3, f"Unknown Error: {e}"
+        discard = True
+        return 3, f"Unknown Error: {e}", False, sent
     finally:
+        if watchdog is not None:
+            watchdog.cancel()
         try:
             if cursor: cursor.close()
-            if conn: conn.close()
         except:
-            pass
+            discard = True
+        pool.release(conn, discard=discard)
 
-def execute_mysql_query(query, credentials, db_name=None, fetch_results=True, timeout=200):
+def execute_mysql_query(query, credentials, db_name=None, fetch_results=True, timeout=200, db_type="mysql"):
     """
-    Execute MySQL query with timeout protection.
+    Execute MySQL query with server-side timeout protection.
+    A pooled connection that the server has dropped (e.g. after wait_timeout) is replaced and the query retried once,
+    if the statement never reached the server or is read-only; a write may already have been applied, so it is not.
     """
-    try:
-        return func_timeout(timeout, _execute_mysql_query_inner,
-                            args=(query, credentials, db_name, fetch_results))
-    except FunctionTimedOut:
-        return 3, f"Execution timed out after {timeout} seconds."
+    code, msg, connection_lost, sent = _execute_mysql_query_inner(query, credentials, db_name, fetch_results, timeout, db_type)
+    if connection_lost and (not sent or is_read_only_mysql_query(query)):
+        code, msg, _, _ = _execute_mysql_query_inner(query, credentials, db_name, fetch_results, timeout, db_type)
+    return code, msg
 
 def execute_doris_query(query, credentials, db_name=None, fetch_results=True, timeout=200):
     """
     Execute Doris query. Doris uses MySQL protocol, so we can reuse MySQL execution function.
     """
-    return execute_mysql_query(query, credentials, db_name, fetch_results, timeout)
+    return execute_mysql_query(query, credentials, db_name, fetch_results, timeout, db_type="doris")
+
+# --- Local DuckDB replicas ---
+# Snowflake / BigQuery queries can be served from a sampled DuckDB copy of the database built by
+# utils/DBsetup/Local_Replica.py (<LOCAL_REPLICA_DIR>/<db_id>.duckdb). Queries are transpiled to DuckDB and
+# the project / database part of table names is dropped, as the replica holds one database.
+#   "all":          every query of LOCAL_REPLICA_DB_TYPES runs on the replica (offline benchmarks and tests)
+#   "exploration":  only db_interface_many batches run on it; failures and empty results go to the warehouse
+LOCAL_REPLICA_DIR = None
+LOCAL_REPLICA_DB_TYPES = ()
+LOCAL_REPLICA_MODE = "all"
+REPLICA_DIALECTS = {"snow": "snowflake", "bigquery": "bigquery"}
+REPLICA_ERROR_STATUS = {"snow": 1, "bigquery": 3}  # same codes as the backends' programming errors
+
+_replica_connections = {}  # replica path -> (mtime, duckdb connection)
+_replica_connections_lock = threading.Lock()
+
+def set_local_replica(replica_dir, db_types=("snow", "bigquery"), mode="all"):
+    """Route db_types to the DuckDB replicas in replica_dir (None turns replicas off)."""
+    global LOCAL_REPLICA_DIR, LOCAL_REPLICA_DB_TYPES, LOCAL_REPLICA_MODE
+    if mode not in ("all", "exploration"):
+        raise ValueError("mode must be 'all' or 'exploration'")
+    close_replica_connections()
+    LOCAL_REPLICA_DIR = replica_dir
+    LOCAL_REPLICA_DB_TYPES = tuple(db_types) if replica_dir else ()
+    LOCAL_REPLICA_MODE = mode
+
+def replica_path(db_type, db_id):
+    """Path of the replica serving this query, or None if it must go to the warehouse."""
+    if not LOCAL_REPLICA_DIR or db_type not in LOCAL_REPLICA_DB_TYPES or not isinstance(db_id, str):
+        return None
+    path = os.path.join(LOCAL_REPLICA_DIR, f"{db_id}.duckdb")
+    return path if os.path.exists(path) else None
+
+def _replica_cursor(path):
+    """A cursor on the shared read-only connection of a replica; reopened when the file is rebuilt."""
+    mtime = os.path.getmtime(path)
+    with _replica_connections_lock:
+        cached = _replica_connections.get(path)
+        if cached is None or cached[0] != mtime:
+            if cached is not None:
+                cached[1].close()
+            cached = (mtime, duckdb.connect(path, read_only=True))
+            _replica_connections[path] = cached
+        # DuckDB cursors are independent connections to the same database, safe to use from one thread each
+        return cached[1].cursor()
+
+def close_replica_connections():
+    with _replica_connections_lock:
+        connections = [conn for _, conn in _replica_connections.values()]
+        _replica_connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except Exception:
+            pass
 
-def db_interface(db_type, query, conn_info, fetch_results=True):
+def transpile_for_replica(query, db_type):
+    """Snowflake / BigQuery SQL -> DuckDB SQL against the replica's schema.table layout."""
+    if sqlglot is None:
+        return query
+    trees = sqlglot.parse(query, read=REPLICA_DIALECTS[db_type])
+    for tree in trees:
+        for table in (tree.find_all(exp.Table) if tree is not None else ()):
+            if table.args.get("catalog") is not None:
+                table.set("catalog", None)
+    return ";\n".join(tree.sql("duckdb") for tree in trees if tree is not None)
+
+def execute_replica_query(query, db_path, db_type, fetch_results=True, timeout=200):
+    """Execute a Snowflake / BigQuery query on its DuckDB replica; results are rendered like the backend's."""
+    label = "Snowflake" if db_type == "snow" else "BigQuery"
+    try:
+        duck_query = transpile_for_replica(query, db_type)
+    except Exception as e:
+        return REPLICA_ERROR_STATUS[db_type], f"{label} (local replica) Error: SQL could not be transpiled: {e}"
+    cursor = watchdog = None
+    try:
+        try:
+            cursor = _replica_cursor(db_path)
+        except (OSError, duckdb.Error) as e:  # Replica removed, locked or corrupt
+            return REPLICA_ERROR_STATUS[db_type], f"{label} (local replica) Error: replica could not be opened: {e}"
+        # interrupt() cancels the running statement from the watchdog thread
+        watchdog = threading.Timer(timeout, cursor.interrupt) if timeout else None
+        start_time = time.time()
+        if watchdog is not None:
+            watchdog.start()
+        cursor.execute(duck_query)
+        if not fetch_results:
+            return 0, None
+        columns = [desc[0] for desc in cursor.description]
+        results = collect_bounded_rows(columns, iter_cursor_batches(cursor), max_rows=20)
+        if results:
+            execution_time = time.time() - start_time
+            return 0, truncate_text_by_tokens(render_result_table(results)) + f"\nQuery Time: {execution_time:.2f} s"
+        return 0, '[]'
+    except duckdb.InterruptException:
+        return 3, f"Execution timed out: query exceeded {timeout} seconds."
+    except duckdb.Error as e:
+        return REPLICA_ERROR_STATUS[db_type], f"{label} (local replica) Error: {e}"
+    except Exception as e:
+        return 3, f"Unknown Error: {e}"
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+        if cursor is not None:
+            cursor.close()
+
+def _dispatch_query(db_type, query, conn_info, fetch_results=True, timeout=None, exploration=False):
     """
-    Unified database interface that selects the appropriate execution function based on the database type.
-    Args:
-        db_type (str): The database type, supports 'sqlite', 'snowflake', 'bigquery', 'mysql', or 'doris'.
-        query (str): The SQL query to be executed.
-        conn_info (str or dict): 
-            - For sqlite, this can be the database filename or the full path.
-            - For snowflake, this should be the database ID.
-            - For BigQuery, this is not used as the JSON credential path is handled globally.
-            - For MySQL/Doris, this should be the database name (optional, can be in credentials).
-        fetch_results (bool): Whether to fetch query results (default is True).
-    Returns:
-        tuple: (status_code, query_result_or_error_message)
+    Route one query to its backend. timeout=None keeps each backend's default timeout and retry policy.
+    exploration marks db_interface_many batches, which may use a local replica in LOCAL_REPLICA_MODE "exploration".
     """
+    kwargs = {} if timeout is None else {"timeout": timeout}
     db_type = db_type.lower()
+    local_path = replica_path(db_type, conn_info)
+    if local_path and LOCAL_REPLICA_MODE == "all":
+        return execute_replica_query(query, local_path, db_type, fetch_results, **kwargs)
+    if local_path and exploration:
+        status, result = execute_replica_query(query, local_path, db_type, fetch_results, **kwargs)
+        if status == 0 and not (isinstance(result, str) and result.startswith("[]")):
+            return status, result
+        print(f"Local replica returned no rows or failed ({str(result)[:200]}); running on the warehouse.")
     if db_type == 'sqlite':
         # Base path for SQLite DBs
         if not conn_info.endswith(".sqlite"):
             # If only the database name is provided, construct the path automatically.
             conn_info = os.path.join(sqlite_DB_dir, conn_info, f"{conn_info}.sqlite")
-        return execute_sqlite_query(query, conn_info, fetch_results)
+        return execute_sqlite_query(query, conn_info, fetch_results, **kwargs)
     
     if db_type == "snow":#Snowflake
-        return execute_snowflake_query(query, credentials=default_credentials, db_id=conn_info)
+        if timeout is not None:
+            kwargs["deadline"] = time.monotonic() + timeout  # retries must fit in the same budget
+        return execute_snowflake_query(query, credentials=default_credentials, db_id=conn_info, **kwargs)
     
     if db_type == "bigquery":
-        return execute_bigquery_query(query, credentials_path=Credentials_Path)
+        return execute_bigquery_query(query, credentials_path=Credentials_Path, **kwargs)
     
     if db_type == "mysql":
-        return execute_mysql_query(query, credentials=mysql_credentials, db_name=conn_info, fetch_results=fetch_results)
+        return execute_mysql_query(query, credentials=mysql_credentials, db_name=conn_info, fetch_results=fetch_results, **kwargs)
     
     if db_type == "doris":
-        return execute_doris_query(query, credentials=doris_credentials, db_name=conn_info, fetch_results=fetch_results)
+        return execute_doris_query(query, credentials=doris_credentials, db_name=conn_info, fetch_results=fetch_results, **kwargs)
     
     return 3, "Support for other database types is not yet implemented."
 
+# --- Pre-flight validation ---
+# Candidate SQL is parsed and checked against the database's M-Schema JSON before it is sent (utils/SQL_Preflight.py).
+def get_schema_lookup(db_id, db_type):
+    """SchemaLookup of a database, built once per loaded version of its M-Schema JSON. None if unavailable."""
+    entry = get_schema(db_id, db_type)
+    if entry is None:
+        return None
+    def build():
+        lookup = lookup_from_tables(entry.tables(db_type, db_id).values(), db_type, db_id)
+        if db_type == "sqlite":
+            db_path = os.path.join(sqlite_DB_dir, db_id, f"{db_id}.sqlite")
+            if os.path.exists(db_path):
+                add_sqlite_objects(lookup, db_path)  # Views are queryable but not part of the M-Schema
+        return lookup
+    return entry.derived(("lookup", db_type, db_id), build)
+
+def preflight_sql(db_type, query, conn_info):
+    """
+    Validate a query locally before execution. Returns (0, None) if it may be sent to the database,
+    otherwise an error in db_interface's (status_code, message) shape.
+    """
+    db_type = db_type.lower()
+    return validate_sql(query, db_type, _schema_lookup_for(db_type, conn_info))
+
+def _schema_lookup_for(db_type, conn_info):
+    db_id = conn_info
+    if db_type == "sqlite" and isinstance(conn_info, str) and conn_info.endswith(".sqlite"):
+        db_id = os.path.splitext(os.path.basename(conn_info))[0]
+    try:
+        return get_schema_lookup(db_id, db_type) if isinstance(db_id, str) else None
+    except Exception as e:
+        print(f"Schema lookup unavailable for '{db_id}': {e}")
+        return None
+
+def db_autofix(db_type, query, error_message, conn_info, max_rounds=3, preflight=False):
+    """
+    Rule-based repair tier (utils/SQL_AutoFix.py): rewrite the SQL for the error and re-execute, up to max_rounds
+    times as each fix may surface the next mechanical error.
+    Returns (status_code, result, fixed_sql) if a rewrite executed successfully, otherwise None.
+    """
+    db_type = db_type.lower()
+    lookup = _schema_lookup_for(db_type, conn_info)
+    for _ in range(max_rounds):
+        fixed_sql, rule = auto_fix_sql(query, error_message, db_type, lookup)
+        if fixed_sql is None:
+            return None
+        print(f"Auto-fix ({rule}):\n  before: {query}\n  after:  {fixed_sql}")
+        status, result = db_interface(db_type, fixed_sql, conn_info, preflight=preflight)
+        if status == 0:
+            return status, result, fixed_sql
+        query, error_message = fixed_sql, result
+    return None
+
+def db_identifier_hint(db_type, query, error_message, conn_info):
+    """Closest schema tables/columns to the unknown identifier of an error, to append to repair prompts ('' if none)."""
+    db_type = db_type.lower()
+    return identifier_hint(query, error_message, db_type, _schema_lookup_for(db_type, conn_info))
+
+def _execute_with_sampling_rewrite(db_type, query, conn_info, fetch_results=True, timeout=None, exploration=False):
+    """
+    Run `ORDER BY RANDOM() LIMIT n` sampling queries in their cheap rewritten form (see utils/SQL_Rewrite.py).
+    The original SQL is run instead when the rewrite does not apply, fails, or samples no rows.
+    """
+    rewritten = rewrite_random_sampling(query, db_type.lower())
+    if rewritten is None:
+        return _dispatch_query(db_type, query, conn_info, fetch_results, timeout, exploration)
+    print(f"Sampling rewrite:\n  original:  {query}\n  rewritten: {rewritten}")
+    status, result = _dispatch_query(db_type, rewritten, conn_info, fetch_results, timeout, exploration)
+    if status == 0 and not (isinstance(result, str) and result.startswith("[]")):
+        return status, result
+    print(f"Sampling rewrite returned no rows or failed ({str(result)[:200]}); running the original SQL.")
+    return _dispatch_query(db_type, query, conn_info, fetch_results, timeout, exploration)
+
+def db_interface(db_type, query, conn_info, fetch_results=True, rewrite_sampling=False, preflight=False):
+    """
+    Unified database interface that selects the appropriate execution function based on the database type.
+    Args:
+        db_type (str): The database type, supports 'sqlite', 'snowflake', 'bigquery', 'mysql', or 'doris'.
+        query (str): The SQL query to be executed.
+        conn_info (str or dict): 
+            - For sqlite, this can be the database filename or the full path.
+            - For snowflake, this should be the database ID.
+            - For BigQuery, this is not used as the JSON credential path is handled globally.
+            - For MySQL/Doris, this should be the database name (optional, can be in credentials).
+        fetch_results (bool): Whether to fetch query results (default is True).
+        rewrite_sampling (bool): Rewrite `ORDER BY RANDOM() LIMIT n` sampling into cheap backend-specific sampling.
+        preflight (bool): Validate the SQL locally against the M-Schema JSON first; invalid SQL is not sent.
+    Returns:
+        tuple: (status_code, query_result_or_error_message)
+    """
+    if preflight:
+        status, message = preflight_sql(db_type, query, conn_info)
+        if status != 0:
+            return status, message
+    if rewrite_sampling:
+        return _execute_with_sampling_rewrite(db_type, query, conn_info, fetch_results)
+    return _dispatch_query(db_type, query, conn_info, fetch_results)
+
+# Upper bound on concurrent queries per backend in db_interface_many; matches the connection pool sizes
+BATCH_CONCURRENCY_LIMITS = {
+    "sqlite": SQLITE_POOL_SIZE,
+    "snow": SNOWFLAKE_POOL_SIZE,
+    "bigquery": 8,
+    "mysql": MYSQL_POOL_SIZE,
+    "doris": MYSQL_POOL_SIZE,
+}
+# Per-query timeout in db_interface_many, before it is cut down to what is left of the shared deadline
+BATCH_QUERY_TIMEOUTS = {
+    "sqlite": SQLITE_QUERY_TIMEOUT,
+}
+# Warehouse batches are submitted together and polled from one thread (execute_snowflake_queries_async /
+# execute_bigquery_queries_async) instead of one blocking call per worker thread
+BATCH_ASYNC_BACKENDS = ("snow", "bigquery")
+BATCH_ASYNC_ATTEMPTS = 3  # rounds for queries that timed out or failed with an unknown error (status 3)
+
+def _submit_and_poll(db_type, queries, fetch_results, timeout):
+    if db_type == "snow":
+        return execute_snowflake_queries_async(queries, default_credentials, fetch_results, timeout)
+    return execute_bigquery_queries_async(queries, Credentials_Path, fetch_results, timeout)
+
+def _run_async_batch(db_type, sql, indices, fetch_results, deadline, max_in_flight, per_query_timeout, batch_timeout, out):
+    """
+    Run sql[i] for every i in indices through the backend's submit/poll executor, max_in_flight at a time, and store
+    {"status", "result", "time"} in out[i]. Status 3 results are retried while attempts and the deadline allow.
+    """
+    pending = list(indices)
+    for _ in range(BATCH_ASYNC_ATTEMPTS):
+        retry = []
+        for start in range(0, len(pending), max_in_flight):
+            chunk = pending[start:start + max_in_flight]
+            start_time = time.monotonic()
+            remaining = deadline - start_time
+            if remaining <= 0:
+                for i in chunk:
+                    if out[i] is None:
+                        out[i] = {"status": 3, "result": f"Skipped: batch deadline of {batch_timeout} seconds reached before execution.", "time": 0.0}
+                continue
+            timeout = max(round(min(remaining, per_query_timeout), 2), 0.01)
+            try:
+                results = _submit_and_poll(db_type, [sql[i] for i in chunk], fetch_results, timeout)
+            except Exception as e:
+                results = [(3, f"Unknown Error: {e}")] * len(chunk)
+            elapsed = time.monotonic() - start_time
+            for i, (status, result) in zip(chunk, results):
+                out[i] = {"status": status, "result": result, "time": elapsed}
+                if status == 3:
+                    retry.append(i)
+        if not retry or deadline - time.monotonic() <= 0:
+            return
+        print(f"Retrying {len(retry)} batch queries that timed out or failed: {[out[i]['result'][:100] for i in retry]}")
+        pending = retry
+
+def _execute_many_async(db_type, queries, indices, fetch_results, deadline, max_in_flight, batch_timeout, rewrite_sampling, out):
+    per_query_timeout = BATCH_QUERY_TIMEOUTS.get(db_type, 200)
+    sql = list(queries)
+    rewritten = []
+    if rewrite_sampling:
+        for i in indices:
+            cheap = rewrite_random_sampling(queries[i], db_type)
+            if cheap is not None:
+                print(f"Sampling rewrite:\n  original:  {queries[i]}\n  rewritten: {cheap}")
+                sql[i] = cheap
+                rewritten.append(i)
+    _run_async_batch(db_type, sql, indices, fetch_results, deadline, max_in_flight, per_query_timeout, batch_timeout, out)
+    # As in _execute_with_sampling_rewrite: a rewrite that fails or samples no rows falls back to the original SQL
+    fallback = [i for i in rewritten
+                if out[i]["status"] != 0 or (isinstance(out[i]["result"], str) and out[i]["result"].startswith("[]"))]
+    if fallback:
+        print(f"Sampling rewrite returned no rows or failed for {len(fallback)} queries; running the original SQL.")
+        first_time = {i: out[i]["time"] for i in fallback}
+        _run_async_batch(db_type, queries, fallback, fetch_results, deadline, max_in_flight, per_query_timeout, batch_timeout, out)
+        for i in fallback:
+            out[i]["time"] += first_time[i]
+
+def db_interface_many(db_type, queries, conn_info, max_concurrency=4, fetch_results=True, timeout=200, rewrite_sampling=False, preflight=False):
+    """
+    Execute a batch of queries concurrently against one database.
+    Snowflake and BigQuery queries that go to the warehouse are submitted together and polled by query/job ID
+    from one thread; SQLite, MySQL/Doris and local replicas run on a pool of worker threads.
+    Args:
+        db_type, conn_info, fetch_results, rewrite_sampling, preflight: As in db_interface.
+        queries (list): SQL queries to run.
+        max_concurrency (int): Maximum number of queries in flight, capped by BATCH_CONCURRENCY_LIMITS.
+        timeout (float): Shared deadline in seconds for the whole batch. Each query gets its usual per-query timeout
+            (BATCH_QUERY_TIMEOUTS, else 200 s) cut down to the time left when it starts; queries that have not
+            started by the deadline are not run.
+    Returns:
+        list: One dict per query, in input order:
+            {"status": status_code, "result": query_result_or_error_message, "time": seconds}
+    """
+    db_type = db_type.lower()
+    deadline = time.monotonic() + timeout
+    workers = max(1, min(max_concurrency, BATCH_CONCURRENCY_LIMITS.get(db_type, 1), len(queries) or 1))
+    results = [None] * len(queries)
+
+    to_run = []
+    for idx, query in enumerate(queries):
+        if preflight:
+            start_time = time.monotonic()
+            status, result = preflight_sql(db_type, query, conn_info)
+            if status != 0:
+                results[idx] = {"status": status, "result": result, "time": time.monotonic() - start_time}
+                continue
+        to_run.append(idx)
+
+    if db_type in BATCH_ASYNC_BACKENDS and not replica_path(db_type, conn_info):
+        _execute_many_async(db_type, queries, to_run, fetch_results, deadline, workers, timeout, rewrite_sampling, results)
+        return results
+
+    def run(idx):
+        start_time = time.monotonic()
+        remaining = deadline - start_time
+        if remaining <= 0:
+            return {"status": 3, "result": f"Skipped: batch deadline of {timeout} seconds reached before execution.", "time": 0.0}
+        query_timeout = max(round(min(remaining, BATCH_QUERY_TIMEOUTS.get(db_type, 200)), 2), 0.01)
+        try:
+            execute = _execute_with_sampling_rewrite if rewrite_sampling else _dispatch_query
+            status, result = execute(db_type, queries[idx], conn_info, fetch_results, timeout=query_timeout, exploration=True)
+        except Exception as e:
+            status, result = 3, f"Unknown Error: {e}"
+        return {"status": status, "result": result, "time": time.monotonic() - start_time}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for idx, outcome in zip(to_run, executor.map(run, to_run)):
+            results[idx] = outcome
+    return results
+
 def SQL_completion(text, db_type="snow"):
     """
     In Snowflake, there are some SQL statements with a length exceeding 60,000 tokens. 
@@ -502,8 +1671,7 @@ def M_Schema_sqlite(SL, db_id, level='table'):
         raise FileNotFoundError(f"Schema file not found: {json_path}")
 
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            schema_data = json.load(f)
+        schema_data = load_schema_json(json_path)
     except Exception as e:
         raise RuntimeError(f"Failed to load schema file: {str(e)}")
 
@@ -619,8 +1787,7 @@ def M_Schema_mysql(db_id, SL=None, db_type="mysql", Level="table") -> str:
         raise FileNotFoundError(f"Schema file not found: {json_path}")
 
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            schema_data = json.load(f)
+        schema_data = load_schema_json(json_path)
     except Exception as e:
         raise RuntimeError(f"Failed to load schema file: {str(e)}")
 
@@ -760,8 +1927,9 @@ def M_Schema_bigquery(db_id, SL=None) -> str:
         raise FileNotFoundError(f"Database schema file not found for db_id '{db_id}' at {json_path}.")
 
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            all_data = json.load(f)
+        # A few tables of a file that is not loaded yet are read on their own from its .pack
+        schema_entry, columns_of = schema_catalog.table_reader(json_path, len(SL) if SL else float("inf"))
+        all_data = schema_entry.data
     except Exception as e:
         raise RuntimeError(f"Failed to load or parse JSON from {json_path}: {str(e)}")
     if not all_data:
@@ -811,21 +1979,10 @@ def M_Schema_bigquery(db_id, SL=None) -> str:
                     table_formatted_lines = _format_table_details(full_table_name, column_details, table_desc)
                     lines.extend(table_formatted_lines)
     else:
-        full_dataset_map = {} 
-        full_table_map = {}  
-        
-        for top_level_key, db_content in all_data.items():
-            if not isinstance(db_content, dict): continue
-            for dataset_original, dataset_content in db_content.items():
-                if not isinstance(dataset_content, dict): continue
-                
-                full_dataset_map[dataset_original.lower()] = dataset_original
-                
-                for table_key_original in dataset_content.keys():
-                    if table_key_original not in ["table_Information", "table_description_summary"]:
-                        # a short table id is like 'bbc_news.fulltext'
-                        short_table_id_lower = table_key_original.lower()
-                        full_table_map[short_table_id_lower] = table_key_original
+        # Case-insensitive and similar-table lookups, built once per loaded schema file;
+        # a short table id is like 'bbc_news.fulltext'
+        series_index = schema_entry.series_index("bigquery", db_id)
+        full_table_map = series_index.table_map
         
         displayed_surrogate_descriptions = set()
 
@@ -852,17 +2009,9 @@ def M_Schema_bigquery(db_id, SL=None) -> str:
                 surrogate_key = key_for_lookup
 
             if not is_found:
-                dataset_name_original = full_dataset_map.get(dataset_name_lower)
-                if dataset_name_original and dataset_name_original in db_content:
-                    dataset_content = db_content[dataset_name_original]
-                    table_info = dataset_content.get("table_Information", {})
-                    for surrogate, similar_tables in table_info.items():
-                        tables = []
-                        if isinstance(similar_tables, dict): tables = similar_tables.get("similar_tables", [])
-                        elif isinstance(similar_tables, list): tables = similar_tables
-                        if table_id_short_lower in [t.lower() for t in tables]:
-                            key_for_lookup, surrogate_key, is_found = surrogate, surrogate, True
-                            break
+                surrogate = series_index.surrogate_of(table_id_short_lower, dataset_name_lower, project=original_top_level_key)
+                if surrogate is not None:
+                    key_for_lookup, surrogate_key, is_found = surrogate, surrogate, True
             
             if not is_found:
                 print(f"Warning: Table '{full_table_name_input}' not found. Skipping.")
@@ -871,8 +2020,7 @@ def M_Schema_bigquery(db_id, SL=None) -> str:
             display_full_table_name = f"{original_top_level_key}.{key_for_lookup}"
             lookup_dataset_name = key_for_lookup.split('.')[0]
             
-            dataset_data = db_content.get(lookup_dataset_name, {})
-            column_details = dataset_data.get(key_for_lookup, [])
+            column_details = columns_of(original_top_level_key, lookup_dataset_name, key_for_lookup) or []
             
             table_desc = None
             if surrogate_key and surrogate_key not in displayed_surrogate_descriptions:
@@ -927,8 +2075,9 @@ def M_Schema(db_id, SL=None, db_type="snow", Level="table") -> str:
         raise FileNotFoundError(f"Database schema file not found for db_id '{db_id}' in expected locations.")
 
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            all_schemas_data = json.load(f)
+        # A few tables of a file that is not loaded yet are read on their own from its .pack
+        schema_entry, columns_of = schema_catalog.table_reader(json_path, len(SL) if SL else float("inf"))
+        all_schemas_data = schema_entry.data
     except Exception as e:
         raise RuntimeError(f"Failed to load or parse JSON from {json_path}: {str(e)}")
         
@@ -990,15 +2139,9 @@ def M_Schema(db_id, SL=None, db_type="snow", Level="table") -> str:
     
     # Branch B: SL is not empty, find and output the specified tables
     else:
-        # Create case-insensitive lookup maps (only when needed)
-        schema_map = {s.lower(): s for s in all_schemas_data.keys()}
-        table_map = {}
-        for schema_lower, schema_original in schema_map.items():
-            schema_content = all_schemas_data[schema_original]
-            if isinstance(schema_content, dict):
-                for table_key_original in schema_content.keys():
-                    if table_key_original not in ["table_Information", "table_description_summary"]:
-                        table_map[table_key_original.lower()] = table_key_original
+        # Case-insensitive and similar-table lookups, built once per loaded schema file
+        series_index = schema_entry.series_index("snow", db_id)
+        table_map = series_index.table_map
         
         displayed_surrogate_descriptions = set()
 
@@ -1029,23 +2172,11 @@ def M_Schema(db_id, SL=None, db_type="snow", Level="table") -> str:
 
             # Step 2: If direct match fails, check if it's a similar table of a surrogate
             if not is_found:
-                schema_name_original = schema_map.get(schema_name_lower)
-                if schema_name_original and schema_name_original in all_schemas_data:
-                    table_info = all_schemas_data[schema_name_original].get("table_Information", {})
-                    for surrogate, similar_tables in table_info.items():
-                        # Compatible with both list and dict formats
-                        if isinstance(similar_tables, dict):
-                            tables = similar_tables.get("similar_tables", [])
-                        elif isinstance(similar_tables, list):
-                            tables = similar_tables
-                        else:
-                            tables = []
-
-                        if table_id_short_lower in [t.lower() for t in tables]:
-                            key_for_lookup = surrogate
-                            surrogate_key = surrogate
-                            is_found = True
-                            break
+                surrogate = series_index.surrogate_of(table_id_short_lower, schema_name_lower)
+                if surrogate is not None:
+                    key_for_lookup = surrogate
+                    surrogate_key = surrogate
+                    is_found = True
 
             if not is_found:
                 print(f"Warning: Table '{full_table_name_input}' not found directly or as a similar table. Skipping.")
@@ -1055,8 +2186,7 @@ def M_Schema(db_id, SL=None, db_type="snow", Level="table") -> str:
             display_full_table_name = f"{db_id}.{key_for_lookup}"
             lookup_schema_name = key_for_lookup.split('.')[0]
             
-            schema_data = all_schemas_data.get(lookup_schema_name, {})
-            column_details = schema_data.get(key_for_lookup, [])
+            column_details = columns_of(lookup_schema_name, key_for_lookup) or []
             
             table_desc = None
             if surrogate_key and surrogate_key not in displayed_surrogate_descriptions:
@@ -1097,19 +2227,21 @@ def generate_ddl_from_json(db_id, table_list=None, db_type="snow"):
 
     try:
         # Load the schema data from the JSON file
-        with open(json_path, 'r', encoding='utf-8') as f:
-            all_schemas_data = json.load(f)
+        schema_entry = schema_catalog.get(json_path)
+        all_schemas_data = schema_entry.data
     except Exception as e:
         raise RuntimeError(f"Failed to load or parse JSON from {json_path}: {str(e)}")
 
-    # --- Create a set of cleaned table names for robust matching ---
-    cleaned_tables_to_include_set = None
-    if table_list:
-        # Apply the cleaning function to each table name in table_list and store it in a set
-        cleaned_tables_to_include_set = {clean_table_name(t) for t in table_list}
+    # Per-table DDL is built once per loaded schema file; a selection is a lookup plus a join
+    ddl_index = schema_entry.derived(("ddl", "snow", db_id), lambda: _snow_ddl_index(db_id, all_schemas_data))
+    if not table_list:
+        return schema_entry.derived(("ddl_text", "snow", db_id), lambda: "\n".join(ddl_index.values()))
 
-    ddl_statements = []
+    # Cleaned (digit-insensitive) names are matched through the series index, in file order
+    selected_tables = schema_entry.series_index("snow", db_id).tables_matching(table_list)
+    return "\n".join(ddl_index[ref] for ref in selected_tables)
 
+def _snow_table_ddl(db_id, table_name, columns, summary_text):
     # Mapping from schema types to SQL types
     type_mapping = {
         "TEXT": "TEXT",
@@ -1119,60 +2251,59 @@ def generate_ddl_from_json(db_id, table_list=None, db_type="snow"):
         "TIME": "TIME"
     }
 
-    # Iterate through each schema in the loaded data
+    # Note: We use the original db_id and table_name here to generate the DDL
+    fully_qualified_table_name_quoted = f'"{db_id}.{table_name}"'
+    create_statement = f'CREATE TABLE {fully_qualified_table_name_quoted} (\n'
+    
+    column_definitions = []
+    # Iterate through columns to define them
+    for col_info in columns:
+        if not isinstance(col_info, list) or len(col_info) < 2:
+            continue
+
+        col_name = col_info[0]
+        col_type = col_info[1]
+        sql_type = type_mapping.get(col_type.upper(), col_type)
+        
+        col_def = f'    "{col_name}" {sql_type}'
+        column_definitions.append(col_def)
+
+    create_statement += ',\n'.join(column_definitions)
+    create_statement += '\n);\n'
+    
+    # Add table summary as a comment if it exists
+    if summary_text:
+        summary_comment = f"\n/*\n{summary_text.strip()}\n*/\n"
+        create_statement += summary_comment
+    return create_statement
+
+def _snow_ddl_index(db_id, all_schemas_data):
+    """(None, schema, table key) -> CREATE TABLE statement for every table of a Snowflake M-Schema, in file order."""
+    ddl_index = OrderedDict()
     for schema_name, schema_content in all_schemas_data.items():
         if not isinstance(schema_content, dict):
             continue
-
         table_summaries = schema_content.get("table_description_summary", {})
-
-        # Iterate through each table within the schema
         for table_name, columns in schema_content.items():
-            if not isinstance(columns, list):
-                continue
-            
-            # --- Clean the table name from JSON for comparison ---
-            if cleaned_tables_to_include_set:
-                # 1. Construct the original full table name
-                original_full_name = f"{db_id}.{table_name}"
-                # 2. Clean the name for comparison
-                cleaned_full_name_for_check = clean_table_name(original_full_name)
-                # 3. Look for it in the cleaned set
-                if cleaned_full_name_for_check not in cleaned_tables_to_include_set:
-                    # If the cleaned name doesn't match, skip this table
-                    continue
-            
-            # --- DDL generation logic remains unchanged, always using original names ---
-            # Note: We use the original db_id and table_name here to generate the DDL
-            fully_qualified_table_name_quoted = f'"{db_id}.{table_name}"'
-            create_statement = f'CREATE TABLE {fully_qualified_table_name_quoted} (\n'
-            
-            column_definitions = []
-            # Iterate through columns to define them
-            for col_info in columns:
-                if not isinstance(col_info, list) or len(col_info) < 2:
-                    continue
-
-                col_name = col_info[0]
-                col_type = col_info[1]
-                sql_type = type_mapping.get(col_type.upper(), col_type)
-                
-                col_def = f'    "{col_name}" {sql_type}'
-                column_definitions.append(col_def)
-
-            create_statement += ',\n'.join(column_definitions)
-            create_statement += '\n);\n'
-            
-            # Add table summary as a comment if it exists
-            summary_text = table_summaries.get(table_name)
-            if summary_text:
-                summary_comment = f"\n/*\n{summary_text.strip()}\n*/\n"
-                create_statement += summary_comment
-
-            ddl_statements.append(create_statement)
-
-    # Join all generated DDL statements into a single string
-    return "\n".join(ddl_statements)
+            if isinstance(columns, list):
+                ddl_index[(None, schema_name, table_name)] = _snow_table_ddl(db_id, table_name, columns, table_summaries.get(table_name))
+    return ddl_index
+
+# sqlite_master DDL per database file, reread when the file changes: db_path -> (mtime, [(table name, sql)])
+_sqlite_ddl_cache = {}
+_sqlite_ddl_lock = threading.Lock()
+
+def _sqlite_table_ddls(db_path):
+    mtime = os.path.getmtime(db_path)
+    with _sqlite_ddl_lock:
+        cached = _sqlite_ddl_cache.get(db_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';").fetchall()
+    with _sqlite_ddl_lock:
+        _sqlite_ddl_cache[db_path] = (mtime, rows)
+    return rows
 
 def get_tables_ddl_sqlite(db_id: str, table_list: Optional[List[str]] = None) -> str:
     db_path = f"{sqlite_DB_dir}/{db_id}/{db_id}.sqlite"
@@ -1180,30 +2311,17 @@ def get_tables_ddl_sqlite(db_id: str, table_list: Optional[List[str]] = None) ->
         print(f"Error: Database file not found at '{db_path}'")
         return ""
 
-    ddl_statements = []
     try:
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            
-            base_query = "SELECT sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
-            params = []
-
-            if table_list:
-                placeholders = ', '.join(['?'] * len(table_list))
-                query = f"{base_query} AND name IN ({placeholders});"
-                params = table_list
-            else:
-                query = base_query + ";"
-
-            cursor.execute(query, params)
-            
-            rows = cursor.fetchall()
-            ddl_statements = [row[0] for row in rows if row and row[0]]
-
+        rows = _sqlite_table_ddls(db_path)
     except sqlite3.Error as e:
         print(f"Error connecting to or querying database '{db_path}': {e}")
         return ""
 
+    if table_list:
+        wanted = set(table_list)
+        rows = [row for row in rows if row[0] in wanted]
+    ddl_statements = [row[1] for row in rows if row[1]]
+
     if not ddl_statements:
         if table_list:
              print(f"Could not find the specified tables in database '{db_path}': {table_list}.")
@@ -1230,52 +2348,13 @@ def get_tables_ddl_mysql(db_id: str, table_list: Optional[List[str]] = None, db_
         print(f"Error: Schema file not found at '{json_path}'")
         return ""
 
-    ddl_statements = []
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            schema_data = json.load(f)
-        
-        all_tables_info = schema_data.get(db_id, {})
-        
-        # Type mapping for MySQL/Doris
-        type_mapping = {
-            "TEXT": "TEXT",
-            "NUMBER": "INT",
-            "FLOAT": "DOUBLE",
-            "DATE": "DATE",
-            "TIME": "TIME"
-        }
-        
-        tables_to_process = table_list if table_list else list(all_tables_info.keys())
-        
-        for table_name in tables_to_process:
-            if table_name not in all_tables_info:
-                continue
-                
-            columns_data = all_tables_info[table_name]
-            create_statement = f"CREATE TABLE `{table_name}` (\n"
-            
-            column_definitions = []
-            for col_info in columns_data:
-                if not isinstance(col_info, list) or len(col_info) < 3:
-                    continue
-                
-                col_name = col_info[0]
-                pk_info = col_info[1] if len(col_info) > 1 else None
-                col_type = col_info[2] if len(col_info) > 2 else "TEXT"
-                
-                sql_type = type_mapping.get(col_type.upper(), col_type.upper())
-                col_def = f"    `{col_name}` {sql_type}"
-                
-                if pk_info == "Primary Key":
-                    col_def += " PRIMARY KEY"
-                
-                column_definitions.append(col_def)
-            
-            create_statement += ',\n'.join(column_definitions)
-            create_statement += '\n);\n'
-            ddl_statements.append(create_statement)
-            
+        # Per-table DDL is built once per loaded schema file
+        schema_entry = schema_catalog.get(json_path)
+        ddl_index = schema_entry.derived(("ddl", db_type, db_id),
+                                         lambda: _mysql_ddl_index(schema_entry.data.get(db_id, {})))
+        tables_to_process = table_list if table_list else list(ddl_index.keys())
+        ddl_statements = [ddl_index[table_name] for table_name in tables_to_process if table_name in ddl_index]
     except Exception as e:
         print(f"Error reading or parsing schema file '{json_path}': {e}")
         return ""
@@ -1289,6 +2368,42 @@ def get_tables_ddl_mysql(db_id: str, table_list: Optional[List[str]] = None, db_
     
     return ';\n\n'.join(ddl_statements) + ';'
 
+def _mysql_ddl_index(all_tables_info):
+    """Table name -> CREATE TABLE statement for every table of a MySQL/Doris M-Schema."""
+    # Type mapping for MySQL/Doris
+    type_mapping = {
+        "TEXT": "TEXT",
+        "NUMBER": "INT",
+        "FLOAT": "DOUBLE",
+        "DATE": "DATE",
+        "TIME": "TIME"
+    }
+    ddl_index = {}
+    for table_name, columns_data in all_tables_info.items():
+        create_statement = f"CREATE TABLE `{table_name}` (\n"
+        
+        column_definitions = []
+        for col_info in columns_data:
+            if not isinstance(col_info, list) or len(col_info) < 3:
+                continue
+            
+            col_name = col_info[0]
+            pk_info = col_info[1] if len(col_info) > 1 else None
+            col_type = col_info[2] if len(col_info) > 2 else "TEXT"
+            
+            sql_type = type_mapping.get(col_type.upper(), col_type.upper())
+            col_def = f"    `{col_name}` {sql_type}"
+            
+            if pk_info == "Primary Key":
+                col_def += " PRIMARY KEY"
+            
+            column_definitions.append(col_def)
+        
+        create_statement += ',\n'.join(column_definitions)
+        create_statement += '\n);\n'
+        ddl_index[table_name] = create_statement
+    return ddl_index
+
 def generate_ddl_from_json_bigquery(db_id, table_list=None):
 
     try:
@@ -1316,17 +2431,23 @@ def generate_ddl_from_json_bigquery(db_id, table_list=None):
         raise FileNotFoundError(f"Database schema file not found for db_id '{db_id}' at {json_path}.")
 
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            all_data = json.load(f)
+        schema_entry = schema_catalog.get(json_path)
+        all_data = schema_entry.data
     except Exception as e:
         raise RuntimeError(f"Failed to load or parse JSON from {json_path}: {str(e)}")
     if not all_data:
         raise ValueError(f"JSON file {json_path} is empty or invalid.")
-    cleaned_tables_to_include_set = None
-    if table_list:
-        cleaned_tables_to_include_set = {clean_table_name(t) for t in table_list}
+    # Per-table DDL is built once per loaded schema file; a selection is a lookup plus a join
+    ddl_index = schema_entry.derived(("ddl", "bigquery", db_id), lambda: _bigquery_ddl_index(all_data))
+    if not table_list:
+        return schema_entry.derived(("ddl_text", "bigquery", db_id), lambda: "\n".join(ddl_index.values()))
 
-    ddl_statements = []
+    # Cleaned (digit-insensitive) names are matched through the series index, in file order
+    selected_tables = schema_entry.series_index("bigquery", db_id).tables_matching(table_list)
+    return "\n".join(ddl_index[ref] for ref in selected_tables if ref in ddl_index)
+
+def _bigquery_table_ddl(top_level_key, table_key, columns, summary_text):
+    """CREATE TABLE statement of one BigQuery table, None if it has no usable columns."""
     type_mapping = {
         "STRING": "STRING", "TEXT": "STRING",
         "NUMBER": "INT64", "INTEGER": "INT64",
@@ -1338,56 +2459,137 @@ def generate_ddl_from_json_bigquery(db_id, table_list=None):
     COMPLEX_TYPE_LENGTH_THRESHOLD = 50
     PLACEHOLDER_COMPLEX_TYPE = "COMPLEX_TYPE" #Nested types are uniformly referred to as COMPLEX_TYPE.
 
-    for top_level_key, db_content in all_data.items():
-        if not isinstance(db_content, dict):
-            continue
-        for dataset_name, dataset_content in db_content.items():
-            if not isinstance(dataset_content, dict): continue
+    original_full_name = f"{top_level_key}.{table_key}"
 
-            table_summaries = dataset_content.get("table_description_summary", {})
-            for table_key, columns in dataset_content.items():
-                if not isinstance(columns, list): continue
+    fully_qualified_table_name_quoted = f'`{original_full_name}`'
+    create_statement = f'CREATE TABLE {fully_qualified_table_name_quoted} (\n'
+    
+    column_definitions = []
+    for col_info in columns:
+        if not isinstance(col_info, list) or len(col_info) < 2: continue
 
-                original_full_name = f"{top_level_key}.{table_key}"
-                
-                if cleaned_tables_to_include_set:
-                    cleaned_full_name_for_check = clean_table_name(original_full_name)
-                    if cleaned_full_name_for_check not in cleaned_tables_to_include_set:
-                        continue
-                
-                fully_qualified_table_name_quoted = f'`{original_full_name}`'
-                create_statement = f'CREATE TABLE {fully_qualified_table_name_quoted} (\n'
-                
-                column_definitions = []
-                for col_info in columns:
-                    if not isinstance(col_info, list) or len(col_info) < 2: continue
+        col_name = col_info[0]
+        col_type = col_info[1]
+        sql_type = "" 
 
-                    col_name = col_info[0]
-                    col_type = col_info[1]
-                    sql_type = "" 
+        if col_type and len(col_type) > COMPLEX_TYPE_LENGTH_THRESHOLD:
+            sql_type = PLACEHOLDER_COMPLEX_TYPE
+        else:
+            sql_type = type_mapping.get(col_type.upper(), col_type.upper()) if col_type else "UNKNOWN"
 
-                    if col_type and len(col_type) > COMPLEX_TYPE_LENGTH_THRESHOLD:
-                        sql_type = PLACEHOLDER_COMPLEX_TYPE
-                    else:
-                        sql_type = type_mapping.get(col_type.upper(), col_type.upper()) if col_type else "UNKNOWN"
+        col_def = f'    `{col_name}` {sql_type}'
+        column_definitions.append(col_def)
 
-                    col_def = f'    `{col_name}` {sql_type}'
-                    column_definitions.append(col_def)
+    if not column_definitions:
+        return None
 
-                if not column_definitions:
+    create_statement += ',\n'.join(column_definitions)
+    create_statement += '\n);\n'
+    
+    if summary_text:
+        summary_comment = f"\n/*\n{summary_text.strip()}\n*/\n"
+        create_statement += summary_comment
+    return create_statement
+
+def _bigquery_ddl_index(all_data):
+    """(project, dataset, table key) -> CREATE TABLE statement for every BigQuery table with columns, in file order."""
+    ddl_index = OrderedDict()
+    for top_level_key, db_content in all_data.items():
+        if not isinstance(db_content, dict):
+            continue
+        for dataset_name, dataset_content in db_content.items():
+            if not isinstance(dataset_content, dict):
+                continue
+            table_summaries = dataset_content.get("table_description_summary", {})
+            for table_key, columns in dataset_content.items():
+                if not isinstance(columns, list):
                     continue
-
-                create_statement += ',\n'.join(column_definitions)
-                create_statement += '\n);\n'
-                
-                summary_text = table_summaries.get(table_key)
-                if summary_text:
-                    summary_comment = f"\n/*\n{summary_text.strip()}\n*/\n"
-                    create_statement += summary_comment
-
-                ddl_statements.append(create_statement)
-
-    return "\n".join(ddl_statements)
+                ddl = _bigquery_table_ddl(top_level_key, table_key, columns, table_summaries.get(table_key))
+                if ddl is not None:
+                    ddl_index[(top_level_key, dataset_name, table_key)] = ddl
+    return ddl_index
+
+
+# --- Rendered schema cache ---
+# The same schema string is rendered, and token-counted, several times per task (the token check and the prompt
+# in process_entry, SL refinement rounds, multi-path runs, reruns). Renders are cached by database, table
+# selection and level; an entry is dropped when the database's M-Schema JSON changes.
+SCHEMA_RENDER_CACHE_SIZE = 256
+
+class RenderedSchema:
+    """A rendered schema string and its token count, counted on first use."""
+    def __init__(self, text):
+        self.text = text
+        self._token_count = None
+
+    @property
+    def token_count(self):
+        if self._token_count is None:
+            self._token_count = get_token_count(self.text)
+        return self._token_count
+
+_render_cache = OrderedDict()
+_render_cache_lock = threading.Lock()
+
+def _render_cache_key(kind, db_id, SL, db_type, level):
+    try:
+        entry = get_schema(db_id, db_type)
+    except Exception:
+        entry = None
+    version = (entry.path, entry.mtime) if entry else None
+    tables = None if SL is None else tuple(str(table).strip() for table in SL)
+    return kind, db_type, db_id, tables, level, version
+
+def _cached_render(key, build):
+    with _render_cache_lock:
+        rendered = _render_cache.get(key)
+        if rendered is not None:
+            _render_cache.move_to_end(key)
+            return rendered
+    rendered = build()
+    with _render_cache_lock:
+        rendered = _render_cache.setdefault(key, rendered)
+        _render_cache.move_to_end(key)
+        while len(_render_cache) > SCHEMA_RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+    return rendered
+
+def render_schema(db_id, SL=None, db_type="snow", kind="mschema", level="table"):
+    """
+    RenderedSchema of a database: kind "mschema" is M_Schema(...), "ddl" is generate_ddl_from_json(...),
+    restricted to the tables in SL (all tables when SL is None).
+    """
+    key = _render_cache_key(kind, db_id, SL, db_type, level)
+
+    def build():
+        tables = list(key[3]) if SL is not None else None  # the stripped names the entry is keyed by
+        if kind == "mschema":
+            return RenderedSchema(M_Schema(db_id=db_id, SL=tables, db_type=db_type, Level=level))
+        if kind == "ddl":
+            return RenderedSchema(generate_ddl_from_json(db_id=db_id, table_list=tables, db_type=db_type))
+        raise ValueError(f"Unknown schema render kind: {kind}")
+    return _cached_render(key, build)
+
+def render_pruned_schema(db_id, SL=None, db_type="snow", max_tokens=None, question="", level="table"):
+    """
+    RenderedSchema of the M-Schema, shrunk to max_tokens by dropping examples, descriptions, low-relevance
+    columns and repeated table series in that order (utils/Schema_Pruning.py). question ranks the columns.
+    """
+    rendered = render_schema(db_id, SL, db_type, level=level)
+    if max_tokens is None or rendered.token_count <= max_tokens:
+        return rendered
+
+    def build():
+        text, token_count = prune_schema(rendered.text, get_tables(db_id, db_type), db_type, max_tokens, question=question,
+                                         token_count=rendered.token_count, count_tokens=get_token_count)
+        pruned = RenderedSchema(text)
+        pruned._token_count = token_count
+        return pruned
+    return _cached_render(_render_cache_key(("pruned", max_tokens, question), db_id, SL, db_type, level), build)
+
+def clear_render_cache():
+    with _render_cache_lock:
+        _render_cache.clear()
 
 
 if __name__ == "__main__":
@@ -12,7 +12,9 @@ sys.path.append(
 
 from LLM.LLM_OUT import LLM_output
 from utils.extract_json import *
-from utils.Database_Interface import snow_DB_dir,sqlite_DB_dir
+from utils.Database_Interface import snow_DB_dir,sqlite_DB_dir,get_schema_lookup
+from utils.Schema_Catalog import load_schema_json
+from utils.SQL_Extract import extract_tables_columns
 
 
 # Snowflake and Bigquery share the same organizational structure.
@@ -60,9 +62,33 @@ Please provide the answer in two steps of thinking:
 
     return prompt
 
+def parse_SL(SQL, db_name, db_type, check_columns=True):
+    """
+    Tables and columns of the SQL from the SQL parser (utils/SQL_Extract.py), validated against the schema.
+    Returns None when the SQL cannot be extracted deterministically; the callers then ask the LLM.
+    Every table of a parsed result exists in the schema (otherwise the result is None) and only schema columns
+    are kept, spelled as in the M-Schema: the table check the sqlite/mysql LLM paths apply to each answer, which
+    the snow path skips under check_columns=False. check_columns=False only drops the columns. allow_partial has
+    no effect on parsed results, as they never hold unmatched columns.
+    """
+    try:
+        lookup = get_schema_lookup(db_name, db_type)
+    except Exception as e:
+        print(f"[Get_SL] Schema lookup unavailable for '{db_name}': {e}")
+        return None
+    table_col = extract_tables_columns(SQL, db_type, lookup)
+    if table_col is None:
+        return None
+    if not check_columns:
+        return {table: [] for table in table_col}
+    return table_col
+
 #TODO The current logic for determining table correctness needs to be revised. Currently, it does not evaluate table correctness at all and relies solely on consistency.
 def Get_SL_func_snow(SQL, db_name, model="deepseek-chat",
                 allow_partial=False, check_columns: bool = False, db_type="snow"):  # ✅ New switch added
+    parsed = parse_SL(SQL, db_name, db_type, check_columns)
+    if parsed is not None:
+        return parsed
 
     def run_llm():
         """
@@ -178,6 +204,10 @@ def Get_SL_func_mysql(SQL, db_name, model="deepseek-chat",
     Returns:
         dict: Validated dictionary of tables and columns. Returns an empty dict if failure.
     """
+    parsed = parse_SL(SQL, db_name, db_type, check_columns)
+    if parsed is not None:
+        return parsed
+
     # Import directory paths
     from utils.Database_Interface import mysql_DB_dir, doris_DB_dir
     
@@ -190,8 +220,7 @@ def Get_SL_func_mysql(SQL, db_name, model="deepseek-chat",
     # 1. Import and preprocess Database Schema
     db_json_path = f"{db_dir}/{db_name}/{db_name}_M-Schema.json" 
     try:
-        with open(db_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_schema_json(db_json_path)
     except FileNotFoundError:
         print(f"Error: File not found at '{db_json_path}'")
         return {}
@@ -308,11 +337,14 @@ def Get_SL_func_sqlite(SQL, db_name, model="deepseek-chat",
     Returns:
         dict: Validated dictionary of tables and columns. Returns an empty dict if failure.
     """
+    parsed = parse_SL(SQL, db_name, db_type, check_columns)
+    if parsed is not None:
+        return parsed
+
     # 1. Import and preprocess Database Schema
     db_json_path = f"{sqlite_DB_dir}/{db_name}/{db_name}_M-Schema.json" 
     try:
-        with open(db_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_schema_json(db_json_path)
     except FileNotFoundError:
         print(f"Error: File not found at '{db_json_path}'")
         return {}
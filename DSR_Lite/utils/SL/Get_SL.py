@@ -7,6 +7,7 @@ import os
 import re
 import json
 import time
+import inspect
 import argparse
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '../..'))
@@ -25,21 +26,31 @@ if project_root not in sys.path:
 
 # 现在路径设置好了，再进行导入
 from Extract_tables_col import *
+from SL_Cache import get_sl_cache, schema_fingerprint, cache_key
 from collections import defaultdict
 from datetime import datetime
 import traceback
 import sqlite3
 from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
 
 
 # 将项目根目录加入 sys.path
 sys.path.append(
     os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
 )
-from utils.Database_Interface import snow_DB_dir,M_Schema,generate_ddl_from_json,detect_db_type,sqlite_DB_dir,bigquery_DB_dir,mysql_DB_dir,doris_DB_dir
+from utils.Database_Interface import snow_DB_dir,M_Schema,generate_ddl_from_json,render_schema,detect_db_type,sqlite_DB_dir,bigquery_DB_dir,mysql_DB_dir,doris_DB_dir
+from utils.Schema_Catalog import load_schema_json
+from utils.Schema_Retrieval import rank_tables
 from utils.app_logs.logger_config import setup_logger, log_context,JsonLogger
 from utils.mytoken.deepseek_tokenizer import *
 
+SL_SAMPLING_ROUNDS = 3  # LLM SQL drafts per schema-linking call, merged by merge_table_schemas
+SL_SAMPLING_CONCURRENCY = 3  # sampling rounds run at once
+SL_TABLE_CONCURRENCY = 8  # per-table LLM calls of SL_workflow_old run at once
+SL_RETRIEVAL_PREFILTER = True  # schemas too large even as DDL: link only the top SL_RETRIEVAL_TOP_K tables of a local ranking
+SL_RETRIEVAL_TOP_K = 30
+
 def log_llm_io(model_name: str, prompt: str, output: str, think, qid, log_file=None):
     """
     Logs LLM input and output to a file and ensures immediate disk write.
@@ -151,8 +162,7 @@ def get_table_mess_snow(db_name):
     all_tables = []
 
     try:
-        with open(db_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_schema_json(db_json_path)
     except FileNotFoundError:
         print(f"Error: File not found at '{db_json_path}'")
         return []
@@ -194,8 +204,7 @@ def get_table_mess_bigquery(db_name):
     all_tables = []
 
     try:
-        with open(db_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_schema_json(db_json_path)
     except FileNotFoundError:
         print(f"Error: File not found at '{db_json_path}'")
         return []
@@ -256,8 +265,7 @@ def get_table_mysql(db_name, db_type="mysql"):
     all_tables = []
 
     try:
-        with open(db_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_schema_json(db_json_path)
     except FileNotFoundError:
         print(f"❌ Error: File not found at '{db_json_path}'")
         return []
@@ -307,8 +315,7 @@ def get_table_sqlite(db_name):
     all_tables = []
 
     try:
-        with open(db_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_schema_json(db_json_path)
     except FileNotFoundError:
         print(f"❌ Error: File not found at '{db_json_path}'")
         return []
@@ -368,8 +375,7 @@ def get_table_mysql(db_name, db_type="mysql"):
     all_tables = []
 
     try:
-        with open(db_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_schema_json(db_json_path)
     except FileNotFoundError:
         print(f"❌ Error: File not found at '{db_json_path}'")
         return []
@@ -572,79 +578,139 @@ Task:
 """
     return PROMPT_CE
 
-def SL_workflow_old(Question_id, Question, db_id,Tool_model, model="deepseek-chat", temperature=0, max_retries=5, db_type="snow"):
-    if db_type == "snow":
-        table_list = get_table_mess_snow(db_id)
-    elif db_type == "sqlite":
-        table_list = get_table_sqlite(db_id)
-    else:
-        table_list = get_table_mess_bigquery(db_id)
-        
-    all_table_results = []
-
-    for table in table_list:
-        success = False
-        retry_count = 0
+def _run_concurrently(fn, items, max_workers):
+    """
+    fn(item) for every item on a bounded thread pool. Results come back in the order of items,
+    whatever order the calls finish in, so merging them stays deterministic.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    context = dict(vars(log_context))  # the caller's thread-local log context (question_id, db_id)
 
-        while not success and retry_count < max_retries:
-            try:
-                # 1. Get schema for a single table
-                table_mess = M_Schema(db_id=db_id, SL=[table], db_type=db_type, Level="table")
+    def run(item):
+        for key, value in context.items():
+            setattr(log_context, key, value)
+        return fn(item)
 
-                # 2. Construct prompt
-                Prompt = get_prompt_SQL_old(Question, table_mess, str([table]), db_type=db_type)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(run, items))
 
-                # 3. Call LLM
-                start_time = time.time()
-                input_token_count, output_token_count, Thinking, LLM_return = LLM_output(
-                    messages=[{"role": "user", "content": Prompt}],
-                    model=model,
-                    temperature=temperature
-                )
-                end_time = time.time()
-                elapsed_time1 = end_time - start_time
-                
-                print(LLM_return)
-                log_llm_io(model_name=model, prompt=Prompt, output=LLM_return, think=Thinking, qid=Question_id)
+def _sample_schema_links(Question_id, Prompt, model, temperature, max_retries, extract, label):
+    """
+    One sampling round: an LLM SQL draft for Prompt, then extract(SQL) for the tables and columns it uses.
+    Retried up to max_retries times; returns None if every attempt failed.
+    """
+    for retry_count in range(1, max_retries + 1):
+        try:
+            start_time = time.time()
 
-                # 4. Extract SQL
-                SQL = extract_sql_code(LLM_return)
+            # Call LLM to get output
+            input_token_count, output_token_count, Thinking, LLM_return = LLM_output(
+                messages=[{"role": "user", "content": Prompt}],
+                model=model,
+                temperature=temperature
+            )
 
-                # 5. Execute SQL and parse output
-                start_time = time.time()
+            print(LLM_return)
+            log_llm_io(model_name=model, prompt=Prompt, output=LLM_return, think=Thinking, qid=Question_id)
+
+            end_time = time.time()
+            elapsed_time1 = end_time - start_time
+
+            # Extract SQL statement
+            SQL = extract_sql_code(LLM_return)
+
+            # Execute SQL to get structure information
+            start_time = time.time()
+            table_x = extract(SQL)
+            end_time = time.time()
+            elapsed_time2 = end_time - start_time
+
+            # Record the status of this run
+            logger_status.log(
+                question_id=Question_id,
+                step=elapsed_time1 + elapsed_time2,
+                if_in_fix=model,
+                input_token_count=input_token_count,
+                output_token_count=output_token_count,
+                status=None
+            )
+            return table_x
 
-                if db_type == "snow" or db_type == "bigquery":
-                    table_x = Get_SL_func_snow(SQL=SQL, db_name=db_id, model=Tool_model,allow_partial=False, check_columns=False)
-                elif db_type == "sqlite":
-                    table_x = Get_SL_func_sqlite(SQL=SQL, db_name=db_id,model=Tool_model, allow_partial=False, check_columns=True)
-                elif db_type == "mysql" or db_type == "doris":
-                    from Extract_tables_col import Get_SL_func_mysql
-                    table_x = Get_SL_func_mysql(SQL=SQL, db_name=db_id, model=Tool_model, check_columns=True, db_type=db_type)
+        except Exception as e:
+            traceback.print_exc()
+            print(f"[Warning] Error processing {label} on attempt {retry_count}: {e}")
+    return None
 
-                end_time = time.time()
-                elapsed_time2 = end_time - start_time
-                
-                # Record the status of this run
-                logger_status.log(
-                    question_id=Question_id,
-                    step=elapsed_time1 + elapsed_time2,
-                    if_in_fix=model,
-                    input_token_count=input_token_count,
-                    output_token_count=output_token_count,
-                    status=None  # Mark successful processing of a table
-                )
+def _sampling_rounds(Question_id, Prompt, model, temperature, max_retries, extract):
+    """Run SL_SAMPLING_ROUNDS sampling rounds concurrently. Returns (successful samples in round order, sample_history)."""
+    rounds = _run_concurrently(
+        lambda sample_index: _sample_schema_links(Question_id, Prompt, model, temperature, max_retries, extract, "all tables"),
+        range(SL_SAMPLING_ROUNDS), SL_SAMPLING_CONCURRENCY)
 
-                # Collect results
-                all_table_results.append(table_x)
-                success = True
+    all_samples = []
+    sample_history = {}
+    for sample_index, table_x in enumerate(rounds):
+        # If still failing, skip this sampling round
+        if table_x is None:
+            print(f"[Error] All tables failed after {max_retries} retries in sample {sample_index}. Skipping this sample.")
+            continue
+        all_samples.append(table_x)
+        sample_history[sample_index] = table_x
+    return all_samples, sample_history
 
-            except Exception as e:
-                retry_count += 1
-                traceback.print_exc()
-                print(f"[Warning] Error processing table {table} on attempt {retry_count}: {e}")
+def prefilter_tables(Question, db_id, db_type, table_list, top_k=SL_RETRIEVAL_TOP_K):
+    """
+    The top_k tables of table_list for the question, ranked by the local BM25/embedding index (utils/Schema_Retrieval.py).
+    [] when no ranking is available, in which case the callers link every table.
+    """
+    try:
+        ranked = rank_tables(db_id, db_type, Question, top_k=len(table_list))
+    except Exception as e:
+        traceback.print_exc()
+        print(f"[Warning] Table retrieval failed for {db_id}: {e}")
+        return []
+    available = set(table_list)
+    return [table for table in ranked if table in available][:top_k]
 
-        if not success:
+def SL_workflow_old(Question_id, Question, db_id,Tool_model, model="deepseek-chat", temperature=0, max_retries=5, db_type="snow", table_list=None):
+    if table_list is not None:
+        pass  # Only link the given tables
+    elif db_type == "snow":
+        table_list = get_table_mess_snow(db_id)
+    elif db_type == "sqlite":
+        table_list = get_table_sqlite(db_id)
+    else:
+        table_list = get_table_mess_bigquery(db_id)
+        
+    def extract(SQL):
+        if db_type == "snow" or db_type == "bigquery":
+            return Get_SL_func_snow(SQL=SQL, db_name=db_id, model=Tool_model,allow_partial=False, check_columns=False, db_type=db_type)
+        elif db_type == "sqlite":
+            return Get_SL_func_sqlite(SQL=SQL, db_name=db_id,model=Tool_model, allow_partial=False, check_columns=True)
+        elif db_type == "mysql" or db_type == "doris":
+            from Extract_tables_col import Get_SL_func_mysql
+            return Get_SL_func_mysql(SQL=SQL, db_name=db_id, model=Tool_model, check_columns=True, db_type=db_type)
+        raise ValueError(f"Unsupported db_type: {db_type}")
+
+    def link_table(table):
+        try:
+            # Get schema for a single table and construct the prompt
+            table_mess = render_schema(db_id=db_id, SL=[table], db_type=db_type, level="table").text
+            Prompt = get_prompt_SQL_old(Question, table_mess, str([table]), db_type=db_type)
+        except Exception as e:
+            traceback.print_exc()
+            print(f"[Error] Failed to build the prompt for table {table}: {e}")
+            return None
+        table_x = _sample_schema_links(Question_id, Prompt, model, temperature, max_retries, extract, f"table {table}")
+        if table_x is None:
             print(f"[Error] Failed to process table {table} after {max_retries} retries.")
+        return table_x
+
+    # One LLM call per table, SL_TABLE_CONCURRENCY at a time; results are kept in table order
+    all_table_results = [table_x for table_x in _run_concurrently(link_table, table_list, SL_TABLE_CONCURRENCY)
+                         if table_x is not None]
 
     # Merge schemas from all tables
     try:
@@ -672,23 +738,21 @@ def SL_workflow_min(Question_id, Question, db_id, table_list,Tool_model,
         print(f"[Info] Database {db_id} has only one table, skipping SQL/LLM due to use_single_table=False")
         return table_list, {table_list[0]: []}, {0: {table_list[0]: []}}   # Return empty schema and sample_history
 
-    # Get table structure information (JSON format)
-    table_mess = M_Schema(db_id=db_id, SL=table_list, db_type=db_type, Level="table")
-    # Get table structure DDL information
-    if db_type=="snow" or db_type=="bigquery":
-        table_mess_ddl = generate_ddl_from_json(db_id,table_list,db_type=db_type)
-    elif db_type=="sqlite":
-        table_mess_ddl = get_tables_ddl_sqlite(db_id,table_list,db_type)
+    # Get table structure information (JSON format); the DDL is only rendered if it is needed
+    rendered = render_schema(db_id=db_id, SL=table_list, db_type=db_type, level="table")
+    table_mess = rendered.text
 
     # Calculate token count for JSON schema
-    len_table_mess = get_token_count(table_mess)
+    len_table_mess = rendered.token_count
 
     # If JSON schema exceeds token limit
     if len_table_mess > max_token:
         print(f"[Info] Schema(token count: {len_table_mess}) exceeds max_token ({max_token}). Checking DDL schema as an alternative.")
 
-        # Calculate token count for DDL schema
-        len_table_mess_ddl = get_token_count(table_mess_ddl)
+        # Get table structure DDL information and its token count
+        rendered_ddl = render_schema(db_id=db_id, SL=table_list, db_type=db_type, kind="ddl")
+        table_mess_ddl = rendered_ddl.text
+        len_table_mess_ddl = rendered_ddl.token_count
 
         # If DDL also exceeds token limit, switch to the old workflow
         if len_table_mess_ddl > max_token:
@@ -699,7 +763,8 @@ def SL_workflow_min(Question_id, Question, db_id, table_list,Tool_model,
                 Tool_model=Tool_model,
                 temperature=temperature,
                 max_retries=max_retries,
-                db_type=db_type
+                db_type=db_type,
+                table_list=table_list
             )
         else:
             # Use DDL schema as an alternative to the original schema
@@ -709,77 +774,15 @@ def SL_workflow_min(Question_id, Question, db_id, table_list,Tool_model,
     # Construct Prompt input content
     Prompt = get_prompt_SQL4(Question, table_mess, str(table_list),db_type=db_type)
 
-    # Store results for each sampling round
-    all_samples = []
-    # Record structure returned by each sampling
-    sample_history = {}
-
-    # Perform 3 rounds of sampling
-    for sample_index in range(3):
-        success = False
-        retry_count = 0
-        all_table = []
-
-        # Attempt up to max_retries times per round
-        while not success and retry_count < max_retries:
-            try:
-                start_time = time.time()
-
-                # Call LLM to get output
-                input_token_count, output_token_count, Thinking, LLM_return = LLM_output(
-                    messages=[{"role": "user", "content": Prompt}],
-                    model=model,
-                    temperature=temperature
-                )
-
-                print(LLM_return)
-                log_llm_io(model_name=model, prompt=Prompt, output=LLM_return, think=Thinking, qid=Question_id)
-
-                end_time = time.time()
-                elapsed_time1 = end_time - start_time
-
-                # Extract SQL statement
-                SQL = extract_sql_code(LLM_return)
-
-                start_time = time.time()
-
-                # Execute SQL to get structure information
-                if db_type == "snow" or db_type=="bigquery":
-                    table_x = Get_SL_func_snow(SQL=SQL, db_name=db_id,model=Tool_model, check_columns=check_columns)
-                elif db_type == "sqlite" or db_type == "mysql" or db_type == "doris":
-                    table_x = Get_SL_func_sqlite(SQL=SQL, db_name=db_id, model=Tool_model,check_columns=True)
-
-
-                end_time = time.time()
-                elapsed_time2 = end_time - start_time
-
-                # Record the status of this run
-                logger_status.log(
-                    question_id=Question_id,
-                    step=elapsed_time1 + elapsed_time2,
-                    if_in_fix=model,
-                    input_token_count=input_token_count,
-                    output_token_count=output_token_count,
-                    status=None
-                )
-
-                # If successful, record results and exit loop
-                all_table.append(table_x)
-                sample_history[sample_index] = table_x
-                success = True
-
-            except Exception as e:
-                retry_count += 1
-                traceback.print_exc()
-                print(f"[Warning] Error processing all tables on attempt {retry_count}: {e}")
-
-        # If still failing, skip this sampling round
-        if not success:
-            print(f"[Error] All tables failed after {max_retries} retries in sample {sample_index}. Skipping this sample.")
-            continue
+    def extract(SQL):
+        if db_type == "snow" or db_type=="bigquery":
+            return Get_SL_func_snow(SQL=SQL, db_name=db_id,model=Tool_model, check_columns=check_columns, db_type=db_type)
+        elif db_type == "sqlite" or db_type == "mysql" or db_type == "doris":
+            return Get_SL_func_sqlite(SQL=SQL, db_name=db_id, model=Tool_model,check_columns=True)
+        raise ValueError(f"Unsupported db_type: {db_type}")
 
-        # Add successful results from this round to total samples
-        all_samples.extend(all_table)
+    # Sampling rounds run concurrently; samples and sample_history are kept in round order
+    all_samples, sample_history = _sampling_rounds(Question_id, Prompt, model, temperature, max_retries, extract)
 
     # Merge all sampling results and simplify the structure
     try:
@@ -827,29 +830,36 @@ def SL_workflow(Question_id, Question, db_id, Tool_model,
         return table_list, {table_list[0]: []}, {0: {table_list[0]: []}}   # Return empty schema and sample_history
 
     # Get table structure information (JSON format)
-    table_mess = M_Schema(db_id=db_id, SL=table_list, db_type=db_type, Level="table")
+    rendered = render_schema(db_id=db_id, SL=table_list, db_type=db_type, level="table")
+    table_mess = rendered.text
     #print(db_type,"\n",table_mess)
-    # Get table structure DDL information
-    if db_type=="snow" or db_type=="bigquery":
-        table_mess_ddl = generate_ddl_from_json(db_id,db_type=db_type)
-    elif db_type=="sqlite":
-        from utils.Database_Interface import get_tables_ddl_sqlite
-        table_mess_ddl = get_tables_ddl_sqlite(db_id)
-    elif db_type=="mysql" or db_type=="doris":
-        table_mess_ddl = generate_ddl_from_json(db_id,db_type=db_type)
 
     # Calculate token count for JSON schema
-    len_table_mess = get_token_count(table_mess)
+    len_table_mess = rendered.token_count
 
     # If JSON schema exceeds token limit
     if len_table_mess > max_token:
         print(f"[Info] Schema(token count: {len_table_mess}) exceeds max_token ({max_token}). Checking DDL schema as an alternative.")
 
-        # Calculate token count for DDL schema
-        len_table_mess_ddl = get_token_count(table_mess_ddl)
+        # Get the DDL of the whole database and its token count
+        rendered_ddl = render_schema(db_id=db_id, db_type=db_type, kind="ddl")
+        table_mess_ddl = rendered_ddl.text
+        len_table_mess_ddl = rendered_ddl.token_count
 
         # If DDL also exceeds token limit, switch to the old workflow
         if len_table_mess_ddl > max_token//2:
+            candidates = prefilter_tables(Question, db_id, db_type, table_list) if SL_RETRIEVAL_PREFILTER else []
+            if candidates:
+                print(f"[Info] DDL schema(token count: {len_table_mess_ddl}) also exceeds max_token. Linking the {len(candidates)} tables ranked highest by local retrieval.")
+                return SL_workflow_min(
+                    Question_id, Question, db_id, candidates,
+                    model=model,
+                    Tool_model=Tool_model,
+                    temperature=temperature,
+                    max_retries=max_retries,
+                    db_type=db_type,
+                    check_columns=check_columns
+                )
             print(f"[Info] DDL schema(token count: {len_table_mess_ddl}) also exceeds max_token. Switching to old workflow.")
             table_list_old,_,_=SL_workflow_old(
                 Question_id, Question, db_id,
@@ -876,78 +886,18 @@ def SL_workflow(Question_id, Question, db_id, Tool_model,
     # Construct Prompt input content
     Prompt = get_prompt_SQL4(Question, table_mess, str(table_list),db_type=db_type)
 
-    # Store results for each sampling round
-    all_samples = []
-    # Record structure returned by each sampling
-    sample_history = {}
+    def extract(SQL):
+        if db_type == "snow" or db_type=="bigquery":
+            return Get_SL_func_snow(SQL=SQL, db_name=db_id,model=Tool_model, check_columns=check_columns, db_type=db_type)
+        elif db_type == "sqlite":
+            return Get_SL_func_sqlite(SQL=SQL, db_name=db_id, model=Tool_model,check_columns=True)
+        elif db_type == "mysql" or db_type == "doris":
+            from Extract_tables_col import Get_SL_func_mysql
+            return Get_SL_func_mysql(SQL=SQL, db_name=db_id, model=Tool_model, check_columns=True, db_type=db_type)
+        raise ValueError(f"Unsupported db_type: {db_type}")
 
-    # Perform 3 rounds of sampling
-    for sample_index in range(3):
-        success = False
-        retry_count = 0
-        all_table = []
-
-        # Attempt up to max_retries times per round
-        while not success and retry_count < max_retries:
-            try:
-                start_time = time.time()
-                # print("Prompt:",Prompt)
-                # Call LLM to get output        
-                input_token_count, output_token_count, Thinking, LLM_return = LLM_output(
-                    messages=[{"role": "user", "content": Prompt}],
-                    model=model,
-                    temperature=temperature
-                )
-                print("LLM_return:",LLM_return)
-                log_llm_io(model_name=model, prompt=Prompt, output=LLM_return, think=Thinking, qid=Question_id)
-
-                end_time = time.time()
-                elapsed_time1 = end_time - start_time
-
-                # Extract SQL statement
-                SQL = extract_sql_code(LLM_return)
-
-                start_time = time.time()
-
-                # Execute SQL to get structure information
-                if db_type == "snow" or db_type=="bigquery":
-                    table_x = Get_SL_func_snow(SQL=SQL, db_name=db_id,model=Tool_model, check_columns=check_columns)
-                elif db_type == "sqlite":
-                    table_x = Get_SL_func_sqlite(SQL=SQL, db_name=db_id, model=Tool_model,check_columns=True)
-                elif db_type == "mysql" or db_type == "doris":
-                    from Extract_tables_col import Get_SL_func_mysql
-                    table_x = Get_SL_func_mysql(SQL=SQL, db_name=db_id, model=Tool_model, check_columns=True, db_type=db_type)
-
-                end_time = time.time()
-                elapsed_time2 = end_time - start_time
-
-                # Record the status of this run
-                logger_status.log(
-                    question_id=Question_id,
-                    step=elapsed_time1 + elapsed_time2,
-                    if_in_fix=model,
-                    input_token_count=input_token_count,
-                    output_token_count=output_token_count,
-                    status=None
-                )
-
-                # If successful, record results and exit loop
-                all_table.append(table_x)
-                sample_history[sample_index] = table_x
-                success = True
-
-            except Exception as e:
-                retry_count += 1
-                traceback.print_exc()
-                print(f"[Warning] Error processing all tables on attempt {retry_count}: {e}")
-
-        # If still failing, skip this sampling round
-        if not success:
-            print(f"[Error] All tables failed after {max_retries} retries in sample {sample_index}. Skipping this sample.")
-            continue
-
-        # Add successful results from this round to total samples
-        all_samples.extend(all_table)
+    # Sampling rounds run concurrently; samples and sample_history are kept in round order
+    all_samples, sample_history = _sampling_rounds(Question_id, Prompt, model, temperature, max_retries, extract)
 
     # Merge all sampling results and simplify the structure
     try:
@@ -971,6 +921,40 @@ def SL_workflow(Question_id, Question, db_id, Tool_model,
         print(f"[Error] Failed to merge table schemas from {len(all_samples)} samples: {e}")
         return [], {}, sample_history
 
+def cached_SL_workflow(Question_id, Question, db_id, Tool_model, db_type="snow", use_cache=True, **kwargs):
+    """
+    SL_workflow through the persistent result cache (SL_Cache.py): a question already linked against the same
+    schema with the same settings is answered from the cache. Same arguments and return value as SL_workflow.
+    """
+    cache = get_sl_cache() if use_cache else None
+    key = None
+    if cache is not None:
+        try:
+            fingerprint = schema_fingerprint(db_id, db_type)
+            if fingerprint is not None:
+                arguments = inspect.signature(SL_workflow).bind(Question_id, Question, db_id, Tool_model, db_type=db_type, **kwargs)
+                arguments.apply_defaults()
+                config = {name: value for name, value in arguments.arguments.items()
+                          if name not in ("Question_id", "Question", "db_id", "db_type")}
+                config.update(sampling_rounds=SL_SAMPLING_ROUNDS, retrieval=[SL_RETRIEVAL_PREFILTER, SL_RETRIEVAL_TOP_K])
+                key = cache_key(Question, db_id, db_type, fingerprint, config)
+                cached = cache.get(key)
+                if cached is not None:
+                    print(f"[Info] Schema links of {Question_id} taken from the SL cache.")
+                    return cached
+        except Exception as e:
+            traceback.print_exc()
+            print(f"[Warning] SL cache unavailable, linking without it: {e}")
+            key = None
+
+    table, col, sample_history = SL_workflow(Question_id, Question, db_id, Tool_model, db_type=db_type, **kwargs)
+    if key is not None and (table or col):
+        try:
+            cache.put(key, db_id, table, col, sample_history)
+        except Exception as e:
+            print(f"[Warning] Could not store schema links of {Question_id} in the SL cache: {e}")
+    return table, col, sample_history
+
 
 if __name__ == "__main__":
     # --- Modification 1: Add command line argument parsing ---
@@ -979,6 +963,7 @@ if __name__ == "__main__":
     parser.add_argument('--output', '-o', required=True, help="Output file path (.json)")
     parser.add_argument('--model', '-m', default="deepseek-chat", help="Model name")
     parser.add_argument('--Tool_model', '-Tm', default="deepseek-chat", help="Model name")
+    parser.add_argument('--no_cache', action='store_true', help="Do not read or write the SL result cache")
     args = parser.parse_args()
 
     input_file_path = args.input
@@ -1041,7 +1026,8 @@ if __name__ == "__main__":
                 db_type = detect_db_type(instance_id)
                 
                 # Note: If SL_workflow requires the model parameter, pass model=model_name here
-                table, col, sample_history = SL_workflow(
+                table, col, sample_history = cached_SL_workflow(
+                    use_cache=not args.no_cache,
                     Question_id=instance_id, 
                     Question=user_input, 
                     model=model_name,
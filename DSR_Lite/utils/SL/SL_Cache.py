@@ -0,0 +1,123 @@
+#--------------------------------
+# Persistent cache of SL_workflow results (table, col, sample_history), shared across runs and processes.
+# Key: hash of the normalized question (whitespace collapsed; case kept, as literals are case-sensitive), db_type,
+# db_id, a fingerprint of the database's *_M-Schema.json content and the linking configuration (models, temperature,
+# token budget, switches), so a result is reused only for the same question against the same schema with the same
+# settings.
+# Entries live in one SQLite file; the least recently used are evicted beyond SL_CACHE_MAX_ENTRIES, and entries
+# older than SL_CACHE_MAX_AGE_DAYS are ignored and dropped. SL_CACHE_ENABLED = False (or --no_cache) turns it off.
+#--------------------------------
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from utils.Schema_Catalog import get_schema
+
+SL_CACHE_ENABLED = True
+SL_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "SL_cache.sqlite")
+SL_CACHE_MAX_ENTRIES = 20000
+SL_CACHE_MAX_AGE_DAYS = 30  # None keeps entries until they are evicted
+
+
+def normalize_question(question):
+    # Only whitespace is folded: questions differing in the case of a literal ('Paris' vs 'paris') link differently
+    return re.sub(r"\s+", " ", str(question or "")).strip()
+
+
+def schema_fingerprint(db_id, db_type):
+    """SHA-1 of the database's M-Schema file content, computed once per loaded version. None if it has no schema."""
+    entry = get_schema(db_id, db_type)
+    if entry is None:
+        return None
+
+    def digest():
+        sha = hashlib.sha1()
+        with open(entry.path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    return entry.derived(("fingerprint",), digest)
+
+
+def cache_key(question, db_id, db_type, fingerprint, config):
+    """Key of one linking result; config holds every setting that can change the result."""
+    payload = json.dumps([normalize_question(question), db_type, db_id, fingerprint, config],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SLCache:
+    def __init__(self, path=SL_CACHE_PATH, max_entries=SL_CACHE_MAX_ENTRIES, max_age_days=SL_CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS sl_cache (
+                key TEXT PRIMARY KEY, db_id TEXT, result TEXT, created REAL, last_used REAL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS sl_cache_last_used ON sl_cache (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commits, or rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """(table, col, sample_history) stored under key, or None."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT result, created FROM sl_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.max_age is not None and now - row[1] > self.max_age:
+                conn.execute("DELETE FROM sl_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE sl_cache SET last_used = ? WHERE key = ?", (now, key))
+        table, col, sample_history = json.loads(row[0])
+        # JSON turns the round numbers of sample_history into strings
+        return table, col, {int(k) if k.isdigit() else k: v for k, v in sample_history.items()}
+
+    def put(self, key, db_id, table, col, sample_history):
+        now = time.time()
+        result = json.dumps([table, col, sample_history], ensure_ascii=False, default=str)
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO sl_cache VALUES (?, ?, ?, ?, ?)", (key, db_id, result, now, now))
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        if self.max_age is not None:
+            conn.execute("DELETE FROM sl_cache WHERE created < ?", (now - self.max_age,))
+        conn.execute("""DELETE FROM sl_cache WHERE key IN (
+            SELECT key FROM sl_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)""", (self.max_entries,))
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM sl_cache")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_sl_cache():
+    """The process-wide SLCache, or None when caching is disabled."""
+    global _cache
+    if not SL_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SLCache()
+        return _cache
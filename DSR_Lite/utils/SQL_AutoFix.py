@@ -0,0 +1,287 @@
+#--------------------------------
+# Rule-based fixer for mechanical SQL errors, tried before any LLM repair.
+# Each rule is keyed on an error-message pattern from db_interface and rewrites only the offending tokens of the
+# original SQL text (located with the sqlglot tokenizer), so formatting, comments and everything else are kept:
+#   snow       backticks -> double quotes; invalid identifier / unknown object -> exact-case quoted name from the schema
+#   bigquery   quoted or unquoted hyphenated table paths after FROM/JOIN -> backticks
+#   mysql/doris  unknown column / table that differs only in case -> exact-case name from the schema
+#   all        unknown column / table whose only schema match differs just in case or punctuation -> that name
+#              (startdate, StartDate -> start_date); near-synonyms such as start_date / end_date are never rewritten
+# When no rule applies, identifier_hint() lists the closest schema names for the LLM repair prompt.
+#--------------------------------
+import re
+from difflib import SequenceMatcher
+
+try:
+    from sqlglot.dialects.dialect import Dialect
+    from sqlglot.tokens import TokenType
+except ImportError:  # Without sqlglot no rule applies
+    Dialect = None
+
+from utils.SQL_Preflight import PREFLIGHT_DIALECTS, referenced_columns
+
+FUZZY_MIN_SCORE = 0.6  # similarity needed to list a schema name as a candidate
+FUZZY_HINT_LIMIT = 5
+IDENTIFIER_QUOTES = {"sqlite": ('"', '"'), "snow": ('"', '"'), "bigquery": ("`", "`"), "mysql": ("`", "`"), "doris": ("`", "`")}
+# (kind, pattern) for the unknown-identifier errors of every backend, including the pre-flight ones
+UNKNOWN_IDENTIFIER_PATTERNS = [
+    ("column", re.compile(r"no such column: ([\w.\"]+)")),
+    ("table", re.compile(r"no such table: ([\w.\"]+)")),
+    ("column", re.compile(r"invalid identifier '([^']+)'")),
+    ("table", re.compile(r"Object '([^']+)' does not exist")),
+    ("column", re.compile(r"Unrecognized name: (\w+)")),
+    ("table", re.compile(r"Not found: Table ([\w\-:.]+)")),
+    ("column", re.compile(r"Unknown column '([^']+)'")),
+    ("table", re.compile(r"Table '([^']+)' doesn't exist")),
+    ("table", re.compile(r"Unknown table '([^']+)'")),
+    ("column", re.compile(r'Referenced column "([^"]+)" not found')),  # DuckDB local replicas
+    ("table", re.compile(r"Table with name ([\w\-]+) does not exist")),
+]
+
+
+def _tokenize(sql, db_type):
+    try:
+        return Dialect.get_or_raise(PREFLIGHT_DIALECTS[db_type]).tokenize(sql)
+    except Exception:
+        return None
+
+
+def _replace_spans(sql, replacements):
+    """replacements: list of (start, end_inclusive, text); applied right to left."""
+    for start, end, text in sorted(replacements, reverse=True):
+        sql = sql[:start] + text + sql[end + 1:]
+    return sql
+
+
+def _is_name_token(tokens, i):
+    token = tokens[i]
+    if token.token_type in (TokenType.STRING, TokenType.NUMBER) or not re.match(r"^\w+$", token.text):
+        return False
+    # A following "(" makes it a function call, not an identifier
+    return not (i + 1 < len(tokens) and tokens[i + 1].token_type == TokenType.L_PAREN)
+
+
+def _unique_spelling(name, lookup, kind="column"):
+    """Exact spelling of a column or table-name part in the schema, if it is unambiguous."""
+    if lookup is None:
+        return None
+    name_lower = name.lower()
+    if kind == "column":
+        spellings = {cols[name_lower] for cols in lookup.tables.values() if name_lower in cols}
+    else:
+        spellings = set()
+        for table_id in lookup.table_names.values():
+            spellings.update(part for part in table_id.split(".") if part.lower() == name_lower)
+        if lookup.db_id.lower() == name_lower:
+            spellings.add(lookup.db_id)
+    return spellings.pop() if len(spellings) == 1 else None
+
+
+def _requote(sql, db_type, names, quote_open, quote_close, lookup, kind):
+    """Rewrite every identifier token matching one of `names` to its exact schema spelling, quoted."""
+    tokens = _tokenize(sql, db_type)
+    if not tokens:
+        return None
+    replacements = []
+    for i, token in enumerate(tokens):
+        if token.text.lower() not in names or not _is_name_token(tokens, i):
+            continue
+        spelling = _unique_spelling(token.text, lookup, kind)
+        if spelling is None:
+            continue
+        new_text = f"{quote_open}{spelling}{quote_close}"
+        if sql[token.start:token.end + 1] != new_text:
+            replacements.append((token.start, token.end, new_text))
+    return _replace_spans(sql, replacements) if replacements else None
+
+
+# --- Rules: fn(sql, match, db_type, lookup) -> fixed SQL or None ---
+def _snow_backticks(sql, match, db_type, lookup):
+    tokens = _tokenize(sql, db_type)
+    if not tokens:
+        return None
+    ticks = [t for t in tokens if t.token_type == TokenType.UNKNOWN and t.text == "`"]
+    if not ticks or len(ticks) % 2:
+        return None
+    return _replace_spans(sql, [(t.start, t.end, '"') for t in ticks])
+
+
+def _snow_identifier_case(sql, match, db_type, lookup):
+    name = match.group(1).split(".")[-1].strip('"')
+    return _requote(sql, db_type, {name.lower()}, '"', '"', lookup, "column")
+
+
+def _snow_object_case(sql, match, db_type, lookup):
+    parts = {p.strip('"').lower() for p in match.group(1).split(".")}
+    return _requote(sql, db_type, parts, '"', '"', lookup, "table")
+
+
+def _bigquery_table_paths(sql, match, db_type, lookup):
+    tokens = _tokenize(sql, db_type)
+    if not tokens:
+        return None
+
+    def unquoted_part(token):
+        # Path pieces: names (keywords such as "full" included), dashes, dots, wildcard, numbers; never `quoted`
+        return sql[token.start] != "`" and (token.token_type in (TokenType.DASH, TokenType.DOT, TokenType.STAR)
+                                            or re.match(r"^\w+$", token.text))
+
+    replacements = []
+    i = 0
+    while i < len(tokens) - 1:
+        if tokens[i].token_type in (TokenType.FROM, TokenType.JOIN):
+            nxt = tokens[i + 1]
+            if nxt.token_type == TokenType.STRING and re.match(r"^[\w\-]+(\.[\w\-\*]+)+$", nxt.text):
+                # "project.dataset.table" / 'dataset.table' are string literals in BigQuery
+                replacements.append((nxt.start, nxt.end, f"`{nxt.text}`"))
+            elif unquoted_part(nxt):
+                # Unquoted path with hyphens (bigquery-public-data.dataset.table) must be backticked
+                j = i + 1
+                while j + 1 < len(tokens) and tokens[j + 1].start == tokens[j].end + 1 and unquoted_part(tokens[j + 1]):
+                    j += 1
+                text = sql[nxt.start:tokens[j].end + 1]
+                if "-" in text and "." in text:
+                    replacements.append((nxt.start, tokens[j].end, f"`{text}`"))
+                i = j
+        i += 1
+    return _replace_spans(sql, replacements) if replacements else None
+
+
+def _mysql_column_case(sql, match, db_type, lookup):
+    name = match.group(1).split(".")[-1]
+    return _requote(sql, db_type, {name.lower()}, "`", "`", lookup, "column")
+
+
+def _mysql_table_case(sql, match, db_type, lookup):
+    name = (match.group(1) or match.group(2)).split(".")[-1]
+    return _requote(sql, db_type, {name.lower()}, "`", "`", lookup, "table")
+
+
+# --- Fuzzy identifier resolution ---
+def unknown_identifier(error_message):
+    """(kind, name) of the unknown column/table named in an error message, or (None, None)."""
+    for kind, pattern in UNKNOWN_IDENTIFIER_PATTERNS:
+        match = pattern.search(str(error_message))
+        if match:
+            name = re.split(r"[.:]", match.group(1))[-1].strip('"`')
+            return kind, name
+    return None, None
+
+
+def _identifier_pool(sql, kind, db_type, lookup):
+    """{name part (lower): (spelling, display name)} to match an unknown identifier against."""
+    if kind == "column":
+        # Prefer the columns of the tables the SQL actually reads
+        columns = referenced_columns(sql, db_type, lookup)
+        if not columns:
+            columns = {}
+            for cols in lookup.tables.values():
+                columns.update(cols)
+        return {lower: (name, name) for lower, name in columns.items()}
+    pool = {}
+    for table_id in sorted(lookup.table_names.values()):
+        pool.setdefault(table_id.split(".")[-1].lower(), (table_id.split(".")[-1], table_id))
+    return pool
+
+
+def rank_identifiers(name, pool, limit=FUZZY_HINT_LIMIT):
+    """[(spelling, display name, score)] of the pool entries most similar to name, best first."""
+    matcher = SequenceMatcher(None, b=name.lower())
+    ranked = []
+    for lower, (spelling, display) in pool.items():
+        matcher.set_seq1(lower)
+        # Cheap upper bounds first: series of thousands of tables share the pool
+        if matcher.real_quick_ratio() < FUZZY_MIN_SCORE or matcher.quick_ratio() < FUZZY_MIN_SCORE:
+            continue
+        score = matcher.ratio()
+        if score >= FUZZY_MIN_SCORE:
+            ranked.append((spelling, display, score))
+    ranked.sort(key=lambda c: (-c[2], c[1]))
+    return ranked[:limit]
+
+
+def _spelling_key(name):
+    """Name without case and punctuation: start_date, StartDate and "start-date" share a key."""
+    return re.sub(r"[^0-9a-z]", "", name.lower())
+
+
+def _fuzzy_identifier(sql, match, db_type, lookup):
+    kind, name = unknown_identifier(match.group(0))
+    if lookup is None or kind is None:
+        return None
+    # Only a spelling variant is rewritten; anything else (start_date vs end_date) is left to identifier_hint
+    key = _spelling_key(name)
+    candidates = {spelling for spelling, _ in _identifier_pool(sql, kind, db_type, lookup).values()
+                  if _spelling_key(spelling) == key}
+    if len(candidates) != 1:
+        return None
+    target = candidates.pop()
+    tokens = _tokenize(sql, db_type)
+    if not tokens:
+        return None
+    quote_open, quote_close = IDENTIFIER_QUOTES[db_type]
+    replacements = []
+    for i, token in enumerate(tokens):
+        parts = token.text.split(".")
+        if parts[-1].lower() != name.lower() or token.token_type in (TokenType.STRING, TokenType.NUMBER):
+            continue
+        if i + 1 < len(tokens) and tokens[i + 1].token_type == TokenType.L_PAREN:
+            continue
+        original = sql[token.start:token.end + 1]
+        if len(parts) > 1:
+            # Quoted path such as `project.dataset.table`: swap the last part, keep the quotes
+            new_text = original[0] + ".".join(parts[:-1] + [target]) + original[-1]
+        elif re.match(r"^\w+$", target) and db_type != "snow" and original == token.text:
+            new_text = target
+        else:
+            new_text = f"{quote_open}{target}{quote_close}"
+        replacements.append((token.start, token.end, new_text))
+    return _replace_spans(sql, replacements) if replacements else None
+
+
+def identifier_hint(sql, error_message, db_type, lookup=None):
+    """Closest schema names to the unknown column/table of an error, as a line for the repair prompt ('' if none)."""
+    kind, name = unknown_identifier(error_message)
+    if lookup is None or kind is None:
+        return ""
+    try:
+        ranked = rank_identifiers(name, _identifier_pool(sql, kind, db_type, lookup))
+    except Exception:
+        return ""
+    if not ranked:
+        return ""
+    return f"\nClosest {kind}s in the schema to '{name}': " + ", ".join(display for _, display, _ in ranked)
+
+
+AUTOFIX_RULES = [
+    # (name, db_types, error pattern, rule)
+    ("snow_backticks", ("snow",), re.compile(r"unexpected '`'"), _snow_backticks),
+    ("snow_identifier_case", ("snow",), re.compile(r"invalid identifier '([^']+)'"), _snow_identifier_case),
+    ("snow_object_case", ("snow",), re.compile(r"Object '([^']+)' does not exist"), _snow_object_case),
+    ("bigquery_table_paths", ("bigquery",), re.compile(r"Table name contains '-' character|Unexpected string literal", re.IGNORECASE), _bigquery_table_paths),
+    ("mysql_column_case", ("mysql", "doris"), re.compile(r"Unknown column '([^']+)'"), _mysql_column_case),
+    ("mysql_table_case", ("mysql", "doris"), re.compile(r"Table '([^']+)' doesn't exist|Unknown table '([^']+)'"), _mysql_table_case),
+    ("fuzzy_identifier", tuple(PREFLIGHT_DIALECTS), re.compile("|".join(p.pattern for _, p in UNKNOWN_IDENTIFIER_PATTERNS)), _fuzzy_identifier),
+]
+
+
+def auto_fix_sql(sql, error_message, db_type, lookup=None):
+    """
+    Try each rule whose pattern matches the error. lookup is the database's SchemaLookup (rules that need exact
+    schema spellings are skipped without it). Returns (fixed_sql, rule_name), or (None, None) if no rule applies.
+    """
+    if Dialect is None or db_type not in PREFLIGHT_DIALECTS or not error_message:
+        return None, None
+    for name, db_types, pattern, rule in AUTOFIX_RULES:
+        if db_type not in db_types:
+            continue
+        match = pattern.search(str(error_message))
+        if not match:
+            continue
+        try:
+            fixed = rule(sql, match, db_type, lookup)
+        except Exception:
+            fixed = None
+        if fixed and fixed != sql:
+            return fixed, name
+    return None, None
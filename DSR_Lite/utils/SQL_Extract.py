@@ -0,0 +1,162 @@
+#--------------------------------
+# Deterministic extraction of the schema tables and columns a SQL draft uses, for schema linking.
+# The SQL is parsed in the target dialect; CTE names, FLATTEN/UNNEST outputs, subquery aliases and
+# information_schema are skipped, table aliases are followed to their base tables (also from correlated
+# subqueries), quoted identifiers are unquoted, and every name is validated against the database's SchemaLookup.
+# Names come back spelled as in the M-Schema:
+#   snow "DB.SCHEMA.TABLE", bigquery "project.dataset.table", sqlite/mysql/doris "table"  ->  [columns]
+# The result is None whenever the extraction cannot be trusted (sqlglot missing, SQL that does not parse,
+# a table that is not in the schema), and callers then ask the tool LLM as before (utils/SL/Extract_tables_col.py).
+#--------------------------------
+try:
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.optimizer.scope import traverse_scope
+except ImportError:  # Without sqlglot every extraction goes to the LLM
+    sqlglot = None
+
+from utils.SQL_Preflight import PREFLIGHT_DIALECTS
+
+USE_SQL_EXTRACTION = True
+
+
+def _table_keys(table, lookup):
+    """Lookup keys (lower) of a referenced base table; [] if it is not a table of this database."""
+    db_type = lookup.db_type
+    parts = [part.name for part in table.parts]
+    if db_type in ("sqlite", "mysql", "doris"):
+        if len(parts) > 2 or (len(parts) == 2 and parts[0].lower() not in (lookup.db_id.lower(), "main")):
+            return []
+        key = parts[-1].lower()
+    else:
+        if len(parts) == 3:
+            top_level = parts[0].lower()
+            if (db_type == "snow" and top_level != lookup.db_id.lower()) or \
+                    (db_type == "bigquery" and top_level not in lookup.projects):
+                return []
+            parts = parts[1:]
+        if len(parts) != 2:
+            return []
+        key = ".".join(parts).lower()
+        if db_type == "bigquery" and key.endswith("*"):
+            # Wildcard table: every table of the series with that prefix
+            return [k for k in lookup.tables if k.startswith(key[:-1])]
+    return [key] if key in lookup.tables else []
+
+
+def _display_name(key, lookup):
+    table_id = lookup.table_names[key]
+    if lookup.db_type == "snow":
+        return f"{lookup.db_id}.{table_id}"
+    if lookup.db_type == "bigquery":
+        return f"{lookup.table_projects.get(key, lookup.db_id)}.{table_id}"
+    return table_id
+
+
+def _matching_columns(name, columns):
+    """Original spellings of a referenced column name; nested fields listed as "record.field" count as the record."""
+    name = name.lower()
+    if name in columns:
+        return [columns[name]]
+    return [original for lower, original in columns.items() if lower.startswith(name + ".")]
+
+
+def _collect(tree, lookup, result):
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+
+    # Tables
+    resolved = {}
+    for table in tree.find_all(exp.Table):
+        if not isinstance(table.this, exp.Identifier):
+            continue  # Table functions such as FLATTEN(...) or UNNEST(...)
+        if not table.args.get("db") and table.name.lower() in cte_names:
+            continue
+        if "information_schema" in table.sql().lower():
+            continue
+        keys = _table_keys(table, lookup)
+        if not keys:
+            print(f"[SQL_Extract] Table '{table.sql(PREFLIGHT_DIALECTS[lookup.db_type])}' is not in the schema of '{lookup.db_id}'.")
+            return False
+        resolved[id(table)] = keys
+        for key in keys:
+            result.setdefault(_display_name(key, lookup), [])
+
+    # Columns, scope by scope; a column that no base table of the scope has may belong to an outer one
+    base_tables = {}
+
+    def base_tables_of(scope):
+        if id(scope) not in base_tables:
+            base_tables[id(scope)] = {
+                alias.lower(): resolved[id(source)] for alias, source in scope.sources.items()
+                if isinstance(source, exp.Table) and id(source) in resolved
+            }
+        return base_tables[id(scope)]
+
+    def provides(scope, name):
+        """Whether name is an output column of a derived source of scope, or one of its own select aliases."""
+        name = name.lower()
+        selects = [source.expression.named_selects for source in scope.sources.values() if not isinstance(source, exp.Table)]
+        if isinstance(scope.expression, exp.Select):
+            selects.append(scope.expression.named_selects)
+        return any(name in {select.lower() for select in named} for named in selects)
+
+    def add(keys, name):
+        for key in keys:
+            columns = result[_display_name(key, lookup)]
+            for original in _matching_columns(name, lookup.tables[key]):
+                if original not in columns:
+                    columns.append(original)
+
+    for scope in traverse_scope(tree):
+        for column in scope.columns:
+            if not isinstance(column.this, exp.Identifier):
+                continue  # Stars
+            parts = [part.name for part in column.parts]
+            if len(parts) == 1:
+                # Unqualified: every base table of the scope that has the column, else of the nearest outer
+                # scope that has it (correlated reference), unless a subquery, CTE or alias already provides it
+                outer = scope
+                while outer is not None:
+                    owners = [key for keys in base_tables_of(outer).values() for key in keys
+                              if _matching_columns(parts[0], lookup.tables[key])]
+                    if owners:
+                        add(owners, parts[0])
+                        break
+                    if provides(outer, parts[0]):
+                        break
+                    outer = outer.parent
+                continue
+            # Qualified: alias.column, or a struct path alias.column.field (BigQuery) / schema.table.column
+            outer = scope
+            while outer is not None:
+                sources = base_tables_of(outer)
+                if len(parts) > 2 and parts[0].lower() in sources:
+                    add(sources[parts[0].lower()], parts[1])
+                    break
+                if parts[-2].lower() in sources:
+                    add(sources[parts[-2].lower()], parts[-1])
+                    break
+                if parts[-2].lower() in {alias.lower() for alias in outer.sources}:
+                    break  # CTE, subquery, FLATTEN/UNNEST output
+                outer = outer.parent
+    return True
+
+
+def extract_tables_columns(sql, db_type, lookup):
+    """
+    {table: [columns]} used by sql, validated against lookup (the database's SchemaLookup).
+    None when the SQL cannot be extracted deterministically and the caller should fall back to the LLM.
+    """
+    dialect = PREFLIGHT_DIALECTS.get(db_type)
+    if not USE_SQL_EXTRACTION or sqlglot is None or dialect is None or lookup is None or not sql:
+        return None
+    result = {}
+    try:
+        trees = [tree for tree in sqlglot.parse(sql, read=dialect) if tree is not None]
+        for tree in trees:
+            if not _collect(tree, lookup, result):
+                return None
+    except Exception as e:
+        print(f"[SQL_Extract] Could not extract tables and columns, falling back to the LLM. Error: {str(e).splitlines()[0] if str(e) else e!r}")
+        return None
+    return result or None
@@ -0,0 +1,328 @@
+#--------------------------------
+# Local pre-flight validation of candidate SQL against the cached M-Schema JSON.
+# The SQL is parsed in the target dialect and its table and column references are resolved against the schema,
+# so obviously invalid SQL is rejected in milliseconds instead of after a warehouse round trip.
+# Errors come back in db_interface's (status_code, message) shape, worded like the backend's own errors.
+# The checks are conservative: anything the validator cannot resolve with certainty (CTEs, UNNEST/FLATTEN,
+# struct fields, correlated references, other databases) is left for the database to judge.
+#--------------------------------
+import re
+import sqlite3
+
+try:
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import ParseError, TokenError
+    from sqlglot.optimizer.scope import traverse_scope
+except ImportError:  # Without sqlglot every query passes pre-flight
+    sqlglot = None
+
+from utils.Schema_Catalog import build_tables
+
+PREFLIGHT_DIALECTS = {
+    "sqlite": "sqlite",
+    "snow": "snowflake",
+    "bigquery": "bigquery",
+    "mysql": "mysql",
+    "doris": "doris",
+}
+# Same status codes the backends return for these errors
+PREFLIGHT_ERROR_STATUS = {"sqlite": 2, "snow": 1, "bigquery": 3, "mysql": 1, "doris": 1}
+# "tokens": only reject SQL that cannot be tokenized (unterminated strings/quotes);
+# "strict": also reject SQL that sqlglot cannot parse, which may include valid vendor-specific syntax
+PREFLIGHT_SYNTAX_CHECK = "tokens"
+
+PSEUDO_COLUMNS = {
+    "sqlite": {"rowid", "oid", "_rowid_"},
+    "bigquery": {"_table_suffix", "_partitiontime", "_partitiondate", "_file_name"},
+    "snow": set(),
+    "mysql": set(),
+    "doris": set(),
+}
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+
+
+class SchemaLookup:
+    """
+    Table -> column names for one database, keyed by lower-cased table id:
+    "table" for sqlite/mysql/doris, "schema.table" for snow, "dataset.table" for bigquery.
+    Original spellings are kept alongside for case-sensitive dialects (Snowflake).
+    """
+    def __init__(self, db_type, db_id):
+        self.db_type = db_type
+        self.db_id = db_id
+        self.tables = {}  # table id (lower) -> {column lower: column original}
+        self.table_names = {}  # table id (lower) -> table id (original)
+        self.containers = set()  # known schema / dataset names (lower)
+        self.projects = set()  # bigquery top-level keys (lower)
+        self.table_projects = {}  # bigquery: table id (lower) -> top-level key (original)
+
+    def add_table(self, table_id, columns):
+        self.table_names[table_id.lower()] = table_id
+        self.tables[table_id.lower()] = {c.lower(): c for c in columns}
+        if "." in table_id:
+            self.containers.add(table_id.split(".")[0].lower())
+
+    def add_similar(self, table_id, surrogate_id):
+        # Tables of a series share the surrogate's columns
+        surrogate = self.tables.get(surrogate_id.lower())
+        if surrogate is not None and table_id.lower() not in self.tables:
+            self.table_names[table_id.lower()] = table_id
+            self.tables[table_id.lower()] = surrogate
+
+
+def lookup_from_tables(tables, db_type, db_id):
+    """Build a SchemaLookup from the typed tables of one database (utils/Schema_Catalog.py)."""
+    lookup = SchemaLookup(db_type, db_id)
+    tables = list(tables)
+    for table in tables:
+        lookup.add_table(table.id, [column.name for column in table.columns])
+        if table.project:
+            lookup.projects.add(table.project.lower())
+            lookup.table_projects[table.id.lower()] = table.project
+    for table in tables:
+        for table_id in table.similar_tables:
+            lookup.add_similar(table_id, table.id)
+            if table.project:
+                lookup.table_projects.setdefault(table_id.lower(), table.project)
+    return lookup
+
+
+def add_sqlite_objects(lookup, db_path):
+    """
+    Add the views of a SQLite file, and any table its M-Schema omits, read from the file's own catalog
+    (the M-Schema only lists tables). Leaves the lookup as it is if the file cannot be read.
+    """
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        print(f"[Preflight] Could not read views of {db_path}: {e}")
+        return lookup
+    try:
+        names = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'")]
+        for name in names:
+            if name.lower() not in lookup.tables:
+                columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{name.replace(chr(34), chr(34) * 2)}")')]
+                lookup.add_table(name, columns)
+    except sqlite3.Error as e:
+        print(f"[Preflight] Could not read views of {db_path}: {e}")
+    finally:
+        conn.close()
+    return lookup
+
+
+def build_schema_lookup(schema_data, db_type, db_id):
+    """Build a SchemaLookup from the parsed *_M-Schema.json of one database."""
+    return lookup_from_tables(build_tables(schema_data, db_type, db_id).values(), db_type, db_id)
+
+
+# --- Backend-style error messages ---
+def _table_error(db_type, table, lookup):
+    name = table.sql(PREFLIGHT_DIALECTS[db_type])
+    if db_type == "sqlite":
+        return f"SQLite Database Error: no such table: {table.name}"
+    if db_type == "snow":
+        return f"Snowflake Programming Error: 002003 (42S02): SQL compilation error:\nObject '{name.replace(chr(34), '')}' does not exist or not authorized."
+    if db_type == "bigquery":
+        return f"BigQuery programming Error: 404 Not found: Table {table.catalog}:{table.db}.{table.name} was not found"
+    return f"MySQL/Doris Programming Error: (1146, \"Table '{table.db or lookup.db_id}.{table.name}' doesn't exist\")"
+
+
+def _column_error(db_type, column):
+    if db_type == "sqlite":
+        return f"SQLite Database Error: no such column: {column.sql('sqlite').replace(chr(34), '')}"
+    if db_type == "snow":
+        name = column.name if column.this.quoted else column.name.upper()
+        qualified = f"{column.table.upper() if column.table else ''}.{name}".lstrip(".")
+        return f"Snowflake Programming Error: 000904 (42000): SQL compilation error:\ninvalid identifier '{qualified}'"
+    if db_type == "bigquery":
+        return f"BigQuery programming Error: 400 Unrecognized name: {column.name}"
+    return f"MySQL/Doris Programming Error: (1054, \"Unknown column '{column.sql(PREFLIGHT_DIALECTS[db_type]).replace('`', '')}' in 'field list'\")"
+
+
+# --- Resolution ---
+def _identifier_matches(identifier, original, db_type):
+    """Whether an identifier as written refers to the stored name `original`."""
+    if db_type != "snow":
+        return identifier.name.lower() == original.lower()
+    # Snowflake: unquoted identifiers resolve upper-cased, quoted ones exactly
+    return identifier.name == original if identifier.quoted else identifier.name.upper() == original
+
+
+def _resolve_table(table, lookup):
+    """
+    Returns the column map of a referenced base table, False if it provably does not exist,
+    or None when the reference cannot be checked locally.
+    """
+    db_type = lookup.db_type
+    parts = [p for p in (table.args.get("catalog"), table.args.get("db"), table.this) if p is not None]
+    if not all(isinstance(p, exp.Identifier) for p in parts):
+        return None
+    if db_type in ("sqlite", "mysql", "doris"):
+        if len(parts) > 2 or (len(parts) == 2 and parts[0].name.lower() != lookup.db_id.lower()):
+            return None
+        key = parts[-1].name.lower()
+        if db_type == "sqlite" and key.startswith("sqlite_"):
+            return None  # sqlite_master / sqlite_schema / sqlite_sequence ... are not in the M-Schema
+    elif db_type == "snow":
+        # Only fully qualified references into this database can be checked
+        if len(parts) != 3 or parts[0].name.upper() != lookup.db_id.upper():
+            return None
+        if parts[1].name.lower() not in lookup.containers:
+            return None
+        key = f"{parts[1].name}.{parts[2].name}".lower()
+        if key in lookup.tables:
+            schema_name, table_name = lookup.table_names[key].split(".", 1)
+            if not (_identifier_matches(parts[1], schema_name, db_type) and _identifier_matches(parts[2], table_name, db_type)):
+                return False
+    else:  # bigquery
+        if len(parts) != 3 or parts[0].name.lower() not in lookup.projects or parts[1].name.lower() not in lookup.containers:
+            return None
+        if parts[2].name.endswith("*"):
+            # Wildcard table: any table of the series with that prefix
+            prefix = f"{parts[1].name}.{parts[2].name[:-1]}".lower()
+            matches = [cols for key, cols in lookup.tables.items() if key.startswith(prefix)]
+            if not matches:
+                return False
+            merged = {}
+            for cols in matches:
+                merged.update(cols)
+            return merged
+        key = f"{parts[1].name}.{parts[2].name}".lower()
+    return lookup.tables.get(key, False)
+
+
+def _column_exists(column, columns, db_type):
+    name = column.name.lower()
+    original = columns.get(name)
+    if original is None:
+        # Nested fields may be listed as "record.field" without the record itself
+        return name in PSEUDO_COLUMNS[db_type] or any(c.startswith(name + ".") for c in columns)
+    return _identifier_matches(column.this, original, db_type)
+
+
+def _check_references(tree, lookup):
+    db_type = lookup.db_type
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+
+    # Tables
+    resolved = {}
+    for table in tree.find_all(exp.Table):
+        if not isinstance(table.this, exp.Identifier):
+            continue  # Table functions such as FLATTEN(...) or UNNEST(...)
+        if not table.args.get("db") and table.name.lower() in cte_names:
+            continue
+        if "information_schema" in table.sql().lower():
+            continue
+        columns = _resolve_table(table, lookup)
+        if columns is False:
+            return _table_error(db_type, table, lookup)
+        resolved[id(table)] = columns
+
+    # Columns, scope by scope
+    scope_info = {}
+
+    def info_of(scope):
+        """(base columns by alias, whether every source is a base table, projection aliases) of a SELECT scope."""
+        if id(scope) not in scope_info:
+            select = scope.expression
+            sources = {alias.lower(): source for alias, source in scope.sources.items()}
+            base_columns = {}
+            for alias, source in sources.items():
+                if isinstance(source, exp.Table) and resolved.get(id(source)):
+                    base_columns[alias] = resolved[id(source)]
+            all_base = len(base_columns) == len(sources) and bool(sources) \
+                and not select.find(exp.Unnest, exp.Lateral)
+            projection_aliases = {s.alias.lower() for s in select.selects if s.alias}
+            scope_info[id(scope)] = base_columns, all_base, projection_aliases
+        return scope_info[id(scope)]
+
+    def resolvable(column, scope):
+        """Whether an unqualified column may come from scope or, being a correlated reference, from an outer one."""
+        while scope is not None:
+            if not isinstance(scope.expression, exp.Select):
+                return True
+            base_columns, all_base, projection_aliases = info_of(scope)
+            if not all_base or column.name.lower() in projection_aliases:
+                return True  # Cannot be verified
+            if any(_column_exists(column, columns, db_type) for columns in base_columns.values()):
+                return True
+            # Only subqueries in expressions (WHERE/SELECT ... EXISTS/IN) see the columns of the enclosing query
+            scope = scope.parent if scope.is_subquery else None
+        return False
+
+    for scope in traverse_scope(tree):
+        select = scope.expression
+        if not isinstance(select, exp.Select):
+            continue
+        base_columns = info_of(scope)[0]
+
+        for column in scope.columns:
+            if column.find_ancestor(exp.Select) is not select:
+                continue  # Columns of correlated subqueries are checked in their own scope
+            if not isinstance(column.this, exp.Identifier) or column.args.get("db"):
+                continue  # Stars, struct paths like a.b.c
+            if db_type == "sqlite" and column.this.quoted:
+                continue  # SQLite falls back to treating unknown "double-quoted" names as strings
+            qualifier = column.table.lower()
+            if qualifier:
+                columns = base_columns.get(qualifier)
+                if columns is None:
+                    continue  # CTE/subquery/outer reference, or a struct field in BigQuery
+                if not _column_exists(column, columns, db_type):
+                    return _column_error(db_type, column)
+            elif not resolvable(column, scope):
+                return _column_error(db_type, column)
+    return None
+
+
+def referenced_columns(sql, db_type, lookup):
+    """Merged {column lower: column original} of the schema tables the SQL references; {} if none resolve."""
+    dialect = PREFLIGHT_DIALECTS.get(db_type)
+    if sqlglot is None or dialect is None or lookup is None:
+        return {}
+    columns = {}
+    try:
+        for tree in sqlglot.parse(sql, read=dialect):
+            for table in (tree.find_all(exp.Table) if tree is not None else ()):
+                resolved = _resolve_table(table, lookup) if isinstance(table.this, exp.Identifier) else None
+                if resolved:
+                    columns.update(resolved)
+    except Exception:
+        return {}
+    return columns
+
+
+def validate_sql(sql, db_type, lookup=None):
+    """
+    Validate SQL locally. lookup is the SchemaLookup of the target database (None skips reference checks).
+    Returns (0, None) when the SQL may be sent to the database, otherwise (status_code, error_message).
+    """
+    dialect = PREFLIGHT_DIALECTS.get(db_type)
+    if sqlglot is None or dialect is None:
+        return 0, None
+    status = PREFLIGHT_ERROR_STATUS[db_type]
+    try:
+        trees = [t for t in sqlglot.parse(sql, read=dialect) if t is not None]
+    except TokenError as e:
+        return status, f"[Preflight] Syntax error: {_ANSI.sub('', str(e))} (unterminated string or quoted identifier?)"
+    except ParseError as e:
+        if PREFLIGHT_SYNTAX_CHECK != "strict":
+            return 0, None
+        detail = e.errors[0] if e.errors else {}
+        return status, (f"[Preflight] Syntax error: {detail.get('description', _ANSI.sub('', str(e)))} "
+                        f"Line {detail.get('line')}, Col: {detail.get('col')}.")
+    except Exception:
+        return 0, None
+
+    if lookup is None:
+        return 0, None
+    for tree in trees:
+        try:
+            error = _check_references(tree, lookup)
+        except Exception:
+            error = None  # The validator must never block SQL because of its own limitations
+        if error:
+            return status, f"[Preflight] {error}"
+    return 0, None
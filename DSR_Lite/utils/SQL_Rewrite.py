@@ -0,0 +1,118 @@
+#--------------------------------
+# Rewrites the random-sampling pattern used by exploration queries,
+#   SELECT ... FROM <table> [WHERE ...] ORDER BY RANDOM()/RAND() LIMIT n
+# into sampling that does not sort the whole table:
+#   sqlite          rowid point probes:     WHERE rowid IN (<n * SQLITE_PROBE_FACTOR random rowids>) LIMIT n
+#   bigquery        block sampling:         FROM t TABLESAMPLE SYSTEM (p PERCENT) ORDER BY RAND() LIMIT n
+#   snow            row/block sampling:     FROM t SAMPLE (n ROWS), or SAMPLE SYSTEM (p) when there is a WHERE
+#   mysql / doris   Bernoulli filter:       WHERE RAND() < <about n * MYSQL_OVERSAMPLE rows / table size>
+# The rewrite is a best-effort speedup: callers run the original SQL when the rewritten one fails or returns no rows.
+#--------------------------------
+try:
+    import sqlglot
+    from sqlglot import exp
+except ImportError:  # Without sqlglot no query is rewritten
+    sqlglot = None
+
+SAMPLING_REWRITE_DIALECTS = {
+    "sqlite": "sqlite",
+    "snow": "snowflake",
+    "bigquery": "bigquery",
+    "mysql": "mysql",
+    "doris": "doris",
+}
+SQLITE_PROBE_FACTOR = 4  # random rowids probed per requested row (gaps in rowid are skipped)
+BIGQUERY_SAMPLE_PERCENT = 1
+SNOWFLAKE_SAMPLE_PERCENT = 1
+MYSQL_OVERSAMPLE = 20  # expected rows kept by the RAND() filter per requested row
+
+
+def _sampling_target(tree):
+    """Return (table, limit) if tree is a plain single-table SELECT ... ORDER BY RANDOM() LIMIT n, else None."""
+    if not isinstance(tree, exp.Select):
+        return None
+    order = tree.args.get("order")
+    limit = tree.args.get("limit")
+    if order is None or limit is None or len(order.expressions) != 1:
+        return None
+    if not isinstance(order.expressions[0].this, exp.Rand):
+        return None
+    if not isinstance(limit.expression, exp.Literal) or limit.expression.is_string or tree.args.get("offset"):
+        return None
+    if tree.args.get("joins") or tree.args.get("group") or tree.args.get("having") or tree.args.get("distinct") \
+            or tree.args.get("with") or tree.args.get("with_") or tree.args.get("qualify"):
+        return None
+    if any(tree.find_all(exp.AggFunc, exp.Window)):
+        return None
+    from_ = tree.args.get("from") or tree.args.get("from_")
+    if from_ is None or not isinstance(from_.this, exp.Table) or from_.this.args.get("sample"):
+        return None
+    table = from_.this
+    if not table.name or "information_schema" in table.sql().lower():
+        return None
+    return table, int(limit.expression.this)
+
+
+def _rewrite_sqlite(tree, table, n):
+    ref = exp.table_(table.name, db=table.text("db") or None, quoted=True).sql("sqlite")
+    probes = sqlglot.parse_one(
+        f"SELECT ABS(RANDOM()) % (SELECT MAX(rowid) FROM {ref}) + 1 FROM "
+        f"(WITH RECURSIVE probe(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM probe WHERE i < {n * SQLITE_PROBE_FACTOR}) "
+        f"SELECT i FROM probe)",
+        read="sqlite",
+    )
+    rowid = exp.column("rowid", table=exp.to_identifier(table.alias_or_name, quoted=True))
+    tree = tree.where(exp.In(this=rowid, query=exp.Subquery(this=probes)), copy=False)
+    tree.set("order", None)
+    return tree
+
+
+def _rewrite_bigquery(tree, table, n):
+    table.set("sample", exp.TableSample(method=exp.var("SYSTEM"), percent=exp.Literal.number(BIGQUERY_SAMPLE_PERCENT)))
+    return tree
+
+
+def _rewrite_snowflake(tree, table, n):
+    if tree.args.get("where") is None:
+        # Fixed-size row sampling already returns n random rows, so the sort is dropped
+        table.set("sample", exp.TableSample(method=exp.var("BERNOULLI"), size=exp.Literal.number(n)))
+        tree.set("order", None)
+    else:
+        # SAMPLE is applied before WHERE, so sample blocks and keep the filter, sort and limit on top
+        table.set("sample", exp.TableSample(method=exp.var("SYSTEM"), percent=exp.Literal.number(SNOWFLAKE_SAMPLE_PERCENT)))
+    return tree
+
+
+def _rewrite_mysql(tree, table, n, dialect):
+    ref = exp.table_(table.name, db=table.text("db") or None).sql(dialect)
+    fraction = sqlglot.parse_one(
+        f"SELECT LEAST(1.0, {n * MYSQL_OVERSAMPLE} / GREATEST(COUNT(*), 1)) FROM {ref}", read=dialect)
+    tree = tree.where(exp.LT(this=exp.Rand(), expression=exp.Subquery(this=fraction)), copy=False)
+    return tree
+
+
+def rewrite_random_sampling(sql, db_type):
+    """
+    Rewrite `SELECT ... FROM t ORDER BY RANDOM() LIMIT n` into backend-specific cheap sampling.
+    Returns the rewritten SQL, or None when the query does not match the pattern (or sqlglot is unavailable).
+    """
+    dialect = SAMPLING_REWRITE_DIALECTS.get(db_type)
+    if sqlglot is None or dialect is None:
+        return None
+    try:
+        tree = sqlglot.parse_one(sql, read=dialect)
+    except Exception:
+        return None
+    target = _sampling_target(tree)
+    if target is None:
+        return None
+    table, n = target
+    if db_type == "sqlite":
+        tree = _rewrite_sqlite(tree, table, n)
+    elif db_type == "bigquery":
+        tree = _rewrite_bigquery(tree, table, n)
+    elif db_type == "snow":
+        tree = _rewrite_snowflake(tree, table, n)
+    else:
+        tree = _rewrite_mysql(tree, table, n, dialect)
+    return tree.sql(dialect)
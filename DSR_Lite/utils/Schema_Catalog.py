@@ -0,0 +1,324 @@
+#--------------------------------
+# Process-wide catalog of the *_M-Schema.json files.
+# Each file is parsed once and shared by M_Schema*, the DDL generators, schema linking and pre-flight validation.
+# Entries are reloaded when the file's mtime changes, and at most SCHEMA_CATALOG_MAX_DATABASES databases
+# stay resident (least recently used are dropped).
+# The parsed JSON is shared between threads and callers: treat it as read-only.
+# Renders of a few tables from a file that is not loaded yet read only those tables from its .pack (table_reader).
+#--------------------------------
+import os
+import re
+import sys
+import json
+import threading
+from collections import OrderedDict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.DBsetup.Get_DB import read_db_config
+from utils.Schema_Store import METADATA_KEYS, load_schema_file, store_is_fresh, read_schema_skeleton, read_schema_table
+
+sqlite_DB_dir, snow_DB_dir, bigquery_DB_dir, mysql_DB_dir, doris_DB_dir = read_db_config()[:5]
+
+SCHEMA_CATALOG_MAX_DATABASES = 32
+SCHEMA_PARTIAL_LOAD_MAX_TABLES = 20  # selections up to this size are rendered from single-table reads of the .pack
+
+
+class Column:
+    """One column of an M-Schema table."""
+    def __init__(self, name, type, description="", examples="", primary_key=False):
+        self.name = name
+        self.type = type
+        self.description = description
+        self.examples = examples
+        self.primary_key = primary_key
+
+    def __repr__(self):
+        return f"Column({self.name!r}, {self.type!r})"
+
+
+class Table:
+    """
+    One table of an M-Schema file. id is the table key as written in the file: "table" for sqlite/mysql/doris,
+    "schema.table" for snow, "dataset.table" for bigquery (container holds the schema / dataset part).
+    similar_tables lists the other tables of the series this table represents.
+    """
+    def __init__(self, id, columns, container=None, project=None, description="", similar_tables=()):
+        self.id = id
+        self.name = id.split(".")[-1] if container else id
+        self.columns = columns
+        self.container = container
+        self.project = project
+        self.description = description
+        self.similar_tables = list(similar_tables)
+        self.column_map = {column.name.lower(): column for column in columns}
+
+    def column(self, name):
+        return self.column_map.get(name.lower())
+
+    def __repr__(self):
+        return f"Table({self.id!r}, {len(self.columns)} columns)"
+
+
+def _similar_tables(schema_content, table_id):
+    similar = (schema_content.get("table_Information") or {}).get(table_id)
+    if isinstance(similar, dict):
+        return similar.get("similar_tables", [])
+    return similar if isinstance(similar, list) else []
+
+
+def _column_objects(column_details, db_type):
+    columns = []
+    for col in column_details:
+        if not isinstance(col, (list, tuple)) or not col:
+            continue
+        col = list(col) + [""] * 5
+        if db_type in ("sqlite", "mysql", "doris"):  # [name, pk, type, description, examples]
+            columns.append(Column(col[0], col[2], col[3], col[4], primary_key=col[1] == "Primary Key"))
+        else:  # [name, type, description, examples]
+            columns.append(Column(col[0], col[1], col[2], col[3]))
+    return columns
+
+
+def _add_container_tables(tables, schema_content, db_type, project=None):
+    summaries = schema_content.get("table_description_summary") or {}
+    for table_id, column_details in schema_content.items():
+        if table_id in METADATA_KEYS or not isinstance(column_details, list):
+            continue
+        tables[table_id.lower()] = Table(
+            table_id, _column_objects(column_details, db_type), container=table_id.split(".")[0] if "." in table_id else None,
+            project=project, description=summaries.get(table_id, ""),
+            similar_tables=_similar_tables(schema_content, table_id))
+
+
+def build_tables(schema_data, db_type, db_id):
+    """Typed view of a parsed M-Schema file: OrderedDict of lower-cased table id -> Table, in file order."""
+    tables = OrderedDict()
+    if db_type in ("sqlite", "mysql", "doris"):
+        content = schema_data.get(db_id)
+        if content is None:
+            content = next((v for k, v in schema_data.items() if k.lower() == db_id.lower() and k not in METADATA_KEYS), {})
+        for table_id, column_details in content.items():
+            if table_id in METADATA_KEYS or not isinstance(column_details, list):
+                continue
+            tables[table_id.lower()] = Table(table_id, _column_objects(column_details, db_type),
+                                             similar_tables=_similar_tables(schema_data, table_id))
+    elif db_type == "snow":
+        for schema_content in schema_data.values():
+            if isinstance(schema_content, dict):
+                _add_container_tables(tables, schema_content, db_type)
+    elif db_type == "bigquery":
+        for project, project_content in schema_data.items():
+            if not isinstance(project_content, dict):
+                continue
+            for dataset_content in project_content.values():
+                if isinstance(dataset_content, dict):
+                    _add_container_tables(tables, dataset_content, db_type, project=project)
+    return tables
+
+
+def clean_table_name(table_name):
+    table_name = str(table_name)
+    table_name = table_name.replace('"', '')
+    table_name = re.sub(r'\d+', '', table_name)
+    table_name = table_name.lower()
+    return table_name
+
+
+class SeriesIndex:
+    """
+    Lookup indexes over the tables of a Snowflake / BigQuery M-Schema, built once per loaded file:
+      table_map      "schema.table" (lower) -> table key as written, for direct matches
+      container_map  schema / dataset name (lower) -> as written
+      surrogates     (project, schema / dataset, similar table lower) -> surrogate table key; the first surrogate
+                     listing a table wins, as in the linear table_Information scan this replaces
+      series         clean_table_name("<db_id or project>.<table key>") -> [(file position, project, schema / dataset,
+                     table key)], for the digit-insensitive table_list matching of the DDL generators
+    project is None for Snowflake.
+    """
+    def __init__(self, schema_data, db_type, db_id):
+        self.table_map = {}
+        self.container_map = {}
+        self.surrogates = {}
+        self.series = {}
+        position = 0
+        if db_type == "bigquery":
+            groups = [(project, content) for project, content in schema_data.items() if isinstance(content, dict)]
+        else:
+            groups = [(None, schema_data)]
+        for project, containers in groups:
+            prefix = project if db_type == "bigquery" else db_id
+            for container, content in containers.items():
+                if not isinstance(content, dict):
+                    continue
+                self.container_map[container.lower()] = container
+                for table_key, columns in content.items():
+                    if table_key not in ("table_Information", "table_description_summary"):
+                        self.table_map[table_key.lower()] = table_key
+                    if isinstance(columns, list):
+                        self.series.setdefault(clean_table_name(f"{prefix}.{table_key}"), []).append((position, project, container, table_key))
+                        position += 1
+                for surrogate, similar in (content.get("table_Information") or {}).items():
+                    tables = similar.get("similar_tables", []) if isinstance(similar, dict) else similar if isinstance(similar, list) else []
+                    for table_id in tables:
+                        self.surrogates.setdefault((project, container, table_id.lower()), surrogate)
+
+    def surrogate_of(self, table_id_short_lower, container_lower, project=None):
+        """Surrogate key of a similar table within its schema / dataset, or None."""
+        container = self.container_map.get(container_lower)
+        if container is None:
+            return None
+        return self.surrogates.get((project, container, table_id_short_lower))
+
+    def tables_matching(self, table_list):
+        """(project, schema / dataset, table key) of every table whose cleaned full name is in table_list, in file order."""
+        cleaned = {clean_table_name(t) for t in table_list}
+        matches = sorted(ref for name in cleaned for ref in self.series.get(name, []))
+        return [ref[1:] for ref in matches]
+
+
+class SchemaEntry:
+    """One loaded M-Schema file: the parsed JSON, its typed tables and anything derived from it."""
+    def __init__(self, path, mtime, data):
+        self.path = path
+        self.mtime = mtime
+        self.data = data
+        self._derived = {}
+        self._lock = threading.RLock()  # builders may use other derived values
+
+    def derived(self, key, build):
+        """Value of build() cached on this entry, so it is rebuilt only when the file changes."""
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = build()
+            return self._derived[key]
+
+    def tables(self, db_type, db_id):
+        return self.derived(("tables", db_type, db_id), lambda: build_tables(self.data, db_type, db_id))
+
+    def series_index(self, db_type, db_id):
+        return self.derived(("series_index", db_type, db_id), lambda: SeriesIndex(self.data, db_type, db_id))
+
+
+class SchemaCatalog:
+    def __init__(self, max_databases=SCHEMA_CATALOG_MAX_DATABASES):
+        self.max_databases = max_databases
+        self._entries = OrderedDict()  # path -> SchemaEntry
+        self._loading = {}  # path -> lock held while the file is parsed
+        self._outlines = OrderedDict()  # path -> SchemaEntry of the .pack skeleton (column lists are None)
+        self._lock = threading.Lock()
+
+    def get(self, json_path):
+        """
+        The SchemaEntry of a file, parsed on first use or when its mtime changed.
+        Raises FileNotFoundError / json.JSONDecodeError like opening and json.load-ing the file would.
+        """
+        mtime = os.path.getmtime(json_path)
+        with self._lock:
+            entry = self._entries.get(json_path)
+            if entry is not None and entry.mtime == mtime:
+                self._entries.move_to_end(json_path)
+                return entry
+            load_lock = self._loading.setdefault(json_path, threading.Lock())
+        # One thread parses, concurrent callers for the same file wait for its result
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(json_path)
+                if entry is not None and entry.mtime == mtime:
+                    self._entries.move_to_end(json_path)
+                    return entry
+            try:
+                entry = SchemaEntry(json_path, mtime, load_schema_file(json_path))
+                with self._lock:
+                    self._entries[json_path] = entry
+                    self._entries.move_to_end(json_path)
+                    while len(self._entries) > self.max_databases:
+                        self._entries.popitem(last=False)
+            finally:
+                # Also after a failed parse, so a broken file does not leave its lock behind
+                with self._lock:
+                    self._loading.pop(json_path, None)
+        return entry
+
+    def table_reader(self, json_path, table_count):
+        """
+        (entry, columns_of) for rendering table_count tables of a file; columns_of(*path) is the column list at a key
+        path of the M-Schema ((schema, table key) for Snowflake, (project, dataset, table key) for BigQuery).
+        When the file is not loaded yet and has a fresh .pack, entry only holds the skeleton (tables, similar-table
+        information and descriptions, column lists None) and columns_of decodes single tables. Otherwise the full
+        entry is loaded as by get().
+        """
+        mtime = os.path.getmtime(json_path)
+        with self._lock:
+            entry = self._entries.get(json_path)
+            loaded = entry is not None and entry.mtime == mtime
+            outline = self._outlines.get(json_path)
+        if not loaded and table_count <= SCHEMA_PARTIAL_LOAD_MAX_TABLES and store_is_fresh(json_path):
+            try:
+                if outline is None or outline.mtime != mtime:
+                    outline = SchemaEntry(json_path, mtime, read_schema_skeleton(json_path))
+                    with self._lock:
+                        self._outlines[json_path] = outline
+                        while len(self._outlines) > self.max_databases:
+                            self._outlines.popitem(last=False)
+                return outline, lambda *path: read_schema_table(json_path, path)
+            except Exception as e:
+                print(f"WARNING: Could not read schema store for {json_path}, loading the whole schema. Error: {e}")
+        entry = self.get(json_path)
+        return entry, lambda *path: _value_at(entry.data, path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._outlines.clear()
+
+
+def _value_at(node, path):
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
+schema_catalog = SchemaCatalog()
+
+
+def load_schema_json(json_path):
+    """The parsed M-Schema JSON at json_path, shared through the catalog (read-only)."""
+    return schema_catalog.get(json_path).data
+
+
+def schema_json_path(db_id, db_type):
+    """Path of the *_M-Schema.json for db_id, or None if it does not exist."""
+    if db_type == "sqlite":
+        base_dir = sqlite_DB_dir
+    elif db_type == "snow":
+        base_dir = snow_DB_dir
+    elif db_type == "bigquery":
+        base_dir = bigquery_DB_dir
+    elif db_type == "mysql":
+        base_dir = mysql_DB_dir or "spider2-lite/resource/databases/mysql"
+    elif db_type == "doris":
+        base_dir = doris_DB_dir or "spider2-lite/resource/databases/doris"
+    else:
+        return None
+    if not base_dir or not os.path.isdir(base_dir):
+        return None
+    dirname = db_id
+    if db_type == "bigquery":
+        # BigQuery task directories are matched case-insensitively, as in M_Schema_bigquery
+        dirname = next((d for d in os.listdir(base_dir) if d.lower() == db_id.lower()), db_id)
+    json_path = os.path.join(base_dir, dirname, f"{dirname}_M-Schema.json")
+    return json_path if os.path.exists(json_path) else None
+
+
+def get_schema(db_id, db_type):
+    """The catalog entry of a database's M-Schema, or None if it has no schema file."""
+    json_path = schema_json_path(db_id, db_type)
+    return schema_catalog.get(json_path) if json_path else None
+
+
+def get_tables(db_id, db_type):
+    """Typed tables of a database (OrderedDict of lower-cased table id -> Table); empty if it has no schema file."""
+    entry = get_schema(db_id, db_type)
+    return entry.tables(db_type, db_id) if entry else OrderedDict()
@@ -0,0 +1,232 @@
+#--------------------------------
+# Token-budgeted pruning of a rendered M-Schema.
+# Instead of swapping an over-long M-Schema for the DDL wholesale, the schema is shrunk step by step until it fits:
+#   1. drop column examples        3. drop low-relevance columns (never primary keys, question words, or a table's last column)
+#   2. drop column descriptions    4. collapse table series (tables whose names differ only in digits) into one table
+# Within a step the least relevant columns go first, relevance being the overlap of the column's name and
+# description with the question. Costs are estimated per element from the rendered text's token density, and
+# the result is checked against the real tokenizer; the budget is tightened and pruning redone if the estimate
+# was optimistic. Anything the pruner cannot map back to the schema JSON is kept verbatim.
+#--------------------------------
+import re
+
+from utils.Schema_Catalog import clean_table_name
+
+PRUNE_STEPS = ("examples", "descriptions", "columns", "series")
+PRUNE_MAX_ATTEMPTS = 3
+PRUNE_BUDGET_MARGIN = 0.97  # when the estimate was too low, retry with this fraction of the corrected budget
+
+
+def _words(text):
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", str(text or ""))
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def _column_parts(column, db_type):
+    """(base, description, examples) parts of a column, formatted as M_Schema* renders them."""
+    if db_type in ("sqlite", "mysql", "doris"):
+        base = [f"{column.name}: {column.type}"] + (["Primary Key"] if column.primary_key else [])
+        description = column.description or None
+        examples = f"Examples: [{column.examples}]" if column.examples else None
+    else:
+        base = [f"{column.name}: {column.type}"]
+        description = column.description.strip() if column.description and column.description.strip() else None
+        example_text = column.examples.replace("examples:", "").strip() if column.examples else ""
+        examples = f"Examples: {example_text}" if example_text else None
+    return base, description, examples
+
+
+class _ColumnLine:
+    def __init__(self, column, parts, relevance, indent):
+        self.column = column
+        self.base, self.description, self.examples = parts
+        self.relevance = relevance
+        self.indent = indent
+        self.keep_examples = self.examples is not None
+        self.keep_description = self.description is not None
+        self.kept = True
+        self.required = False
+        self.block = None
+
+    def render(self):
+        parts = list(self.base)
+        if self.keep_description:
+            parts.append(self.description)
+        if self.keep_examples:
+            parts.append(self.examples)
+        return f"{self.indent}({', '.join(parts)})"
+
+
+class _TableBlock:
+    def __init__(self, name, table, header, lines, footer):
+        self.name = name
+        self.table = table  # Schema_Catalog.Table, None if the name did not resolve
+        self.header = header  # "# Table: ...", "["
+        self.lines = lines  # _ColumnLine, or str kept verbatim
+        self.footer = footer  # "]", optional "# Table Description: ..."
+        self.similar = []  # names of collapsed tables of the same series
+        self.kept_columns = sum(1 for line in lines if not isinstance(line, str))
+        self.collapsed = False
+
+    def render(self):
+        if self.collapsed:
+            return []
+        kept = [line for line in self.lines if isinstance(line, str) or line.kept]
+        rendered = [line if isinstance(line, str) else line.render() for line in kept]
+        out = list(self.header)
+        out += [line + ("," if i < len(rendered) - 1 else "") for i, line in enumerate(rendered)]
+        out += self.footer
+        if self.similar:
+            out.append(f"# Similar tables (same columns as {self.name}): {', '.join(self.similar)}")
+        return out
+
+
+def _lookup_table(name, tables, db_type):
+    parts = name.split(".")
+    if db_type in ("snow", "bigquery"):
+        key = ".".join(parts[1:]).lower() if len(parts) >= 3 else None
+    else:
+        key = name.lower()
+    return tables.get(key) if key else None
+
+
+def _parse(text, tables, db_type, question_words):
+    """Split a rendered M-Schema into (prefix lines, table blocks, suffix lines)."""
+    lines = text.split("\n")
+    prefix, blocks, suffix = [], [], []
+    i = 0
+    while i < len(lines) and not lines[i].startswith("# Table: "):
+        prefix.append(lines[i])
+        i += 1
+    while i < len(lines) and lines[i].startswith("# Table: "):
+        name = lines[i][len("# Table: "):]
+        header = [lines[i]]
+        i += 1
+        if i < len(lines) and lines[i] == "[":
+            header.append(lines[i])
+            i += 1
+        table = _lookup_table(name, tables, db_type)
+        rendered_columns = {}
+        if table is not None:
+            for column in table.columns:
+                parts = _column_parts(column, db_type)
+                full = list(parts[0]) + [p for p in parts[1:] if p]
+                rendered_columns[f"({', '.join(full)})"] = (column, parts)
+        body = []
+        while i < len(lines) and lines[i] != "]" and not lines[i].startswith("# Table: "):
+            raw = lines[i]
+            stripped = raw.strip()
+            key = stripped[:-1] if stripped.endswith(",") else stripped
+            match = rendered_columns.get(key)
+            if match:
+                column, parts = match
+                name_words = _words(column.name)
+                relevance = 2 * len(name_words & question_words) + 0.5 * len(_words(column.description) & question_words)
+                line = _ColumnLine(column, parts, relevance, raw[:len(raw) - len(raw.lstrip())])
+                line.required = bool(name_words and name_words <= question_words) or column.primary_key
+                body.append(line)
+            else:
+                body.append(raw[:-1] if raw.endswith(",") else raw)
+            i += 1
+        footer = []
+        if i < len(lines) and lines[i] == "]":
+            footer.append(lines[i])
+            i += 1
+            if i < len(lines) and lines[i].startswith("# Table Description: "):
+                footer.append(lines[i])
+                i += 1
+        block = _TableBlock(name, table, header, body, footer)
+        for line in body:
+            if not isinstance(line, str):
+                line.block = block
+        blocks.append(block)
+    suffix = lines[i:]
+    return prefix, blocks, suffix
+
+
+def _render(prefix, blocks, suffix):
+    out = list(prefix)
+    for block in blocks:
+        out.extend(block.render())
+    out.extend(suffix)
+    return "\n".join(out)
+
+
+def _column_lines(blocks):
+    return [line for block in blocks if not block.collapsed for line in block.lines if not isinstance(line, str)]
+
+
+def _prune(prefix, blocks, suffix, char_budget):
+    """Apply the prune steps in order until the rendering is at most char_budget characters."""
+    def size():
+        return len(_render(prefix, blocks, suffix))
+
+    current = size()
+    if current <= char_budget:
+        return
+    for step in PRUNE_STEPS:
+        if step == "series":
+            first_of_series = {}
+            for block in blocks:
+                if block.table is None:
+                    continue
+                series = (clean_table_name(block.name), tuple(c.name.lower() for c in block.table.columns))
+                first = first_of_series.setdefault(series, block)
+                if first is not block:
+                    saving = len("\n".join(block.render())) + 1 - len(block.name) - 2
+                    block.collapsed = True
+                    first.similar.append(block.name)
+                    current -= saving
+                    if current <= char_budget:
+                        current = size()
+                        if current <= char_budget:
+                            return
+            continue
+        # Least relevant first; among equally relevant columns, later ones in a table go first
+        candidates = sorted(reversed(_column_lines(blocks)), key=lambda line: line.relevance)
+        for line in candidates:
+            if step == "examples" and line.keep_examples:
+                saving = len(line.examples) + 2
+                line.keep_examples = False
+            elif step == "descriptions" and line.keep_description:
+                saving = len(line.description) + 2
+                line.keep_description = False
+            elif step == "columns" and line.kept and not line.required:
+                if line.block.kept_columns <= 1:
+                    continue
+                saving = len(line.render()) + 2
+                line.kept = False
+                line.block.kept_columns -= 1
+            else:
+                continue
+            current -= saving
+            if current <= char_budget:
+                current = size()
+                if current <= char_budget:
+                    return
+
+
+def prune_schema(text, tables, db_type, max_tokens, question="", token_count=None, count_tokens=None):
+    """
+    Shrink a rendered M-Schema (text, from M_Schema*) to at most max_tokens tokens.
+    tables: the database's typed tables (Schema_Catalog.get_tables); token_count: tokens of text, if known;
+    count_tokens: the tokenizer's counting function. Returns (pruned text, its token count).
+    """
+    token_count = token_count if token_count is not None else count_tokens(text)
+    if token_count <= max_tokens or not text:
+        return text, token_count
+    tokens_per_char = token_count / len(text)
+    question_words = _words(question)
+    budget = max_tokens
+    pruned, pruned_tokens = text, token_count
+    for _ in range(PRUNE_MAX_ATTEMPTS):
+        prefix, blocks, suffix = _parse(text, tables, db_type, question_words)
+        _prune(prefix, blocks, suffix, int(budget / tokens_per_char))
+        pruned = _render(prefix, blocks, suffix)
+        pruned_tokens = count_tokens(pruned)
+        if pruned_tokens <= max_tokens:
+            break
+        budget = budget * max_tokens / pruned_tokens * PRUNE_BUDGET_MARGIN
+    if pruned_tokens > max_tokens:
+        print(f"Warning: Schema pruned to {pruned_tokens} tokens, still above the budget of {max_tokens}.")
+    return pruned, pruned_tokens
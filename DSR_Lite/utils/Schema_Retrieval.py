@@ -0,0 +1,240 @@
+#--------------------------------
+# Local retrieval index over the tables of one database, used to prefilter schema linking on huge schemas.
+# Every table of the *_M-Schema.json becomes a document made of its name, column names, column descriptions,
+# example values and table description; questions are scored against it with BM25 (NumPy, one bincount per
+# query), optionally fused with cosine similarity of CPU sentence embeddings (RETRIEVAL_EMBEDDING_MODEL, needs
+# transformers and torch). Tables of a similar_tables series are represented by their surrogate, as in the schema.
+# The index is written next to the JSON as *_M-Schema.retrieval.npz and used while it is at least as new as the
+# JSON; otherwise the BM25 part is built in memory on first use (embeddings are only computed offline):
+#   python -m utils.Schema_Retrieval spider2-lite/resource/databases/snowflake --db_type snow
+#--------------------------------
+import os
+import re
+import sys
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.Schema_Catalog import get_schema, schema_catalog
+
+RETRIEVAL_SUFFIX = ".retrieval.npz"
+RETRIEVAL_TOP_K = 30  # tables passed on to LLM linking
+BM25_K1 = 1.2
+BM25_B = 0.75
+RETRIEVAL_NAME_WEIGHT = 3  # table and column names count this many times in a document
+RETRIEVAL_EXAMPLE_CHARS = 200  # example values kept per column
+RETRIEVAL_EMBEDDING_MODEL = None  # e.g. "sentence-transformers/all-MiniLM-L6-v2"; None uses BM25 only
+RETRIEVAL_EMBEDDING_WEIGHT = 0.5  # share of the embedding score in the fused score
+RETRIEVAL_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "did", "do", "does", "each", "for", "from", "give",
+    "how", "i", "in", "is", "it", "list", "me", "many", "much", "of", "on", "or", "please", "show", "that", "the",
+    "their", "there", "these", "this", "to", "was", "were", "what", "when", "where", "which", "who", "with",
+}
+
+
+def tokenize(text):
+    """Lower-cased word tokens; snake_case and camelCase names are split into their words."""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", str(text or ""))
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in RETRIEVAL_STOPWORDS]
+
+
+def table_name(table, db_type, db_id):
+    """Table name as the schema-linking table lists write it (get_table_mess_snow and friends)."""
+    if db_type == "snow":
+        return f"{db_id}.{table.id}"
+    if db_type == "bigquery":
+        return f"{table.project}.{table.id}"
+    return table.id
+
+
+def table_document(table):
+    """Text of a table for retrieval."""
+    names = [table.id] + [column.name for column in table.columns]
+    details = [table.description or ""]
+    for column in table.columns:
+        details.append(column.description or "")
+        details.append(str(column.examples or "")[:RETRIEVAL_EXAMPLE_CHARS])
+    return " ".join(names * RETRIEVAL_NAME_WEIGHT + details)
+
+
+class RetrievalIndex:
+    """
+    BM25 postings of one database's tables, stored term-major: the documents containing term t are
+    doc_ids[term_ptr[t]:term_ptr[t + 1]], with the term's frequencies at the same positions of term_freqs.
+    """
+    def __init__(self, tables, terms, term_ptr, doc_ids, term_freqs, doc_lengths, embeddings=None, embedding_model=None):
+        self.tables = list(tables)  # table names, in schema order
+        self.terms = {term: i for i, term in enumerate(terms)}
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.embeddings = embeddings  # (tables, dim), L2-normalized, or None
+        self.embedding_model = embedding_model
+        n_docs = len(self.tables)
+        doc_freqs = np.diff(term_ptr).astype(np.float64)
+        self.idf = np.log(1 + (n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        self.length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / max(doc_lengths.mean(), 1e-9)) if n_docs else doc_lengths
+
+    @classmethod
+    def build(cls, names, documents):
+        """Index of documents (texts), one per table name."""
+        postings = {}  # term -> {doc: frequency}
+        doc_lengths = np.zeros(len(documents), dtype=np.float64)
+        for doc, text in enumerate(documents):
+            tokens = tokenize(text)
+            doc_lengths[doc] = len(tokens)
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[doc] = counts.get(doc, 0) + 1
+        terms = sorted(postings)
+        term_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        term_ptr[1:] = np.cumsum([len(postings[term]) for term in terms])
+        doc_ids = np.fromiter((doc for term in terms for doc in postings[term]), dtype=np.int32, count=term_ptr[-1])
+        term_freqs = np.fromiter((f for term in terms for f in postings[term].values()), dtype=np.float32, count=term_ptr[-1])
+        return cls(names, terms, term_ptr, doc_ids, term_freqs, doc_lengths)
+
+    def bm25(self, question):
+        """BM25 score of every table for the question."""
+        term_ids = sorted({self.terms[token] for token in tokenize(question) if token in self.terms})
+        if not term_ids:
+            return np.zeros(len(self.tables))
+        slices = [np.arange(self.term_ptr[t], self.term_ptr[t + 1]) for t in term_ids]
+        positions = np.concatenate(slices)
+        idf = np.repeat(self.idf[term_ids], [len(s) for s in slices])
+        docs = self.doc_ids[positions]
+        freqs = self.term_freqs[positions]
+        contributions = idf * freqs * (BM25_K1 + 1) / (freqs + self.length_norm[docs])
+        return np.bincount(docs, weights=contributions, minlength=len(self.tables))
+
+    def scores(self, question):
+        """Fused relevance of every table; BM25 alone when the index has no embeddings."""
+        scores = self.bm25(question)
+        if self.embeddings is None:
+            return scores
+        query = embed_texts([question], self.embedding_model)
+        if query is None:
+            return scores
+        top = scores.max()
+        lexical = scores / top if top > 0 else scores
+        semantic = (self.embeddings @ query[0] + 1) / 2
+        return (1 - RETRIEVAL_EMBEDDING_WEIGHT) * lexical + RETRIEVAL_EMBEDDING_WEIGHT * semantic
+
+    def rank(self, question, top_k=RETRIEVAL_TOP_K):
+        """The top_k table names for the question, best first (ties keep schema order)."""
+        scores = self.scores(question)
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [self.tables[i] for i in order]
+
+    def save(self, path):
+        extra = {} if self.embeddings is None else {"embeddings": self.embeddings,
+                                                    "embedding_model": np.array(self.embedding_model)}
+        tmp_path = path + ".tmp.npz"
+        terms = sorted(self.terms, key=self.terms.get)
+        np.savez(tmp_path, tables=np.array(self.tables, dtype=object), terms=np.array(terms, dtype=object),
+                 term_ptr=self.term_ptr, doc_ids=self.doc_ids, term_freqs=self.term_freqs, doc_lengths=self.doc_lengths,
+                 **extra)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=True) as data:
+            embeddings = data["embeddings"] if "embeddings" in data else None
+            embedding_model = str(data["embedding_model"]) if "embedding_model" in data else None
+            return cls(data["tables"].tolist(), data["terms"].tolist(), data["term_ptr"], data["doc_ids"],
+                       data["term_freqs"], data["doc_lengths"], embeddings, embedding_model)
+
+
+# --- Optional embeddings ---
+_embedders = {}
+
+
+def embed_texts(texts, model_name, batch_size=64):
+    """L2-normalized mean-pooled CPU embeddings of texts, or None when transformers/torch are not installed."""
+    try:
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+    except ImportError:
+        print("WARNING: transformers/torch are not installed, ranking tables with BM25 only.")
+        return None
+    if model_name not in _embedders:
+        _embedders[model_name] = (AutoTokenizer.from_pretrained(model_name), AutoModel.from_pretrained(model_name).eval())
+    tokenizer, model = _embedders[model_name]
+    vectors = []
+    with torch.no_grad():
+        for start in range(0, len(texts), batch_size):
+            batch = tokenizer(texts[start:start + batch_size], padding=True, truncation=True, max_length=256, return_tensors="pt")
+            hidden = model(**batch).last_hidden_state
+            mask = batch["attention_mask"].unsqueeze(-1).float()
+            vectors.append(((hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)).numpy())
+    vectors = np.concatenate(vectors).astype(np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+
+# --- Building and lookup ---
+def index_path(json_path):
+    """Path of the retrieval index that belongs to an *_M-Schema.json."""
+    return os.path.splitext(json_path)[0] + RETRIEVAL_SUFFIX
+
+
+def build_index(tables, db_type, db_id, embedding_model=None):
+    """RetrievalIndex of typed tables (Schema_Catalog.build_tables); embeddings only if embedding_model is set."""
+    tables = list(tables.values())
+    documents = [table_document(table) for table in tables]
+    index = RetrievalIndex.build([table_name(table, db_type, db_id) for table in tables], documents)
+    if embedding_model:
+        embeddings = embed_texts(documents, embedding_model)
+        if embeddings is not None:
+            index.embeddings, index.embedding_model = embeddings, embedding_model
+    return index
+
+
+def _load_or_build(entry, db_type, db_id):
+    path = index_path(entry.path)
+    try:
+        if os.path.getmtime(path) >= entry.mtime:
+            return RetrievalIndex.load(path)
+    except OSError:
+        pass
+    except Exception as e:
+        print(f"WARNING: Could not read retrieval index {path}, rebuilding it in memory. Error: {e}")
+    return build_index(entry.tables(db_type, db_id), db_type, db_id)
+
+
+def get_retrieval_index(db_id, db_type):
+    """RetrievalIndex of a database, loaded or built once per loaded version of its M-Schema. None if it has no schema."""
+    entry = get_schema(db_id, db_type)
+    if entry is None:
+        return None
+    return entry.derived(("retrieval", db_type, db_id), lambda: _load_or_build(entry, db_type, db_id))
+
+
+def rank_tables(db_id, db_type, question, top_k=RETRIEVAL_TOP_K):
+    """The top_k tables of a database for the question, best first; [] if the database has no schema."""
+    index = get_retrieval_index(db_id, db_type)
+    return index.rank(question, top_k) if index is not None else []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write retrieval indexes for existing *_M-Schema.json files.")
+    parser.add_argument("paths", nargs="+", help="*_M-Schema.json files or directories to search")
+    parser.add_argument("--db_type", choices=["sqlite", "snow", "bigquery", "mysql", "doris"])
+    parser.add_argument("--embedding_model", default=RETRIEVAL_EMBEDDING_MODEL)
+    args = parser.parse_args()
+
+    json_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                json_paths.extend(os.path.join(root, f) for f in files if f.endswith("_M-Schema.json"))
+        else:
+            json_paths.append(path)
+    if json_paths and not args.db_type:
+        parser.error("--db_type is required to index schema files")
+    for json_path in sorted(json_paths):
+        db_id = os.path.basename(json_path)[:-len("_M-Schema.json")]
+        tables = schema_catalog.get(json_path).tables(args.db_type, db_id)
+        index = build_index(tables, args.db_type, db_id, args.embedding_model)
+        index.save(index_path(json_path))
+        print(f"✅ {index_path(json_path)} ({len(index.tables)} tables{', with embeddings' if index.embeddings is not None else ''})")
@@ -0,0 +1,183 @@
+#--------------------------------
+# Compact binary copy of an *_M-Schema.json, written next to it as *_M-Schema.pack by the preprocessors.
+# Layout: MAGIC | header length (uint32, little endian) | msgpack header | one msgpack blob per table.
+# The header holds the JSON with every table's column list replaced by None (metadata such as table_Information
+# stays inline), plus the path and byte range of each table blob. The file is memory-mapped, so a full load skips
+# JSON parsing, and a render of a few tables decodes only the header and those tables' blobs
+# (SchemaCatalog.table_reader in utils/Schema_Catalog.py).
+# The JSON stays the source of truth: loaders use the .pack only when msgpack is installed and the .pack is at
+# least as new as the JSON, and fall back to json.load otherwise.
+#   python -m utils.Schema_Store spider2-lite/resource/databases/snowflake   # convert existing schemas
+#--------------------------------
+import os
+import sys
+import json
+import mmap
+import struct
+import argparse
+
+try:
+    import msgpack
+except ImportError:  # Without msgpack every schema is read from its JSON
+    msgpack = None
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+USE_SCHEMA_STORE = True
+SCHEMA_STORE_SUFFIX = ".pack"
+MAGIC = b"MSCHEMA\x01"
+METADATA_KEYS = ("table_Information", "table_description_summary", "foreign_keys")
+_HEADER_LENGTH = struct.Struct("<I")
+
+
+def store_path(json_path):
+    """Path of the binary store that belongs to an *_M-Schema.json."""
+    return os.path.splitext(json_path)[0] + SCHEMA_STORE_SUFFIX
+
+
+def store_is_fresh(json_path):
+    """Whether the .pack of json_path can be used instead of the JSON."""
+    if msgpack is None or not USE_SCHEMA_STORE:
+        return False
+    path = store_path(json_path)
+    try:
+        return os.path.getmtime(path) >= os.path.getmtime(json_path)
+    except OSError:
+        return False
+
+
+def _split_tables(node, path, tables):
+    """Copy of node with every table's column list replaced by None; (path, columns) pairs go to tables."""
+    skeleton = {}
+    for key, value in node.items():
+        if key in METADATA_KEYS:
+            skeleton[key] = value
+        elif isinstance(value, list):
+            tables.append((path + [key], value))
+            skeleton[key] = None
+        elif isinstance(value, dict):
+            skeleton[key] = _split_tables(value, path + [key], tables)
+        else:
+            skeleton[key] = value
+    return skeleton
+
+
+def write_schema_store(schema_data, json_path):
+    """Write the .pack for the schema saved at json_path. Returns its path, or None when msgpack is missing."""
+    if msgpack is None:
+        print("WARNING: msgpack is not installed, skipping the binary schema store.")
+        return None
+    tables = []
+    skeleton = _split_tables(schema_data, [], tables)
+    blobs, index, offset = [], [], 0
+    for path, columns in tables:
+        blob = msgpack.packb(columns, use_bin_type=True)
+        index.append([path, offset, len(blob)])
+        blobs.append(blob)
+        offset += len(blob)
+    header = msgpack.packb({"skeleton": skeleton, "tables": index}, use_bin_type=True)
+
+    path = store_path(json_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return path
+
+
+class SchemaStore:
+    """
+    Read access to one .pack file. load() returns the whole schema (same structure as json.load of the JSON),
+    skeleton() the header's copy without column lists, table(path) the column list of a single table.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a schema store")
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        (header_length,) = _HEADER_LENGTH.unpack_from(self._mmap, len(MAGIC))
+        self._header = (start, start + header_length)
+        header = msgpack.unpackb(self._mmap[start:start + header_length], raw=False)
+        self._data_start = start + header_length
+        self.tables = header["tables"]  # [path, offset, length]
+        self._by_path = {tuple(entry[0]): entry for entry in self.tables}
+
+    def _decode(self, entry):
+        start = self._data_start + entry[1]
+        return msgpack.unpackb(self._mmap[start:start + entry[2]], raw=False)
+
+    def skeleton(self):
+        return msgpack.unpackb(self._mmap[self._header[0]:self._header[1]], raw=False)["skeleton"]
+
+    def table(self, path):
+        """Column list of the table at a key path as written in the M-Schema (e.g. (schema, table key)), or None."""
+        entry = self._by_path.get(tuple(path))
+        return self._decode(entry) if entry else None
+
+    def load(self):
+        data = self.skeleton()
+        for entry in self.tables:
+            node = data
+            for key in entry[0][:-1]:
+                node = node[key]
+            node[entry[0][-1]] = self._decode(entry)
+        return data
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_schema_file(json_path):
+    """Parsed M-Schema of json_path, from its .pack when that is usable, otherwise from the JSON."""
+    if store_is_fresh(json_path):
+        try:
+            with SchemaStore(store_path(json_path)) as store:
+                return store.load()
+        except Exception as e:
+            print(f"WARNING: Could not read schema store for {json_path}, using the JSON. Error: {e}")
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_schema_skeleton(json_path):
+    """The M-Schema of json_path with every table's column list set to None, from its .pack."""
+    with SchemaStore(store_path(json_path)) as store:
+        return store.skeleton()
+
+
+def read_schema_table(json_path, path):
+    """Column list of one table (key path as written in the M-Schema) from the .pack of json_path, or None."""
+    with SchemaStore(store_path(json_path)) as store:
+        return store.table(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write .pack schema stores for existing *_M-Schema.json files.")
+    parser.add_argument("paths", nargs="+", help="*_M-Schema.json files or directories to search")
+    args = parser.parse_args()
+
+    json_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                json_paths.extend(os.path.join(root, f) for f in files if f.endswith("_M-Schema.json"))
+        else:
+            json_paths.append(path)
+    for json_path in sorted(json_paths):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            written = write_schema_store(json.load(f), json_path)
+        if written:
+            print(f"✅ {written} ({os.path.getsize(json_path) / 1e6:.1f} MB JSON -> {os.path.getsize(written) / 1e6:.1f} MB)")
@@ -15,6 +15,7 @@ sys.path.append(project_root)
 from LLM.LLM_OUT import LLM_output
 from utils.extract_json import extract_and_parse_json
 from utils.DBsetup.Get_DB import read_db_config
+from utils.Schema_Store import write_schema_store
 
 
 # --- Basic I/O Functions ---
@@ -347,6 +348,7 @@ def main(task_folder_path, model):
 
     output_file_path = task_path / f"{task_name}_M-Schema.json"
     write_json_file(final_output, output_file_path)
+    write_schema_store(final_output, str(output_file_path))
     print(f"--- Finished processing for task: {task_name} ---")
 
 
@@ -21,6 +21,7 @@ sys.path.append(project_root)
 from LLM.LLM_OUT import LLM_output
 from utils.extract_json import extract_and_parse_json
 from utils.DBsetup.Get_DB import read_db_config
+from utils.Schema_Store import write_schema_store
 
 _, snow_DB_dir, _, SNOWFLAKE_CREDENTIALS, _=read_db_config()
 
@@ -830,6 +831,19 @@ def format_examples_string(example_vals: list) -> str:
     return f"examples: [{inner_content}]"
 
 
+def sample_table_rows(cursor, full_table_path, col_names, sample_size=10000):
+    """
+    Bulk-sample rows of one table with SAMPLE ROW and return them as a DataFrame (Snowflake column names).
+    Shared by enrich_schema_with_examples and the local replica builder (utils/DBsetup/Local_Replica.py).
+    """
+    quoted_cols = ', '.join([f'"{col}"' for col in col_names])
+    query_bulk = f'SELECT {quoted_cols} FROM {full_table_path} SAMPLE ROW ({sample_size} ROWS)'
+    print(f"    Executing bulk query (sampling {sample_size} rows)...")
+    cursor.execute(query_bulk)
+    sample_col_names = [desc[0] for desc in cursor.description]
+    return pd.DataFrame(cursor.fetchall(), columns=sample_col_names)
+
+
 # --- Main Function ---
 def enrich_schema_with_examples(db_schema: dict, db_name: str, credentials: dict, example_limit: int = 3):
     """
@@ -873,14 +887,7 @@ def enrich_schema_with_examples(db_schema: dict, db_name: str, credentials: dict
 
                 # --- 2a. Efficient Bulk Sampling Query ---
                 try:
-                    quoted_cols = ', '.join([f'"{col}"' for col in all_col_names])
-                    query_bulk = f'SELECT {quoted_cols} FROM {full_table_path} SAMPLE ROW (10000 ROWS)'
-                    print(f"    Executing bulk query (fetching 1000 rows)...")
-                    cursor.execute(query_bulk)
-                    sample_col_names = [desc[0] for desc in cursor.description]
-                    sample_rows = cursor.fetchall()
-
-                    df = pd.DataFrame(sample_rows, columns=sample_col_names)
+                    df = sample_table_rows(cursor, full_table_path, all_col_names)
                     print(f"    Bulk fetched shape: {df.shape}")
 
                     if not df.empty:
@@ -996,6 +1003,7 @@ def process_and_save_database(db_name, db_root, model,credentials=SNOWFLAKE_CRED
         os.makedirs(output_dir, exist_ok=True)
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(dist5, f, indent=4, ensure_ascii=False)
+        write_schema_store(dist5, output_path)
 
         print(f"✅ File saved successfully: {output_path}")
 